@@ -0,0 +1,198 @@
+# activity_log.py
+"""
+Журнал действий (аудит) с отложенной записью.
+
+Обработчик вызывает record_activity(db, ...) до commit'а своей транзакции.
+Режим задается ACTIVITY_LOG_MODE:
+- write_behind (по умолчанию) - событие придерживается в сессии и после
+  успешного commit'а попадает в ограниченную очередь в памяти; фоновая задача
+  пишет события пачками одним многострочным INSERT. На пути запроса нет
+  лишних обращений к БД; при откате транзакции событие отбрасывается, при
+  переполнении очереди или падении процесса часть событий может потеряться.
+- sync - событие добавляется в транзакцию обработчика и фиксируется вместе
+  с изменением: журнал не теряет событий ценой одного INSERT в запросе.
+
+Переменные окружения:
+- ACTIVITY_LOG_MODE - write_behind или sync
+- ACTIVITY_QUEUE_SIZE - размер очереди (по умолчанию 10000)
+- ACTIVITY_BATCH_SIZE - максимум событий в одном INSERT (по умолчанию 500)
+- ACTIVITY_FLUSH_INTERVAL - как долго копить пачку, секунды (по умолчанию 1)
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal
+from metrics import Counter, Gauge, registry
+from models import ActivityEvent
+
+ACTIVITY_LOG_MODE = os.getenv("ACTIVITY_LOG_MODE", "write_behind").lower()
+ACTIVITY_QUEUE_SIZE = int(os.getenv("ACTIVITY_QUEUE_SIZE", "10000"))
+ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "500"))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "1"))
+# Повторы записи пачки при ошибке БД, затем пачка отбрасывается
+WRITE_RETRIES = 3
+
+logger = logging.getLogger(__name__)
+
+# Ключ session.info для событий, ожидающих commit'а
+_PENDING_KEY = "activity_events"
+
+activity_events_total = registry.register(Counter(
+    "activity_events_total",
+    "События журнала действий по результату (written, dropped)",
+    ["result"]
+))
+
+
+class ActivityLogWriter:
+    """Ограниченная очередь событий и фоновая запись пачками"""
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        queue_size: int = ACTIVITY_QUEUE_SIZE,
+        batch_size: int = ACTIVITY_BATCH_SIZE,
+        flush_interval: float = ACTIVITY_FLUSH_INTERVAL
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    def enqueue(self, values: dict) -> None:
+        """Без ожидания: при переполненной очереди событие отбрасывается"""
+        try:
+            self.queue.put_nowait(values)
+        except asyncio.QueueFull:
+            activity_events_total.inc("dropped")
+
+    async def _get(self, timeout: Optional[float]) -> Optional[dict]:
+        """Следующее событие; None - истек timeout или запрошена остановка"""
+        get = asyncio.create_task(self.queue.get())
+        stopping = asyncio.create_task(self._stopping.wait())
+        await asyncio.wait({get, stopping}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        get.cancel()
+        try:
+            # Если событие уже взято из очереди, отмена не сработает - оно не теряется
+            return await get
+        except asyncio.CancelledError:
+            return None
+
+    async def _collect_batch(self) -> List[dict]:
+        """Ждет первое событие, затем добирает пачку до batch_size или flush_interval"""
+        first = await self._get(None)
+        if first is None:
+            return []
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            values = await self._get(timeout)
+            if values is None:
+                break
+            batch.append(values)
+        return batch
+
+    async def _write(self, batch: List[dict]) -> None:
+        for attempt in range(1, WRITE_RETRIES + 1):
+            try:
+                async with self.session_factory() as db:
+                    await db.execute(insert(ActivityEvent), batch)
+                    await db.commit()
+                activity_events_total.inc("written", amount=len(batch))
+                return
+            except Exception as e:
+                logger.warning(
+                    "Ошибка записи журнала действий",
+                    extra={"attempt": attempt, "events": len(batch), "error": str(e)}
+                )
+                await asyncio.sleep(attempt)
+        activity_events_total.inc("dropped", amount=len(batch))
+
+    async def _run(self) -> None:
+        # Пачка, уже взятая из очереди, дописывается и при остановке
+        while not self._stopping.is_set():
+            batch = await self._collect_batch()
+            if batch:
+                await self._write(batch)
+
+    async def flush(self) -> None:
+        """Записывает все, что сейчас в очереди"""
+        while not self.queue.empty():
+            batch = []
+            while not self.queue.empty() and len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+            await self._write(batch)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановка с дозаписью текущей пачки и очереди (graceful shutdown)"""
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+activity_writer = ActivityLogWriter()
+
+registry.register(Gauge(
+    "activity_queue_size",
+    "События журнала действий, ожидающие записи",
+    collect=lambda: {(): activity_writer.queue.qsize()}
+))
+
+
+def record_activity(
+    db: AsyncSession,
+    action: str,
+    user_id: Optional[int],
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    **details
+) -> None:
+    """
+    Регистрирует событие в транзакции сессии db. Вызывается до commit'а:
+    событие будет записано, только если транзакция зафиксирована.
+    """
+    values = {
+        "created_at": datetime.now(timezone.utc),
+        "user_id": user_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "details": details or None,
+    }
+    if ACTIVITY_LOG_MODE == "sync":
+        db.add(ActivityEvent(**values))
+    else:
+        db.sync_session.info.setdefault(_PENDING_KEY, []).append(values)
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_committed(session: Session) -> None:
+    for values in session.info.pop(_PENDING_KEY, ()):
+        activity_writer.enqueue(values)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
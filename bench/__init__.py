@@ -0,0 +1,2 @@
+# bench/__init__.py
+"""Нагрузочные бенчмарки API (см. bench/load_test.py)"""
\ No newline at end of file
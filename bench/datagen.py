@@ -0,0 +1,335 @@
+# bench/datagen.py
+"""
+Генератор синтетических данных для нагрузочного тестирования.
+
+Пишет пользователей и задачи напрямую в базу, минуя ORM и API:
+в PostgreSQL - бинарным COPY (asyncpg.copy_records_to_table),
+в SQLite - пакетными INSERT (executemany). Результат детерминирован
+при одинаковом seed: каждый пакет задач генерируется своим генератором
+случайных чисел, производным от seed и номера пакета.
+
+Распределения приближены к реальным:
+- задачи по пользователям - по закону Ципфа (немного очень активных пользователей);
+- created_at - за последний год, с уклоном к недавним датам;
+- дедлайн есть у ~70% задач, срок - логнормальный относительно created_at;
+- вероятность выполнения растет с возрастом задачи;
+- длина описания - логнормальная, у ~35% задач описания нет.
+
+Запуск (из корня репозитория):
+    python -m bench.datagen --users 100000 --tasks 20000000 --seed 1
+    python -m bench.datagen --database-url sqlite+aiosqlite:///bench.db --users 1000 --tasks 500000
+
+После генерации стоит пересчитать дневные rollup'ы:
+    python rollups.py backfill --from 2024-01-01
+"""
+import argparse
+import asyncio
+import importlib
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PASSWORD = "bench-password"
+DEFAULT_BATCH_SIZE = 50_000
+# Параметры для SQLite: лимит переменных в одном запросе
+SQLITE_BATCH_SIZE = 5_000
+
+TASK_COLUMNS = [
+    "title", "description", "is_important", "deadline_at", "quadrant",
+    "completed", "created_at", "completed_at", "user_id",
+]
+USER_COLUMNS = ["id", "nickname", "email", "hashed_password", "role", "task_count"]
+
+WORDS = [
+    "отчет", "встреча", "план", "код", "review", "звонок", "бюджет", "релиз",
+    "клиент", "презентация", "документация", "тесты", "договор", "счет",
+    "ремонт", "спорт", "покупки", "врач", "учеба", "проект", "исправить",
+    "подготовить", "отправить", "согласовать", "проверить", "обновить",
+]
+
+
+def user_nickname(index: int) -> str:
+    return f"bench_user_{index}"
+
+
+def user_email(index: int) -> str:
+    return f"bench_user_{index}@example.com"
+
+
+def _quadrant(deadline_at: Optional[datetime], is_important: bool, today) -> str:
+    # Та же логика, что и calculate_urgency_and_quadrant, но без date.today() на каждую строку
+    is_urgent = deadline_at is not None and (deadline_at.date() - today).days <= 3
+    if is_important:
+        return "Q1" if is_urgent else "Q2"
+    return "Q3" if is_urgent else "Q4"
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+def generate_task_batch(
+    seed: int,
+    batch_index: int,
+    size: int,
+    user_ids: Sequence[int],
+    cum_weights: Sequence[float],
+    now: datetime
+) -> List[tuple]:
+    """Пакет задач (кортежи в порядке TASK_COLUMNS), детерминированный по (seed, batch_index)"""
+    rng = random.Random(seed * 1_000_003 + batch_index)
+    today = now.date()
+    owners = rng.choices(user_ids, cum_weights=cum_weights, k=size)
+    rows = []
+
+    for user_id in owners:
+        # Возраст задачи: больше недавних (экспоненциальное распределение, обрезанное годом)
+        age_days = min(rng.expovariate(1 / 60), 365.0)
+        created_at = now - timedelta(days=age_days)
+
+        if rng.random() < 0.7:
+            deadline_at = created_at + timedelta(days=rng.lognormvariate(1.6, 0.9))
+        else:
+            deadline_at = None
+
+        is_important = rng.random() < 0.45
+
+        # Старые задачи чаще выполнены
+        completed = rng.random() < 1 - math.exp(-age_days / 20)
+        if completed:
+            completed_at = min(created_at + timedelta(days=rng.expovariate(1 / 5)), now)
+        else:
+            completed_at = None
+
+        if rng.random() < 0.35:
+            description = None
+        else:
+            length = min(int(rng.lognormvariate(3.5, 0.8)), 500)
+            description = _text(rng, max(1, length // 8))[:500]
+
+        rows.append((
+            f"{_text(rng, rng.randint(1, 4)).capitalize()} #{rng.randint(1, 99_999)}",
+            description,
+            is_important,
+            deadline_at,
+            _quadrant(deadline_at, is_important, today),
+            completed,
+            created_at,
+            completed_at,
+            user_id,
+        ))
+
+    return rows
+
+
+def _zipf_cum_weights(count: int, exponent: float) -> List[float]:
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+async def _next_user_id(conn) -> int:
+    from sqlalchemy import text
+    result = await conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM users"))
+    return result.scalar() + 1
+
+
+async def _copy_rows(conn, table: str, columns: List[str], rows: List[tuple]) -> None:
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(table, records=rows, columns=columns)
+
+
+async def _insert_rows(conn, table: str, columns: List[str], rows: List[tuple]) -> None:
+    from sqlalchemy import text
+    placeholders = ", ".join(f":{column}" for column in columns)
+    statement = text(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})")
+    for i in range(0, len(rows), SQLITE_BATCH_SIZE):
+        await conn.execute(statement, [dict(zip(columns, row)) for row in rows[i:i + SQLITE_BATCH_SIZE]])
+
+
+async def generate(
+    engine,
+    users: int,
+    tasks: int,
+    seed: int = 1,
+    password: str = DEFAULT_PASSWORD,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    zipf_exponent: float = 1.1,
+    workers: int = 1,
+    progress: bool = False
+) -> Dict[str, float]:
+    """
+    Генерирует users пользователей и tasks задач.
+
+    Счетчики users.task_count заполняются генератором, пересчет не нужен.
+    Возвращает статистику: количество строк и скорость вставки.
+    """
+    from auth_utils import get_password_hash
+
+    is_postgres = engine.dialect.name == "postgresql"
+    write_rows = _copy_rows if is_postgres else _insert_rows
+
+    hashed_password = get_password_hash(password)
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+
+    async with engine.begin() as conn:
+        first_id = await _next_user_id(conn)
+
+    user_ids = list(range(first_id, first_id + users))
+    # Перемешиваем ранги, чтобы активные пользователи не шли подряд по id
+    ranked_ids = list(user_ids)
+    random.Random(seed).shuffle(ranked_ids)
+    cum_weights = _zipf_cum_weights(users, zipf_exponent)
+
+    task_counts: Dict[int, int] = {}
+    batches = math.ceil(tasks / batch_size) if tasks else 0
+
+    async with engine.begin() as conn:
+        # Пользователи вставляются первыми (внешний ключ), счетчики обновляются в конце
+        user_rows = [
+            (user_id, user_nickname(user_id), user_email(user_id), hashed_password, "user", 0)
+            for user_id in user_ids
+        ]
+        for i in range(0, len(user_rows), batch_size):
+            await write_rows(conn, "users", USER_COLUMNS, user_rows[i:i + batch_size])
+
+        if is_postgres:
+            from sqlalchemy import text
+            await conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT MAX(id) FROM users))"
+            ))
+
+    # Пакеты генерируются параллельно в процессах (детерминированы по номеру пакета)
+    # и записываются по порядку, пока следующие пакеты уже готовятся
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    pending: deque = deque()
+    next_batch = 0
+    written = 0
+
+    def submit(batch_index: int):
+        size = min(batch_size, tasks - batch_index * batch_size)
+        args = (seed, batch_index, size, ranked_ids, cum_weights, now)
+        if executor is None:
+            future = loop.create_future()
+            future.set_result(generate_task_batch(*args))
+            return future
+        return loop.run_in_executor(executor, generate_task_batch, *args)
+
+    try:
+        while written < tasks:
+            while next_batch < batches and len(pending) < max(workers, 1) * 2:
+                pending.append(submit(next_batch))
+                next_batch += 1
+
+            rows = await pending.popleft()
+            for row in rows:
+                task_counts[row[-1]] = task_counts.get(row[-1], 0) + 1
+
+            # Отдельная транзакция на пакет: ограничивает размер транзакции и WAL
+            async with engine.begin() as conn:
+                await write_rows(conn, "tasks", TASK_COLUMNS, rows)
+
+            written += len(rows)
+            if progress:
+                elapsed = time.perf_counter() - started
+                print(f"  задач: {written}/{tasks} ({written / elapsed:,.0f} строк/с)", flush=True)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    async with engine.begin() as conn:
+        await _write_task_counts(conn, task_counts, is_postgres)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "users": users,
+        "tasks": tasks,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round((users + tasks) / elapsed) if elapsed else 0,
+    }
+
+
+async def _write_task_counts(conn, task_counts: Dict[int, int], is_postgres: bool) -> None:
+    from sqlalchemy import text
+
+    rows = list(task_counts.items())
+    if is_postgres:
+        await conn.execute(text(
+            "CREATE TEMP TABLE datagen_task_counts (id INTEGER PRIMARY KEY, task_count INTEGER) ON COMMIT DROP"
+        ))
+        await _copy_rows(conn, "datagen_task_counts", ["id", "task_count"], rows)
+        await conn.execute(text(
+            "UPDATE users SET task_count = users.task_count + c.task_count "
+            "FROM datagen_task_counts c WHERE users.id = c.id"
+        ))
+    else:
+        statement = text("UPDATE users SET task_count = task_count + :task_count WHERE id = :id")
+        for i in range(0, len(rows), SQLITE_BATCH_SIZE):
+            await conn.execute(
+                statement,
+                [{"id": user_id, "task_count": count} for user_id, count in rows[i:i + SQLITE_BATCH_SIZE]]
+            )
+
+
+async def main_async(args) -> None:
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    sys.path.insert(0, REPO_ROOT)
+
+    from database import engine, init_db
+    # Модели нужны только ради регистрации таблиц в Base.metadata для init_db
+    importlib.import_module("models")
+
+    try:
+        if args.create_schema:
+            await init_db()
+
+        print(f"Генерация: {args.users} пользователей, {args.tasks} задач (seed={args.seed})...")
+        result = await generate(
+            engine,
+            users=args.users,
+            tasks=args.tasks,
+            seed=args.seed,
+            batch_size=args.batch_size,
+            zipf_exponent=args.zipf,
+            workers=args.workers,
+            progress=True
+        )
+    finally:
+        await engine.dispose()
+
+    print(
+        f"✅ Готово за {result['seconds']} с: {result['rows_per_second']:,} строк/с. "
+        f"Пароль пользователей: {DEFAULT_PASSWORD}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Генератор синтетических пользователей и задач")
+    parser.add_argument("--database-url", help="URL базы (по умолчанию DATABASE_URL из окружения)")
+    parser.add_argument("--users", type=int, default=1000, help="Количество пользователей")
+    parser.add_argument("--tasks", type=int, default=100_000, help="Количество задач")
+    parser.add_argument("--seed", type=int, default=1, help="Seed генератора")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Строк в пакете COPY/INSERT")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Показатель распределения задач по пользователям")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Процессов для генерации пакетов (по умолчанию - число ядер)"
+    )
+    parser.add_argument("--create-schema", action="store_true", help="Создать таблицы перед генерацией")
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+# bench/load_test.py
+"""
+Сквозной нагрузочный тест API.
+
+Поднимает приложение (uvicorn в отдельном процессе) на локальной SQLite,
+заполняет базу генератором bench.datagen, прогоняет смешанную нагрузку
+(вход, список, фильтры, поиск, создание, выполнение, статистика,
+админ-обзор) асинхронным HTTP-клиентом на заданных уровнях параллельности
+и выводит p50/p95/p99 и req/s по каждому эндпоинту.
+
+Результаты можно сохранить как baseline и сравнивать с ним последующие
+прогоны: при регрессии сверх допуска процесс завершается с кодом 1.
+
+Запуск (из корня репозитория):
+    pip install -r bench/requirements.txt
+    python -m bench.load_test --users 50 --tasks 5000 --concurrency 1,8,32 --duration 20
+    python -m bench.load_test --save-baseline bench/baseline.json
+    python -m bench.load_test --baseline bench/baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from bench import datagen
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCH_PASSWORD = datagen.DEFAULT_PASSWORD
+
+# Доли операций в смешанной нагрузке
+DEFAULT_MIX = {
+    "login": 2,
+    "list": 30,
+    "filter": 15,
+    "search": 10,
+    "create": 10,
+    "complete": 8,
+    "stats": 20,
+    "admin_overview": 5,
+}
+
+SEARCH_WORDS = datagen.WORDS
+
+
+# ---------------------------------------------------------------------------
+# Подготовка базы
+# ---------------------------------------------------------------------------
+
+async def seed_database(users: int, tasks: int, seed: int) -> None:
+    """Создает схему и заполняет базу генератором bench.datagen, затем добавляет администратора"""
+    from sqlalchemy import insert
+    from database import engine, init_db
+    from models import User
+    from auth_utils import get_password_hash
+
+    await init_db()
+    await datagen.generate(engine, users=users, tasks=tasks, seed=seed, password=BENCH_PASSWORD)
+
+    async with engine.begin() as conn:
+        await conn.execute(insert(User).values(
+            nickname="bench_admin",
+            email="bench_admin@example.com",
+            hashed_password=get_password_hash(BENCH_PASSWORD),
+            role="admin"
+        ))
+
+    await engine.dispose()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(database_url: str) -> Tuple[subprocess.Popen, str]:
+    """Запускает uvicorn в отдельном процессе и ждет ответа /health"""
+    port = _free_port()
+    env = {**os.environ, "DATABASE_URL": database_url, "LOG_LEVEL": "WARNING"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=REPO_ROOT,
+        env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            if process.poll() is not None:
+                raise RuntimeError("Сервер завершился при запуске")
+            try:
+                response = await client.get(f"{base_url}/health")
+                if response.status_code == 200:
+                    return process, base_url
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError("Сервер не ответил на /health за 20 секунд")
+
+
+# ---------------------------------------------------------------------------
+# Нагрузка
+# ---------------------------------------------------------------------------
+
+class Recorder:
+    """Латентности и ошибки по операциям"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, operation: str, elapsed: float, ok: bool) -> None:
+        self.latencies.setdefault(operation, []).append(elapsed)
+        if not ok:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def summary(self, duration: float) -> Dict[str, dict]:
+        result = {}
+        for operation, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            result[operation] = {
+                "requests": len(values),
+                "errors": self.errors.get(operation, 0),
+                "rps": round(len(values) / duration, 2),
+                "p50_ms": round(_percentile(values, 50) * 1000, 2),
+                "p95_ms": round(_percentile(values, 95) * 1000, 2),
+                "p99_ms": round(_percentile(values, 99) * 1000, 2),
+            }
+        return result
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def _login(client: httpx.AsyncClient, email: str) -> Optional[str]:
+    response = await client.post(
+        "/api/v3/auth/login",
+        data={"username": email, "password": BENCH_PASSWORD}
+    )
+    if response.status_code != 200:
+        return None
+    return response.json()["access_token"]
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    users: int,
+    admin_token: str,
+    mix: Dict[str, int],
+    deadline: float,
+    rng: random.Random
+) -> None:
+    # Пользователи datagen получают id 1..users в пустой базе
+    email = datagen.user_email(rng.randint(1, users))
+    token = await _login(client, email)
+    headers = {"Authorization": f"Bearer {token}"}
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    own_pending: List[int] = []
+
+    operations = list(mix)
+    weights = [mix[name] for name in operations]
+
+    while time.perf_counter() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        start = time.perf_counter()
+
+        if operation == "login":
+            ok = await _login(client, email) is not None
+        elif operation == "list":
+            response = await client.get("/api/v3/", headers=headers)
+            ok = response.status_code == 200
+        elif operation == "filter":
+            if rng.random() < 0.5:
+                path = f"/api/v3/status/{rng.choice(['completed', 'pending'])}"
+            else:
+                path = f"/api/v3/quadrant/{rng.choice(['Q1', 'Q2', 'Q3', 'Q4'])}"
+            response = await client.get(path, headers=headers)
+            ok = response.status_code == 200
+        elif operation == "search":
+            response = await client.get(
+                "/api/v3/search", params={"q": rng.choice(SEARCH_WORDS)}, headers=headers
+            )
+            # 404 - штатный ответ "ничего не найдено"
+            ok = response.status_code in (200, 404)
+        elif operation == "create":
+            response = await client.post("/api/v3/", headers=headers, json={
+                "title": f"{rng.choice(SEARCH_WORDS)} bench",
+                "description": "Задача из нагрузочного теста",
+                "is_important": rng.random() < 0.5,
+                "deadline_at": (datetime.now() + timedelta(days=rng.randint(0, 10))).isoformat(),
+            })
+            ok = response.status_code == 201
+            if ok:
+                own_pending.append(response.json()["id"])
+        elif operation == "complete":
+            if not own_pending:
+                continue
+            task_id = own_pending.pop()
+            response = await client.patch(f"/api/v3/task/{task_id}/complete", headers=headers)
+            ok = response.status_code == 200
+        elif operation == "stats":
+            response = await client.get("/api/v3/stats/", headers=headers)
+            ok = response.status_code == 200
+        else:
+            response = await client.get("/api/v3/admin/stats/overview", headers=admin_headers)
+            ok = response.status_code == 200
+
+        recorder.record(operation, time.perf_counter() - start, ok)
+
+
+async def run_level(
+    base_url: str,
+    concurrency: int,
+    duration: float,
+    users: int,
+    mix: Dict[str, int],
+    seed: int
+) -> Dict[str, dict]:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        admin_token = await _login(client, "bench_admin@example.com")
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*[
+            _worker(client, recorder, users, admin_token, mix, deadline, random.Random(seed + i))
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    return recorder.summary(elapsed)
+
+
+# ---------------------------------------------------------------------------
+# Отчет и сравнение с baseline
+# ---------------------------------------------------------------------------
+
+def print_report(results: Dict[str, Dict[str, dict]]) -> None:
+    header = f"{'операция':<16}{'запросов':>10}{'ошибок':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    for level, operations in results.items():
+        print(f"\nПараллельность: {level}")
+        print(header)
+        print("-" * len(header))
+        for name, row in operations.items():
+            print(
+                f"{name:<16}{row['requests']:>10}{row['errors']:>8}{row['rps']:>10}"
+                f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+            )
+
+
+def compare_with_baseline(
+    results: Dict[str, Dict[str, dict]],
+    baseline: Dict[str, Dict[str, dict]],
+    tolerance: float
+) -> List[str]:
+    """Регрессии: p95 выросла или req/s упал больше чем на tolerance"""
+    regressions = []
+    for level, operations in results.items():
+        for name, row in operations.items():
+            base = baseline.get(level, {}).get(name)
+            if base is None:
+                continue
+            if base["p95_ms"] and row["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"[{level}] {name}: p95 {base['p95_ms']} -> {row['p95_ms']} ms"
+                )
+            if base["rps"] and row["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append(
+                    f"[{level}] {name}: req/s {base['rps']} -> {row['rps']}"
+                )
+    return regressions
+
+
+async def main_async(args) -> int:
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        mix = {name: int(weight) for name, weight in (item.split("=") for item in args.mix.split(","))}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database_url = f"sqlite+aiosqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        os.environ["DATABASE_URL"] = database_url
+        sys.path.insert(0, REPO_ROOT)
+
+        print(f"Заполнение базы: {args.users} пользователей, {args.tasks} задач...")
+        await seed_database(args.users, args.tasks, args.seed)
+
+        process, base_url = await start_server(database_url)
+        try:
+            results = {}
+            for level in args.concurrency:
+                print(f"Нагрузка: параллельность {level}, {args.duration} с...")
+                results[str(level)] = await run_level(
+                    base_url, level, args.duration, args.users, mix, args.seed
+                )
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline сохранен: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Регрессии относительно baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\n✅ Регрессий относительно baseline нет")
+
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест ToDo API")
+    parser.add_argument("--users", type=int, default=50, help="Количество пользователей")
+    parser.add_argument("--tasks", type=int, default=5000, help="Количество задач")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda value: [int(level) for level in value.split(",")],
+        default=[1, 8, 32],
+        help="Уровни параллельности через запятую"
+    )
+    parser.add_argument("--duration", type=float, default=20, help="Длительность каждого уровня, с")
+    parser.add_argument("--mix", help="Доли операций: list=30,stats=20,...")
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора данных и нагрузки")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    parser.add_argument("--save-baseline", help="Сохранить результаты как baseline")
+    parser.add_argument("--baseline", help="Сравнить с baseline из JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допуск регрессии (доля)")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# build_frontend.py
+"""
+Сборка фронтенда для production: отпечатки содержимого и предварительное сжатие.
+
+    python build_frontend.py                  # frontend/ -> frontend_dist/
+    python build_frontend.py --src frontend --out frontend_dist
+
+CSS и JS копируются под именами с хэшем содержимого (js/app.3f9c2a1b7d04.js),
+ссылки на них в HTML переписываются, рядом с каждым файлом кладутся сжатые
+варианты .gz и .br (brotli - если установлен пакет brotli). Файлы с хэшем в
+имени никогда не меняются, поэтому их можно кэшировать навсегда
+(см. static_files.PrecompressedStaticFiles). Список соответствий пишется в
+manifest.json.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from typing import Dict
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него собираются только .gz
+    brotli = None
+
+FINGERPRINT_EXTENSIONS = {".css", ".js"}
+COMPRESS_EXTENSIONS = {".css", ".js", ".html", ".json", ".svg", ".txt"}
+# Выигрыш от сжатия совсем маленьких файлов меньше накладных расходов
+MIN_COMPRESS_SIZE = 256
+HASH_LENGTH = 12
+
+# Ссылки на локальные файлы в атрибутах src/href
+ASSET_REFERENCE_RE = re.compile(r'(?P<attr>\b(?:src|href)=")(?P<path>[^"#?:]+)(?P<tail>")')
+
+
+def fingerprint_name(relative_path: str, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{digest}{ext}"
+
+
+def write_compressed(path: str, content: bytes) -> None:
+    """Пишет .gz и .br рядом с файлом, если сжатие дает выигрыш"""
+    if len(content) < MIN_COMPRESS_SIZE:
+        return
+
+    # mtime=0 - одинаковый результат при повторной сборке
+    gzipped = gzip.compress(content, compresslevel=9, mtime=0)
+    if len(gzipped) < len(content):
+        with open(path + ".gz", "wb") as f:
+            f.write(gzipped)
+
+    if brotli is not None:
+        compressed = brotli.compress(content, quality=11)
+        if len(compressed) < len(content):
+            with open(path + ".br", "wb") as f:
+                f.write(compressed)
+
+
+def rewrite_references(html: str, manifest: Dict[str, str], html_dir: str) -> str:
+    def replace(match):
+        path = os.path.normpath(os.path.join(html_dir, match.group("path"))).replace(os.sep, "/")
+        if path not in manifest:
+            return match.group(0)
+        hashed = os.path.relpath(manifest[path], html_dir or ".").replace(os.sep, "/")
+        return f"{match.group('attr')}{hashed}{match.group('tail')}"
+
+    return ASSET_REFERENCE_RE.sub(replace, html)
+
+
+def build(src: str, out: str) -> Dict[str, str]:
+    """Собирает src в out и возвращает manifest: исходный путь -> путь с хэшем"""
+    if os.path.isdir(out):
+        shutil.rmtree(out)
+
+    files = []
+    for root, _, names in os.walk(src):
+        for name in sorted(names):
+            full_path = os.path.join(root, name)
+            files.append(os.path.relpath(full_path, src).replace(os.sep, "/"))
+
+    manifest: Dict[str, str] = {}
+    outputs: Dict[str, bytes] = {}
+
+    # Сначала ассеты с отпечатками, затем HTML со ссылками на них
+    for relative_path in files:
+        with open(os.path.join(src, relative_path), "rb") as f:
+            content = f.read()
+        if os.path.splitext(relative_path)[1] in FINGERPRINT_EXTENSIONS:
+            hashed = fingerprint_name(relative_path, content)
+            manifest[relative_path] = hashed
+            outputs[hashed] = content
+        else:
+            outputs[relative_path] = content
+
+    for relative_path, content in list(outputs.items()):
+        if relative_path.endswith(".html"):
+            html_dir = os.path.dirname(relative_path)
+            outputs[relative_path] = rewrite_references(content.decode("utf-8"), manifest, html_dir).encode("utf-8")
+
+    for relative_path, content in outputs.items():
+        path = os.path.join(out, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        if os.path.splitext(relative_path)[1] in COMPRESS_EXTENSIONS:
+            write_compressed(path, content)
+
+    with open(os.path.join(out, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сборка фронтенда: отпечатки и сжатие")
+    parser.add_argument("--src", default="frontend", help="Исходная папка фронтенда")
+    parser.add_argument("--out", default="frontend_dist", help="Папка сборки")
+    args = parser.parse_args()
+
+    manifest = build(args.src, args.out)
+    print(f"✅ Собрано в {args.out}: {len(manifest)} файлов с отпечатками"
+          + ("" if brotli is not None else " (brotli не установлен - только gzip)"))
+
+
+if __name__ == "__main__":
+    main()
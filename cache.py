@@ -0,0 +1,162 @@
+# cache.py
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# Глобальная область видимости (статистика администратора по всем задачам)
+GLOBAL_SCOPE = "*"
+
+STATS_CACHE_MAX_ENTRIES = int(os.getenv("STATS_CACHE_MAX_ENTRIES", "1024"))
+STATS_CACHE_TTL_SECONDS = float(os.getenv("STATS_CACHE_TTL_SECONDS", "60"))
+
+
+class ReadThroughCache:
+    """
+    Read-through кэш с LRU-вытеснением и защитой от cache stampede.
+
+    Ключ записи - кортеж (namespace, scope, *args), где scope - id пользователя
+    или GLOBAL_SCOPE. Инвалидация выполняется по scope: при записи задач
+    пользователя сбрасываются его записи и глобальные.
+
+    Одновременные промахи по одному ключу схлопываются в одно вычисление:
+    остальные запросы ожидают результат первого.
+
+    Кэш живет в памяти процесса, поэтому при нескольких воркерах каждый
+    держит свою копию, а TTL ограничивает время расхождения между ними.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        # Версии областей: вычисление, начатое до инвалидации, не сохраняется.
+        # Глобальные записи зависят от любой области, поэтому для них - общая эпоха
+        self._versions: Dict[Hashable, int] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _version(self, scope: Hashable) -> int:
+        if scope == GLOBAL_SCOPE:
+            return self._epoch
+        return self._versions.get(scope, 0)
+
+    def _get_fresh(self, key: Tuple) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Tuple, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: Tuple, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Возвращает значение из кэша или вычисляет его ровно один раз"""
+        found, value = self._get_fresh(key)
+        if found:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                # shield: отмена ожидающего запроса не должна отменять общее вычисление
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # Запрос-лидер был отменен - пробуем вычислить заново
+                return await self.get_or_compute(key, compute)
+
+        self.misses += 1
+        scope = key[1]
+        version = self._version(scope)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Исключение уже передано ожидающим, помечаем его полученным
+            future.exception()
+            raise
+        else:
+            if self._version(scope) == version:
+                self._store(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate_scope(self, scope: Hashable) -> None:
+        """Сбрасывает записи области и глобальные записи, зависящие от нее"""
+        self._epoch += 1
+        if scope != GLOBAL_SCOPE:
+            self._versions[scope] = self._versions.get(scope, 0) + 1
+        scopes = {scope, GLOBAL_SCOPE}
+        for key in [k for k in self._entries if k[1] in scopes]:
+            del self._entries[key]
+        self.invalidations += 1
+
+    def invalidate_user(self, user_id: Optional[int]) -> None:
+        """Инвалидация после изменения задач пользователя"""
+        self.invalidate_scope(user_id if user_id is not None else GLOBAL_SCOPE)
+
+    def invalidate_global(self) -> None:
+        """Инвалидация после изменения пользователей (влияет только на глобальные записи)"""
+        self.invalidate_scope(GLOBAL_SCOPE)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._epoch += 1
+        for scope in self._versions:
+            self._versions[scope] += 1
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round((self.hits + self.coalesced) / lookups * 100, 1) if lookups else 0.0
+        }
+
+
+# Кэш для /stats/* и /admin/stats/overview
+stats_cache = ReadThroughCache(
+    max_entries=STATS_CACHE_MAX_ENTRIES,
+    ttl_seconds=STATS_CACHE_TTL_SECONDS
+)
+
+
+def stats_scope(user) -> Hashable:
+    """Область кэша: администратор видит все задачи, пользователь - только свои"""
+    return GLOBAL_SCOPE if user.role == "admin" else user.id
@@ -1,25 +1,87 @@
+from fastapi import Request
+from sqlalchemy import MetaData, select
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
-from typing import AsyncGenerator
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from typing import AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+import asyncio
 import os
+import time
 import uuid
+import logging
 from dotenv import load_dotenv
+from metrics import observe_pool_wait, register_pool
+from auth_utils import decode_access_token
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
 class Base(DeclarativeBase):
     pass
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Создание асинхронного движка базы данных с отключением кэширования prepared statements
-engine = create_async_engine(
-    DATABASE_URL,
-    connect_args={
-        "statement_cache_size": 0,  # Отключаем кэш prepared statements
-        "prepared_statement_name_func": lambda: f"stmt_{uuid.uuid4().hex}"  # Уникальные имена для statements
-    }
-)
+# Размер пула на процесс: при нескольких воркерах соединений к БД в WEB_WORKERS раз больше
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, измеряющий время ожидания свободного соединения"""
+
+    # Логи пула остаются в иерархии логгеров sqlalchemy (уровень WARNING по умолчанию)
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.InstrumentedAsyncQueuePool"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Начало ожидания для каждого незавершенного получения соединения
+        self._waiting: Dict[object, float] = {}
+
+    def _do_get(self):
+        start = time.perf_counter()
+        waiter = object()
+        self._waiting[waiter] = start
+        try:
+            return super()._do_get()
+        finally:
+            del self._waiting[waiter]
+            observe_pool_wait(time.perf_counter() - start)
+
+    def longest_wait(self) -> float:
+        """Сколько секунд ждет соединения самый давний из ожидающих (0 - никто не ждет)"""
+        if not self._waiting:
+            return 0.0
+        return time.perf_counter() - min(self._waiting.values())
+
+
+def _connect_args(url: str) -> dict:
+    # Параметры asyncpg: отключаем кэширование prepared statements (pgbouncer в Supabase).
+    # Для других драйверов (SQLite в бенчмарках) параметры не передаются
+    if url and url.startswith("postgresql+asyncpg"):
+        return {
+            "statement_cache_size": 0,  # Отключаем кэш prepared statements
+            "prepared_statement_name_func": lambda: f"stmt_{uuid.uuid4().hex}"  # Уникальные имена для statements
+        }
+    return {}
+
+
+def _create_engine(url: str):
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        connect_args=_connect_args(url)
+    )
+
+
+# Создание асинхронного движка базы данных
+engine = _create_engine(DATABASE_URL)
+
+register_pool(engine.sync_engine.pool)
 
 # Создание фабрики асинхронных сессий
 AsyncSessionLocal = async_sessionmaker(
@@ -29,21 +91,145 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 
+# Шардирование задач по user_id.
+# Основная база (DATABASE_URL) - шард 0: в ней пользователи, журнал, задания и задачи
+# части пользователей. DATABASE_SHARD_URLS - адреса шардов 1..N-1 через запятую.
+# Таблицы SHARDED_TABLES пользователя лежат в его шарде, остальные - в основной базе;
+# сессия шарда выбирает движок по таблице запроса (binds).
+DATABASE_SHARD_URLS = [url.strip() for url in os.getenv("DATABASE_SHARD_URLS", "").split(",") if url.strip()]
+SHARDED_TABLES = ("tasks", "task_tags", "tags", "recurring_tasks", "task_daily_stats", "reminder_outbox")
+
+shard_engines = [engine] + [_create_engine(url) for url in DATABASE_SHARD_URLS]
+_shard_sessionmakers = [AsyncSessionLocal]
+
+
+def shard_count() -> int:
+    return len(shard_engines)
+
+
+def shard_for_user(user_id: int) -> int:
+    """
+    Шард пользователя: jump consistent hash от user_id.
+
+    При добавлении шарда в конец списка переезжает только ~1/N пользователей;
+    их задачи нужно перенести до переключения конфигурации.
+    """
+    count = shard_count()
+    if count == 1:
+        return 0
+    key = user_id & 0xFFFFFFFFFFFFFFFF
+    bucket, candidate = -1, 0
+    while candidate < count:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_sessionmaker(shard: int) -> async_sessionmaker:
+    """Фабрика сессий шарда: таблицы SHARDED_TABLES - в шарде, остальные - в основной базе"""
+    while len(_shard_sessionmakers) <= shard:
+        # Таблицы берутся из метаданных при первом обращении - модели к этому времени импортированы
+        shard_engine = shard_engines[len(_shard_sessionmakers)]
+        _shard_sessionmakers.append(async_sessionmaker(
+            bind=engine,
+            binds={Base.metadata.tables[name]: shard_engine for name in SHARDED_TABLES},
+            autoflush=False,
+            expire_on_commit=False
+        ))
+    return _shard_sessionmakers[shard]
+
+
+def all_shard_sessionmakers() -> List[async_sessionmaker]:
+    return [shard_sessionmaker(shard) for shard in range(shard_count())]
+
+
+async def gather_shards(query: Callable[[AsyncSession], Awaitable[T]]) -> List[T]:
+    """Scatter-gather: query(session) параллельно на каждом шарде, результаты по порядку шардов"""
+    async def run(factory: async_sessionmaker) -> T:
+        async with factory() as session:
+            return await query(session)
+    return await asyncio.gather(*(run(factory) for factory in all_shard_sessionmakers()))
+
+
+def _shard_metadata() -> MetaData:
+    """Таблицы шарда без внешних ключей на users (пользователи - в основной базе)"""
+    metadata = MetaData()
+    for name in SHARDED_TABLES:
+        Base.metadata.tables[name].to_metadata(metadata)
+    for table in metadata.tables.values():
+        for constraint in list(table.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.startswith("users."):
+                table.constraints.discard(constraint)
+                for foreign_key in constraint.elements:
+                    foreign_key.parent.foreign_keys.discard(foreign_key)
+                    table.foreign_keys.discard(foreign_key)
+    return metadata
+
+
 async def init_db():
     """
     Инициализация базы данных - создание всех таблиц.
     """
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    print("✅ База данных инициализирована!")
+    if len(shard_engines) > 1:
+        shard_metadata = _shard_metadata()
+        for shard_engine in shard_engines[1:]:
+            async with shard_engine.begin() as conn:
+                await conn.run_sync(shard_metadata.create_all)
+    logger.info("✅ База данных инициализирована!")
+
+
+async def find_task_shard(task_id: int, preferred: int = 0) -> int:
+    """
+    Шард, в котором лежит задача (включая корзину): поиск по первичному ключу
+    параллельно на всех шардах. Если задачи нигде нет - preferred.
+    """
+    tasks = Base.metadata.tables["tasks"]
 
+    async def exists(shard_engine) -> bool:
+        async with shard_engine.connect() as conn:
+            result = await conn.execute(select(tasks.c.id).where(tasks.c.id == task_id))
+            return result.first() is not None
 
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    found = await asyncio.gather(*(exists(shard_engine) for shard_engine in shard_engines))
+    if found[preferred]:
+        return preferred
+    return next((shard for shard, present in enumerate(found) if present), preferred)
+
+
+def _request_identity(request: Request) -> Tuple[Optional[int], Optional[str]]:
+    """(user_id, role) из Bearer-токена (без обращения к БД); проверка токена - в get_current_user"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None, None
+    payload = decode_access_token(token)
+    try:
+        return (int(payload["sub"]), payload.get("role")) if payload else (None, None)
+    except (KeyError, TypeError, ValueError):
+        return None, None
+
+
+async def get_async_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
     Dependency для получения асинхронной сессии базы данных.
     
+    Сессия привязана к шарду текущего пользователя (по токену запроса);
+    без токена - к основной базе. Запрос администратора к задаче по id
+    (путь с {task_id}) идет в шард, где эта задача лежит.
+    
     Yields:
         AsyncSession: Асинхронная сессия для работы с БД
     """
-    async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+    factory = AsyncSessionLocal
+    if len(shard_engines) > 1:
+        user_id, role = _request_identity(request)
+        shard = shard_for_user(user_id) if user_id is not None else 0
+        task_id = request.path_params.get("task_id")
+        if role == "admin" and task_id is not None and str(task_id).isdigit():
+            # Права проверяются в обработчике - роль из токена выбирает только базу
+            shard = await find_task_shard(int(task_id), preferred=shard)
+        factory = shard_sessionmaker(shard)
+    async with factory() as session:
+        yield session
@@ -0,0 +1,293 @@
+# deadlines.py
+"""
+Дедлайны запросов, statement_timeout и сброс нагрузки для /api.
+
+- Каждый запрос получает дедлайн: REQUEST_DEADLINE секунд от начала, маршрут
+  может задать свой зависимостью request_deadline(seconds). Middleware находит
+  маршрут запроса и берет его дедлайн сразу, до чтения тела: FastAPI читает
+  тело (загрузку файла) раньше, чем вызывает зависимости. По истечении
+  дедлайна обработка прерывается, клиент получает 504.
+- Транзакция сессии SQLAlchemy в рамках запроса начинается с SET LOCAL
+  statement_timeout, равного остатку дедлайна (только PostgreSQL): тяжелый
+  запрос отменяется на сервере БД и не держит соединение пула.
+- Если клиент отключился, не дождавшись ответа, обработка отменяется; asyncpg
+  при отмене посылает серверу cancel request, и запрос в БД тоже прерывается.
+- Если соединения из пула кто-то ждет дольше LOAD_SHED_POOL_WAIT секунд, новые
+  запросы сразу получают 503 с Retry-After, а не встают в очередь к пулу.
+
+Переменные окружения:
+- REQUEST_DEADLINE - дедлайн по умолчанию, секунды (по умолчанию 10)
+- LOAD_SHED_POOL_WAIT - порог ожидания пула, секунды (по умолчанию 1, 0 - не сбрасывать нагрузку)
+- LOAD_SHED_RETRY_AFTER - значение Retry-After, секунды (по умолчанию 2)
+"""
+import asyncio
+import json
+import logging
+import os
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event, exc
+from starlette.routing import Match
+from sqlalchemy.orm import Session
+
+from metrics import Counter, registry
+
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "10"))
+LOAD_SHED_POOL_WAIT = float(os.getenv("LOAD_SHED_POOL_WAIT", "1"))
+LOAD_SHED_RETRY_AFTER = int(os.getenv("LOAD_SHED_RETRY_AFTER", "2"))
+API_PREFIX = "/api/"
+# SQLSTATE query_canceled: сработал statement_timeout
+QUERY_CANCELED = "57014"
+
+logger = logging.getLogger(__name__)
+
+requests_aborted_total = registry.register(Counter(
+    "http_requests_aborted_total",
+    "Запросы, прерванные до завершения (shed, deadline, statement_timeout, disconnect)",
+    ["reason"]
+))
+
+
+class RequestDeadline:
+    """Дедлайн текущего запроса по часам event loop"""
+
+    def __init__(self, seconds: float):
+        self._loop = asyncio.get_running_loop()
+        self.started_at = self._loop.time()
+        self.expires_at = self.started_at + seconds
+        self._timeout: Optional[asyncio.Timeout] = None
+
+    def remaining(self) -> float:
+        return self.expires_at - self._loop.time()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def set(self, seconds: float) -> None:
+        """Дедлайн маршрута - seconds от начала запроса"""
+        self.expires_at = self.started_at + seconds
+        if self._timeout is not None:
+            self._timeout.reschedule(self.expires_at)
+
+
+_current_deadline: ContextVar[Optional[RequestDeadline]] = ContextVar("request_deadline", default=None)
+
+
+def request_deadline(seconds: float) -> Callable[[], None]:
+    """
+    Зависимость маршрута (или роутера): дедлайн запроса seconds секунд.
+
+    DeadlineMiddleware читает seconds из зависимостей маршрута до обработки
+    запроса; вызов зависимости дедлайн уже не меняет.
+    """
+    async def set_deadline() -> None:
+        deadline = _current_deadline.get()
+        if deadline is not None:
+            deadline.set(seconds)
+    set_deadline.deadline_seconds = seconds
+    return set_deadline
+
+
+def _route_deadline(scope) -> Optional[float]:
+    """Дедлайн из зависимостей request_deadline маршрута, которому соответствует запрос"""
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for route in getattr(router, "routes", ()):
+        match, _ = route.matches(scope)
+        if match != Match.FULL:
+            continue
+        for dependency in getattr(route, "dependencies", ()):
+            seconds = getattr(dependency.dependency, "deadline_seconds", None)
+            if seconds is not None:
+                return seconds
+        return None
+    return None
+
+
+@event.listens_for(Session, "after_begin")
+def _set_statement_timeout(session: Session, transaction, connection) -> None:
+    deadline = _current_deadline.get()
+    if deadline is None or connection.dialect.name != "postgresql":
+        return
+    # SET LOCAL действует до конца транзакции - безопасно с pgbouncer в режиме transaction
+    timeout_ms = max(int(deadline.remaining() * 1000), 1)
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+class _DisconnectWatcher:
+    """
+    Следит за http.disconnect, не мешая приложению читать тело запроса.
+
+    Пока тело не прочитано, receive приложения проходит насквозь; после
+    последнего фрагмента (или сразу, если тела нет) сообщения читает фоновая
+    задача и передает их приложению через очередь.
+    """
+
+    def __init__(self, receive, body_expected: bool):
+        self._receive = receive
+        self._messages: asyncio.Queue = asyncio.Queue()
+        self._listener: Optional[asyncio.Task] = None
+        self.disconnected = asyncio.Event()
+        if not body_expected:
+            self._listen()
+
+    def _listen(self) -> None:
+        self._listener = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        while True:
+            message = await self._receive()
+            await self._messages.put(message)
+            if message["type"] == "http.disconnect":
+                self.disconnected.set()
+                return
+
+    async def receive(self):
+        if self._listener is None:
+            message = await self._receive()
+            if message["type"] == "http.disconnect":
+                self.disconnected.set()
+            elif not message.get("more_body", False):
+                self._listen()
+            return message
+        if self._messages.empty() and self.disconnected.is_set():
+            return {"type": "http.disconnect"}
+        return await self._messages.get()
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+
+
+def _body_expected(scope) -> bool:
+    for name, value in scope.get("headers", []):
+        if name == b"transfer-encoding" or (name == b"content-length" and value.strip() != b"0"):
+            return True
+    return False
+
+
+async def _send_error(send, status_code: int, detail: str, headers: Optional[dict] = None) -> None:
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+    raw_headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("latin-1")),
+    ]
+    raw_headers.extend((name.encode("latin-1"), value.encode("latin-1")) for name, value in (headers or {}).items())
+    await send({"type": "http.response.start", "status": status_code, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class DeadlineMiddleware:
+    """ASGI middleware: дедлайн запроса, отмена при отключении клиента, сброс нагрузки"""
+
+    def __init__(
+        self,
+        app,
+        pool=None,
+        deadline: float = REQUEST_DEADLINE,
+        shed_pool_wait: float = LOAD_SHED_POOL_WAIT,
+        retry_after: int = LOAD_SHED_RETRY_AFTER
+    ):
+        self.app = app
+        self.pool = pool
+        self.deadline = deadline
+        self.shed_pool_wait = shed_pool_wait
+        self.retry_after = retry_after
+
+    def _overloaded(self) -> bool:
+        if self.shed_pool_wait <= 0 or self.pool is None or not hasattr(self.pool, "longest_wait"):
+            return False
+        return self.pool.longest_wait() > self.shed_pool_wait
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(API_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        if self._overloaded():
+            requests_aborted_total.inc("shed")
+            await _send_error(
+                send, 503, "Сервер перегружен, повторите запрос позже",
+                {"retry-after": str(self.retry_after)}
+            )
+            return
+
+        route_deadline = _route_deadline(scope)
+        deadline = RequestDeadline(route_deadline if route_deadline is not None else self.deadline)
+        token = _current_deadline.set(deadline)
+        watcher = _DisconnectWatcher(receive, _body_expected(scope))
+        response_started = False
+        response_complete = False
+
+        async def send_wrapper(message):
+            nonlocal response_started, response_complete
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        async def run_app():
+            async with asyncio.timeout_at(deadline.expires_at) as timeout:
+                deadline._timeout = timeout
+                await self.app(scope, watcher.receive, send_wrapper)
+
+        # Задача копирует контекст - дедлайн виден зависимостям и событиям сессии
+        app_task = asyncio.create_task(run_app())
+        disconnected = asyncio.create_task(watcher.disconnected.wait())
+        try:
+            await asyncio.wait({app_task, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+
+            # После отправки ответа disconnect - обычное закрытие соединения
+            if not app_task.done() and not response_complete:
+                app_task.cancel()
+                try:
+                    await app_task
+                except asyncio.CancelledError:
+                    pass
+                requests_aborted_total.inc("disconnect")
+                logger.info("Клиент отключился, запрос отменен", extra={"path": scope["path"]})
+                if not response_started:
+                    # Сервер не отправит ответ отключившемуся клиенту - статус нужен метрикам
+                    await _send_error(send, 499, "Клиент отключился")
+                return
+
+            try:
+                await app_task
+            except TimeoutError:
+                if not deadline.expired():
+                    raise
+                requests_aborted_total.inc("deadline")
+                logger.warning(
+                    "Превышен дедлайн запроса",
+                    extra={"path": scope["path"], "deadline": round(deadline.expires_at - deadline.started_at, 3)}
+                )
+                if not response_started:
+                    await _send_error(send, 504, "Превышено время обработки запроса")
+        finally:
+            if not app_task.done():
+                app_task.cancel()
+            disconnected.cancel()
+            watcher.close()
+            _current_deadline.reset(token)
+
+
+async def database_timeout_handler(request: Request, error: exc.DBAPIError) -> JSONResponse:
+    """statement_timeout -> 504; прочие ошибки БД обрабатываются как раньше"""
+    if getattr(error.orig, "sqlstate", None) != QUERY_CANCELED:
+        raise error
+    requests_aborted_total.inc("statement_timeout")
+    return JSONResponse(status_code=504, content={"detail": "Превышено время обработки запроса"})
+
+
+async def pool_timeout_handler(request: Request, error: exc.TimeoutError) -> JSONResponse:
+    """Соединение из пула не получено за pool_timeout -> 503"""
+    requests_aborted_total.inc("shed")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Сервер перегружен, повторите запрос позже"},
+        headers={"Retry-After": str(LOAD_SHED_RETRY_AFTER)}
+    )
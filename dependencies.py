@@ -1,4 +1,5 @@
 # dependencies.py
+import logging
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -8,6 +9,8 @@ from models import User, UserRole
 from auth_utils import decode_access_token
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 # OAuth2 схема для получения токена из заголовка Authorization
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v3/auth/login")
 
@@ -24,11 +27,9 @@ async def get_current_user(
     )
     
     # Декодирование токена
-    print(f"DEBUG: Получен токен: {token[:20]}...")
     payload = decode_access_token(token)
-    print(f"DEBUG: Декодированный payload: {payload}")
     if payload is None:
-        print("DEBUG: Токен невалидный, вызываем исключение")
+        logger.debug("Невалидный токен")
         raise credentials_exception
     
     user_id: Optional[int] = payload.get("sub")
@@ -1,10 +1,196 @@
+// Квадранты с большим числом задач рендерятся виртуально: в DOM только видимые карточки
+const VIRTUAL_THRESHOLD = 150;
+const VIRTUAL_ROW_HEIGHT = 132;
+const VIRTUAL_OVERSCAN = 5;
+
+// Размер страницы каталога пользователей в админ-панели (максимум API)
+const ADMIN_PAGE_SIZE = 100;
+
+// Локальное хранилище задач по id: изменения применяются к нему, а доска
+// перерисовывает только затронутые карточки
+class TaskStore {
+    constructor() {
+        this.tasks = new Map();
+    }
+    
+    replaceAll(tasks) {
+        this.tasks = new Map(tasks.map(task => [String(task.id), task]));
+    }
+    
+    get(id) {
+        return this.tasks.get(String(id));
+    }
+    
+    upsert(task) {
+        this.tasks.set(String(task.id), task);
+    }
+    
+    remove(id) {
+        this.tasks.delete(String(id));
+    }
+    
+    // Удаляет задачу вместе с подзадачами (сервер удаляет поддерево целиком)
+    removeSubtree(id) {
+        const removed = [];
+        const queue = [String(id)];
+        while (queue.length > 0) {
+            const current = queue.shift();
+            const task = this.tasks.get(current);
+            if (task) {
+                removed.push(task);
+                this.tasks.delete(current);
+            }
+            for (const child of this.tasks.values()) {
+                if (String(child.parent_id) === current) {
+                    queue.push(String(child.id));
+                }
+            }
+        }
+        return removed;
+    }
+    
+    values() {
+        return this.tasks.values();
+    }
+}
+
+// Тело одного квадранта: карточки по ключу (id задачи), без пересборки всего списка
+class QuadrantView {
+    constructor(container, renderCard) {
+        this.container = container;
+        this.renderCard = renderCard;
+        this.ids = [];
+        this.nodes = new Map();
+        this.mode = null;
+        this.framePending = false;
+    }
+    
+    update(ids, changedIds = new Set()) {
+        this.ids = ids;
+        
+        if (ids.length === 0) {
+            this.reset('empty');
+            this.container.innerHTML = '<div class="text-center text-muted py-3">Задач нет</div>';
+            return;
+        }
+        
+        if (ids.length > VIRTUAL_THRESHOLD) {
+            if (this.mode !== 'virtual') {
+                this.enterVirtualMode();
+            }
+            this.spacer.style.height = `${ids.length * VIRTUAL_ROW_HEIGHT}px`;
+            this.renderWindow(changedIds);
+            return;
+        }
+        
+        if (this.mode !== 'list') {
+            this.reset('list');
+        }
+        this.reconcile(ids, changedIds);
+    }
+    
+    reset(mode) {
+        this.mode = mode;
+        this.nodes.clear();
+        this.container.innerHTML = '';
+    }
+    
+    createNode(id) {
+        const template = document.createElement('template');
+        template.innerHTML = this.renderCard(id).trim();
+        return template.content.firstElementChild;
+    }
+    
+    // Узел карточки: существующий или новый, если задача изменилась
+    nodeFor(id, changedIds) {
+        const node = this.nodes.get(id);
+        if (node && !changedIds.has(id)) {
+            return node;
+        }
+        
+        const fresh = this.createNode(id);
+        if (node) {
+            node.replaceWith(fresh);
+        }
+        this.nodes.set(id, fresh);
+        return fresh;
+    }
+    
+    reconcile(ids, changedIds) {
+        const keep = new Set(ids);
+        this.nodes.forEach((node, id) => {
+            if (!keep.has(id)) {
+                node.remove();
+                this.nodes.delete(id);
+            }
+        });
+        
+        // Переставляем только карточки не на своем месте
+        let cursor = this.container.firstElementChild;
+        ids.forEach(id => {
+            const previous = this.nodes.get(id);
+            const node = this.nodeFor(id, changedIds);
+            if (previous === cursor && node !== previous) {
+                cursor = node;
+            }
+            if (node === cursor) {
+                cursor = cursor.nextElementSibling;
+            } else {
+                this.container.insertBefore(node, cursor);
+            }
+        });
+    }
+    
+    enterVirtualMode() {
+        this.reset('virtual');
+        this.container.innerHTML = '<div class="virtual-list"><div class="virtual-spacer"></div></div>';
+        this.viewport = this.container.firstElementChild;
+        this.spacer = this.viewport.firstElementChild;
+        this.viewport.addEventListener('scroll', () => {
+            if (this.framePending) {
+                return;
+            }
+            this.framePending = true;
+            requestAnimationFrame(() => {
+                this.framePending = false;
+                this.renderWindow();
+            });
+        });
+    }
+    
+    renderWindow(changedIds = new Set()) {
+        const height = this.viewport.clientHeight || window.innerHeight;
+        const scrollTop = this.viewport.scrollTop;
+        const first = Math.max(0, Math.floor(scrollTop / VIRTUAL_ROW_HEIGHT) - VIRTUAL_OVERSCAN);
+        const last = Math.min(this.ids.length, Math.ceil((scrollTop + height) / VIRTUAL_ROW_HEIGHT) + VIRTUAL_OVERSCAN);
+        const visible = new Set(this.ids.slice(first, last));
+        
+        this.nodes.forEach((node, id) => {
+            if (!visible.has(id)) {
+                node.remove();
+                this.nodes.delete(id);
+            }
+        });
+        
+        for (let index = first; index < last; index++) {
+            const node = this.nodeFor(this.ids[index], changedIds);
+            node.style.transform = `translateY(${index * VIRTUAL_ROW_HEIGHT}px)`;
+            if (!node.parentNode) {
+                this.viewport.appendChild(node);
+            }
+        }
+    }
+}
+
 class ToDoApp {
     constructor() {
         this.currentPage = 'tasks';
         this.currentFilter = 'all';
         this.currentQuadrant = null;
-        this.tasks = [];
-        
+        this.store = new TaskStore();
+        this.quadrantViews = {};
+        this.tempTaskCounter = 0;
+
         this.init();
     }
     
@@ -86,14 +272,18 @@ class ToDoApp {
         document.addEventListener('click', (e) => {
             if (e.target.classList.contains('task-checkbox')) {
                 const taskId = e.target.dataset.taskId;
+                if (this.store.get(taskId)?.pending) {
+                    e.preventDefault();
+                    return;
+                }
                 this.toggleTaskComplete(taskId);
             }
             
             // Обработчик для кнопки редактирования
             if (e.target.closest('.edit-task')) {
                 const taskId = e.target.closest('.edit-task').dataset.taskId;
-                const task = this.tasks.find(t => t.id == taskId);
-                if (task) {
+                const task = this.store.get(taskId);
+                if (task && !task.pending) {
                     this.showTaskModal(task);
                 }
             }
@@ -103,6 +293,13 @@ class ToDoApp {
                 const taskId = e.target.closest('.delete-task').dataset.taskId;
                 this.deleteTask(taskId);
             }
+            
+            // Переключение страниц каталога пользователей
+            const adminPageLink = e.target.closest('.admin-page');
+            if (adminPageLink) {
+                e.preventDefault();
+                this.loadAdminPage(Number(adminPageLink.dataset.offset));
+            }
         });
     }
     
@@ -141,7 +338,7 @@ class ToDoApp {
             }
         });
         
-        this.loadTasksPage();
+        this.showTasksBoard();
     }
     
     setQuadrantFilter(quadrant) {
@@ -154,7 +351,16 @@ class ToDoApp {
             }
         });
         
-        this.loadTasksPage();
+        this.showTasksBoard();
+    }
+    
+    // Фильтры применяются к локальному хранилищу, без повторной загрузки задач
+    showTasksBoard() {
+        if (this.currentPage === 'tasks' && document.getElementById('tasksBoard')) {
+            this.refreshBoard();
+        } else {
+            this.loadTasksPage();
+        }
     }
     
     async loadTasksPage() {
@@ -187,7 +393,7 @@ class ToDoApp {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             
-            this.tasks = await response.json();
+            this.store.replaceAll(await response.json());
             this.renderTasks();
         } catch (error) {
             this.showError('Ошибка загрузки задач');
@@ -196,41 +402,29 @@ class ToDoApp {
         }
     }
     
-    renderTasks() {
-        const mainContent = document.getElementById('mainContent');
-        
-        let filteredTasks = [...this.tasks];
-        
-        if (this.currentFilter === 'pending') {
-            filteredTasks = filteredTasks.filter(task => !task.completed);
-        } else if (this.currentFilter === 'completed') {
-            filteredTasks = filteredTasks.filter(task => task.completed);
+    isTaskVisible(task) {
+        if (this.currentFilter === 'pending' && task.completed) {
+            return false;
         }
-        
-        if (this.currentQuadrant) {
-            filteredTasks = filteredTasks.filter(task => task.quadrant === this.currentQuadrant);
+        if (this.currentFilter === 'completed' && !task.completed) {
+            return false;
         }
-        
-        const tasksByQuadrant = {
-            'Q1': [],
-            'Q2': [],
-            'Q3': [],
-            'Q4': []
-        };
-        
-        filteredTasks.forEach(task => {
-            tasksByQuadrant[task.quadrant].push(task);
-        });
+        return !this.currentQuadrant || task.quadrant === this.currentQuadrant;
+    }
+    
+    // Каркас доски строится один раз, карточки дальше обновляет refreshBoard
+    renderTasks() {
+        const mainContent = document.getElementById('mainContent');
         
         let html = `
             <div class="d-flex justify-content-between align-items-center mb-4">
                 <h2>Мои задачи</h2>
                 <div>
-                    <span class="badge bg-secondary">Всего: ${filteredTasks.length}</span>
+                    <span class="badge bg-secondary" id="tasksTotal">Всего: 0</span>
                 </div>
             </div>
             
-            <div class="row">
+            <div class="row" id="tasksBoard">
         `;
         
         // Добавляем квадранты
@@ -256,11 +450,10 @@ class ToDoApp {
                             <h6 class="mb-0">
                                 <span class="badge bg-white text-${quadrantColors[quadrant]} me-2">${quadrant}</span>
                                 ${quadrantNames[quadrant]}
-                                <span class="badge bg-light text-dark float-end">${tasksByQuadrant[quadrant].length}</span>
+                                <span class="badge bg-light text-dark float-end" id="quadrant-count-${quadrant.toLowerCase()}">0</span>
                             </h6>
                         </div>
                         <div class="card-body" id="quadrant-${quadrant.toLowerCase()}">
-                            ${this.renderQuadrantTasks(tasksByQuadrant[quadrant])}
                         </div>
                     </div>
                 </div>
@@ -270,70 +463,103 @@ class ToDoApp {
         html += `</div>`;
         
         mainContent.innerHTML = html;
+        
+        this.quadrantViews = {};
+        ['Q1', 'Q2', 'Q3', 'Q4'].forEach(quadrant => {
+            this.quadrantViews[quadrant] = new QuadrantView(
+                document.getElementById(`quadrant-${quadrant.toLowerCase()}`),
+                id => this.renderTaskCard(this.store.get(id))
+            );
+        });
+        
+        this.refreshBoard();
     }
     
-    renderQuadrantTasks(tasks) {
-        if (tasks.length === 0) {
-            return '<div class="text-center text-muted py-3">Задач нет</div>';
+    // Пересчитывает списки квадрантов по хранилищу и перерисовывает только changedIds
+    refreshBoard(changedIds = new Set()) {
+        if (!document.getElementById('tasksBoard')) {
+            return;
         }
         
-        let html = '';
-        tasks.forEach(task => {
-            const daysLeft = calculateDaysUntilDeadline(task.deadline_at);
-            let deadlineBadge = '';
-            
-            if (daysLeft !== null) {
-                if (daysLeft < 0) {
-                    deadlineBadge = `<span class="badge bg-danger">Просрочено ${Math.abs(daysLeft)} д.</span>`;
-                } else if (daysLeft === 0) {
-                    deadlineBadge = `<span class="badge bg-warning">Сегодня</span>`;
-                } else if (daysLeft <= 3) {
-                    deadlineBadge = `<span class="badge bg-warning">${daysLeft} д.</span>`;
-                } else {
-                    deadlineBadge = `<span class="badge bg-secondary">${daysLeft} д.</span>`;
-                }
+        const idsByQuadrant = { 'Q1': [], 'Q2': [], 'Q3': [], 'Q4': [] };
+        const sortKey = task => typeof task.id === 'number' ? task.id : Number.MAX_SAFE_INTEGER;
+        const visibleTasks = [...this.store.values()]
+            .filter(task => this.isTaskVisible(task))
+            .sort((a, b) => sortKey(a) - sortKey(b));
+        
+        visibleTasks.forEach(task => {
+            idsByQuadrant[task.quadrant].push(String(task.id));
+        });
+        
+        const changed = new Set([...changedIds].map(String));
+        Object.entries(idsByQuadrant).forEach(([quadrant, ids]) => {
+            this.quadrantViews[quadrant].update(ids, changed);
+            document.getElementById(`quadrant-count-${quadrant.toLowerCase()}`).textContent = ids.length;
+        });
+        document.getElementById('tasksTotal').textContent = `Всего: ${visibleTasks.length}`;
+    }
+    
+    renderTaskCard(task) {
+        const daysLeft = calculateDaysUntilDeadline(task.deadline_at);
+        let deadlineBadge = '';
+        
+        if (daysLeft !== null) {
+            if (daysLeft < 0) {
+                deadlineBadge = `<span class="badge bg-danger">Просрочено ${Math.abs(daysLeft)} д.</span>`;
+            } else if (daysLeft === 0) {
+                deadlineBadge = `<span class="badge bg-warning">Сегодня</span>`;
+            } else if (daysLeft <= 3) {
+                deadlineBadge = `<span class="badge bg-warning">${daysLeft} д.</span>`;
+            } else {
+                deadlineBadge = `<span class="badge bg-secondary">${daysLeft} д.</span>`;
             }
-            
-            const taskClass = task.completed ? 'task-item completed' : 'task-item';
-            
-            html += `
-                <div class="${taskClass}" data-task-id="${task.id}">
-                    <div class="d-flex justify-content-between align-items-start">
-                        <div class="flex-grow-1 me-2">
-                            <div class="form-check">
-                                <input class="form-check-input task-checkbox" type="checkbox" 
-                                       data-task-id="${task.id}" ${task.completed ? 'checked' : ''}>
-                                <label class="form-check-label task-title">
-                                    ${escapeHtml(task.title)}
-                                </label>
-                            </div>
-                            ${task.description ? `
-                                <small class="text-muted d-block mt-1">
-                                    ${escapeHtml(task.description.substring(0, 50))}
-                                    ${task.description.length > 50 ? '...' : ''}
-                                </small>
-                            ` : ''}
-                            <div class="mt-2">
-                                ${deadlineBadge}
-                                <small class="text-muted ms-2">
-                                    ${formatDate(task.created_at)}
-                                </small>
-                            </div>
+        }
+        
+        const subtasksBadge = task.subtasks_total > 0
+            ? `<span class="badge bg-info ms-1" title="Выполнено подзадач">${task.subtasks_completed}/${task.subtasks_total}</span>`
+            : '';
+        
+        let taskClass = task.completed ? 'task-item completed' : 'task-item';
+        if (task.pending) {
+            taskClass += ' pending';
+        }
+        
+        return `
+            <div class="${taskClass}" data-task-id="${task.id}">
+                <div class="d-flex justify-content-between align-items-start">
+                    <div class="flex-grow-1 me-2">
+                        <div class="form-check">
+                            <input class="form-check-input task-checkbox" type="checkbox" 
+                                   data-task-id="${task.id}" ${task.completed ? 'checked' : ''}>
+                            <label class="form-check-label task-title">
+                                ${escapeHtml(task.title)}
+                            </label>
                         </div>
-                        <div class="btn-group btn-group-sm">
-                            <button class="btn btn-outline-primary edit-task" data-task-id="${task.id}">
-                                <i class="bi bi-pencil"></i>
-                            </button>
-                            <button class="btn btn-outline-danger delete-task" data-task-id="${task.id}">
-                                <i class="bi bi-trash"></i>
-                            </button>
+                        ${task.description ? `
+                            <small class="text-muted d-block mt-1">
+                                ${escapeHtml(task.description.substring(0, 50))}
+                                ${task.description.length > 50 ? '...' : ''}
+                            </small>
+                        ` : ''}
+                        <div class="mt-2">
+                            ${deadlineBadge}
+                            ${subtasksBadge}
+                            <small class="text-muted ms-2">
+                                ${formatDate(task.created_at)}
+                            </small>
                         </div>
                     </div>
+                    <div class="btn-group btn-group-sm">
+                        <button class="btn btn-outline-primary edit-task" data-task-id="${task.id}">
+                            <i class="bi bi-pencil"></i>
+                        </button>
+                        <button class="btn btn-outline-danger delete-task" data-task-id="${task.id}">
+                            <i class="bi bi-trash"></i>
+                        </button>
+                    </div>
                 </div>
-            `;
-        });
-        
-        return html;
+            </div>
+        `;
     }
     
     showTaskModal(task = null) {
@@ -372,48 +598,87 @@ class ToDoApp {
             deadline_at: document.getElementById('taskDeadline').value || null
         };
         
+        if (!taskId) {
+            await this.createTask(taskData);
+            return;
+        }
+        
         try {
             const token = getToken();
-            let response;
-            
-            if (taskId) {
-                response = await fetch(`${API_CONFIG.BASE_URL}/task/${taskId}`, {
-                    method: 'PUT',
-                    headers: {
-                        'Content-Type': 'application/json',
-                        'Authorization': `Bearer ${token}`,
-                        'Accept': 'application/json'
-                    },
-                    body: JSON.stringify(taskData)
-                });
-            } else {
-                response = await fetch(`${API_CONFIG.BASE_URL}/`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                        'Authorization': `Bearer ${token}`,
-                        'Accept': 'application/json'
-                    },
-                    body: JSON.stringify(taskData)
-                });
-            }
+            const response = await fetch(`${API_CONFIG.BASE_URL}/task/${taskId}`, {
+                method: 'PUT',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${token}`,
+                    'Accept': 'application/json'
+                },
+                body: JSON.stringify(taskData)
+            });
             
             if (!response.ok) {
                 const error = await response.json();
                 throw new Error(error.detail || 'Ошибка сохранения');
             }
             
-            showAlert(taskId ? 'Задача обновлена' : 'Задача создана', 'success');
+            const task = await response.json();
+            showAlert('Задача обновлена', 'success');
             
             const modal = bootstrap.Modal.getInstance(document.getElementById('taskModal'));
             modal.hide();
             
-            await this.loadTasksPage();
+            this.store.upsert(task);
+            this.refreshBoard(new Set([task.id]));
         } catch (error) {
             showAlert(error.message || 'Ошибка сохранения задачи', 'danger');
         }
     }
     
+    // Оптимистичное создание: временная карточка сразу, id от сервера - после ответа
+    async createTask(taskData) {
+        const tempTask = {
+            ...taskData,
+            id: `tmp-${++this.tempTaskCounter}`,
+            quadrant: calculateQuadrant(taskData.deadline_at, taskData.is_important),
+            completed: false,
+            created_at: new Date().toISOString(),
+            pending: true
+        };
+        
+        const modal = bootstrap.Modal.getInstance(document.getElementById('taskModal'));
+        modal.hide();
+        
+        this.store.upsert(tempTask);
+        this.refreshBoard(new Set([tempTask.id]));
+        
+        try {
+            const token = getToken();
+            const response = await fetch(`${API_CONFIG.BASE_URL}/`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${token}`,
+                    'Accept': 'application/json'
+                },
+                body: JSON.stringify(taskData)
+            });
+            
+            if (!response.ok) {
+                const error = await response.json();
+                throw new Error(error.detail || 'Ошибка сохранения');
+            }
+            
+            const task = await response.json();
+            this.store.remove(tempTask.id);
+            this.store.upsert(task);
+            this.refreshBoard(new Set([task.id]));
+            showAlert('Задача создана', 'success');
+        } catch (error) {
+            this.store.remove(tempTask.id);
+            this.refreshBoard();
+            showAlert(error.message || 'Ошибка сохранения задачи', 'danger');
+        }
+    }
+    
     async changePassword() {
         const oldPassword = document.getElementById('oldPassword').value;
         const newPassword = document.getElementById('newPassword').value;
@@ -460,34 +725,70 @@ class ToDoApp {
         }
     }
     
+    // Оптимистичное изменение статуса: карточка меняется сразу, при ошибке - откат
     async toggleTaskComplete(taskId) {
+        const previous = this.store.get(taskId);
+        if (!previous) {
+            return;
+        }
+        
+        const completed = !previous.completed;
+        this.store.upsert({
+            ...previous,
+            completed,
+            completed_at: completed ? new Date().toISOString() : null
+        });
+        this.refreshBoard(new Set([taskId]));
+        
         try {
             const token = getToken();
-            const response = await fetch(`${API_CONFIG.BASE_URL}/task/${taskId}/complete`, {
-                method: 'PATCH',
-                headers: {
-                    'Authorization': `Bearer ${token}`,
-                    'Accept': 'application/json',
-                }
-            });
+            // PATCH /complete только завершает задачу, снятие отметки - через PUT
+            const response = completed
+                ? await fetch(`${API_CONFIG.BASE_URL}/task/${taskId}/complete`, {
+                    method: 'PATCH',
+                    headers: {
+                        'Authorization': `Bearer ${token}`,
+                        'Accept': 'application/json',
+                    }
+                })
+                : await fetch(`${API_CONFIG.BASE_URL}/task/${taskId}`, {
+                    method: 'PUT',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'Authorization': `Bearer ${token}`,
+                        'Accept': 'application/json'
+                    },
+                    body: JSON.stringify({ completed: false })
+                });
             
             if (!response.ok) {
                 const error = await response.json();
                 throw new Error(error.detail || 'Ошибка изменения статуса задачи');
             }
             
-            showAlert('Статус задачи изменен', 'success');
-            await this.loadTasksPage();
+            this.store.upsert(await response.json());
+            this.refreshBoard(new Set([taskId]));
         } catch (error) {
+            this.store.upsert(previous);
+            this.refreshBoard(new Set([taskId]));
             showAlert(error.message || 'Ошибка изменения статуса задачи', 'danger');
         }
     }
     
+    // Оптимистичное удаление: карточка убирается сразу, при ошибке возвращается
     async deleteTask(taskId) {
         if (!confirm('Вы уверены, что хотите удалить эту задачу?')) {
             return;
         }
         
+        const previous = this.store.get(taskId);
+        if (!previous || previous.pending) {
+            return;
+        }
+        
+        const removed = this.store.removeSubtree(taskId);
+        this.refreshBoard();
+        
         try {
             const token = getToken();
             const response = await fetch(`${API_CONFIG.BASE_URL}/task/${taskId}`, {
@@ -503,15 +804,44 @@ class ToDoApp {
                 throw new Error(error.detail || 'Ошибка удаления задачи');
             }
             
-            showAlert('Задача удалена', 'success');
-            await this.loadTasksPage();
+            showAlert('Задача перемещена в корзину', 'success');
         } catch (error) {
+            removed.forEach(task => this.store.upsert(task));
+            this.refreshBoard(new Set(removed.map(task => String(task.id))));
             showAlert(error.message || 'Ошибка удаления задачи', 'danger');
         }
     }
     
+    async loadStatsPage() {
+        try {
+            this.showLoading();
+            const token = getToken();
+            
+            // Вся страница статистики - одним запросом
+            const response = await fetch(`${API_CONFIG.BASE_URL}/stats/dashboard`, {
+                headers: {
+                    'Authorization': `Bearer ${token}`,
+                    'Accept': 'application/json'
+                }
+            });
+            
+            if (!response.ok) {
+                throw new Error('Ошибка загрузки статистики');
+            }
+            
+            const dashboard = await response.json();
+            this.renderStatsPage(dashboard.stats, dashboard.deadlines, dashboard.today);
+        } catch (error) {
+            this.showError('Ошибка загрузки статистики');
+            console.error('Ошибка загрузки статистики:', error);
+        }
+    }
+    
     renderStatsPage(stats, deadlines, today) {
         const mainContent = document.getElementById('mainContent');
+        const completionRate = stats.total_tasks > 0
+            ? Math.round(stats.by_status.completed / stats.total_tasks * 100)
+            : 0;
         
         let html = `
             <div class="row mb-4">
@@ -668,7 +998,7 @@ class ToDoApp {
         mainContent.innerHTML = html;
     }
     
-    async loadAdminPage() {
+    async loadAdminPage(offset = 0) {
         const user = getUserInfo();
         if (user?.role !== 'admin') {
             showAlert('Доступ запрещен', 'danger');
@@ -680,7 +1010,8 @@ class ToDoApp {
             this.showLoading();
             const token = getToken();
             
-            const response = await fetch(`${API_CONFIG.BASE_URL}/admin/users`, {
+            const params = new URLSearchParams({ limit: ADMIN_PAGE_SIZE, offset });
+            const response = await fetch(`${API_CONFIG.BASE_URL}/admin/users/directory?${params}`, {
                 headers: {
                     'Authorization': `Bearer ${token}`,
                     'Accept': 'application/json'
@@ -691,15 +1022,16 @@ class ToDoApp {
                 throw new Error('Ошибка загрузки админ-панели');
             }
             
-            const users = await response.json();
-            this.renderAdminPage(users);
+            const directory = await response.json();
+            this.renderAdminPage(directory);
         } catch (error) {
             this.showError('Ошибка загрузки админ-панели');
             console.error('Ошибка загрузки админ-панели:', error);
         }
     }
     
-    renderAdminPage(users) {
+    renderAdminPage(directory) {
+        const { items: users, total, limit, offset } = directory;
         const mainContent = document.getElementById('mainContent');
         
         let html = `
@@ -707,7 +1039,7 @@ class ToDoApp {
             
             <div class="card">
                 <div class="card-header">
-                    <h5 class="mb-0">Все пользователи</h5>
+                    <h5 class="mb-0">Все пользователи (${total})</h5>
                 </div>
                 <div class="card-body">
                     <div class="table-responsive">
@@ -745,6 +1077,7 @@ class ToDoApp {
                             </tbody>
                         </table>
                     </div>
+                    ${this.renderAdminPagination(total, limit, offset)}
                 </div>
             </div>
         `;
@@ -752,6 +1085,31 @@ class ToDoApp {
         mainContent.innerHTML = html;
     }
     
+    renderAdminPagination(total, limit, offset) {
+        if (total <= limit) {
+            return '';
+        }
+        
+        const from = offset + 1;
+        const to = Math.min(offset + limit, total);
+        const hasPrev = offset > 0;
+        const hasNext = offset + limit < total;
+        
+        return `
+            <nav class="d-flex justify-content-between align-items-center">
+                <span class="text-muted">${from}–${to} из ${total}</span>
+                <ul class="pagination mb-0">
+                    <li class="page-item ${hasPrev ? '' : 'disabled'}">
+                        <a class="page-link admin-page" href="#" data-offset="${Math.max(offset - limit, 0)}">Назад</a>
+                    </li>
+                    <li class="page-item ${hasNext ? '' : 'disabled'}">
+                        <a class="page-link admin-page" href="#" data-offset="${offset + limit}">Вперед</a>
+                    </li>
+                </ul>
+            </nav>
+        `;
+    }
+    
     getQuadrantColor(quadrant) {
         switch (quadrant) {
             case 'Q1': return 'danger';
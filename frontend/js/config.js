@@ -49,6 +49,17 @@ function calculateDaysUntilDeadline(deadlineAt) {
     return Math.floor(diffTime / (1000 * 60 * 60 * 24));
 }
 
+// Та же логика, что calculate_urgency_and_quadrant на сервере: срочно - дедлайн через 3 дня и меньше
+function calculateQuadrant(deadlineAt, isImportant) {
+    const daysLeft = calculateDaysUntilDeadline(deadlineAt);
+    const isUrgent = daysLeft !== null && daysLeft <= 3;
+    
+    if (isImportant) {
+        return isUrgent ? 'Q1' : 'Q2';
+    }
+    return isUrgent ? 'Q3' : 'Q4';
+}
+
 function escapeHtml(text) {
     const div = document.createElement('div');
     div.textContent = text;
@@ -0,0 +1,136 @@
+# health.py
+"""
+Прогрев пула соединений и кэшированный статус базы данных для проб.
+
+При старте приложение открывает POOL_WARMUP_CONNECTIONS соединений, чтобы
+первые запросы не платили за установку соединения, а фоновая задача раз в
+HEALTH_CHECK_INTERVAL секунд проверяет базу. Пробы liveness/readiness читают
+только сохраненный статус и не обращаются к БД.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import text
+
+POOL_WARMUP_CONNECTIONS = int(os.getenv("POOL_WARMUP_CONNECTIONS", "5"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up_pool(engine, connections: int = POOL_WARMUP_CONNECTIONS) -> int:
+    """
+    Открывает connections соединений одновременно и возвращает их в пул.
+
+    Количество ограничено размером пула: соединения сверх него (overflow)
+    закрываются при возврате, и прогревать их бессмысленно.
+    """
+    pool_size = getattr(engine.sync_engine.pool, "size", lambda: connections)()
+    connections = max(0, min(connections, pool_size))
+    if not connections:
+        return 0
+
+    opened = 0
+    all_opened = asyncio.Event()
+
+    def mark_opened():
+        nonlocal opened
+        opened += 1
+        if opened == connections:
+            all_opened.set()
+
+    async def open_connection():
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                mark_opened()
+                # Держим соединение, пока не откроются остальные - иначе пул выдаст то же самое
+                await all_opened.wait()
+        except Exception:
+            mark_opened()
+            raise
+
+    results = await asyncio.gather(*(open_connection() for _ in range(connections)), return_exceptions=True)
+
+    failed = [result for result in results if isinstance(result, Exception)]
+    if failed:
+        logger.warning("Не удалось прогреть часть соединений", extra={"failed": len(failed), "error": str(failed[0])})
+    return connections - len(failed)
+
+
+class DatabaseHealthMonitor:
+    """Фоновая проверка БД; пробы читают последний результат без обращения к базе"""
+
+    def __init__(self, engine, interval: float = HEALTH_CHECK_INTERVAL, timeout: float = HEALTH_CHECK_TIMEOUT):
+        self.engine = engine
+        self.interval = interval
+        self.timeout = timeout
+        self.ready = False
+        self.db_ok = False
+        self.db_status = "unknown"
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _ping(self) -> None:
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def check(self) -> None:
+        start = time.perf_counter()
+        try:
+            # Таймаут покрывает и получение соединения: зависший connect тоже считается отказом
+            await asyncio.wait_for(self._ping(), timeout=self.timeout)
+            self.db_ok = True
+            self.db_status = "connected"
+        except asyncio.TimeoutError:
+            if self.db_ok:
+                logger.warning("База данных не ответила вовремя", extra={"timeout": self.timeout})
+            self.db_ok = False
+            self.db_status = f"disconnected: timeout {self.timeout}s"
+        except Exception as e:
+            if self.db_ok:
+                logger.warning("База данных недоступна", extra={"error": str(e)})
+            self.db_ok = False
+            self.db_status = f"disconnected: {str(e)}"
+        self.latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        self.checked_at = time.time()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    async def start(self, warmup_connections: int = POOL_WARMUP_CONNECTIONS) -> None:
+        """Прогрев пула, первая проверка и запуск фоновой задачи; после этого под готов"""
+        try:
+            warmed = await warm_up_pool(self.engine, warmup_connections)
+            logger.info("Пул соединений прогрет", extra={"connections": warmed})
+        except Exception as e:
+            logger.warning("Ошибка прогрева пула", extra={"error": str(e)})
+
+        await self.check()
+        self._task = asyncio.create_task(self._run())
+        self.ready = True
+
+    async def stop(self) -> None:
+        self.ready = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready and self.db_ok,
+            "database": self.db_status,
+            "latency_ms": self.latency_ms,
+            "checked_seconds_ago": round(time.time() - self.checked_at, 1) if self.checked_at else None,
+        }
@@ -0,0 +1,528 @@
+# jobs.py
+"""
+Фоновые задания: тяжелые операции (экспорт, пересчет квадрантов, backfill
+rollup'ов) выполняются вне HTTP-запроса.
+
+Задание - строка таблицы jobs. API только создает ее (POST /jobs/) и будит
+воркеров; JOB_WORKERS воркеров в процессе приложения забирают задания по
+порядку через SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько экземпляров
+приложения делят одну очередь, а параллелизм ограничен числом воркеров.
+
+Пока задание выполняется, воркер раз в JOB_HEARTBEAT_INTERVAL обновляет
+heartbeat_at и проверяет cancel_requested: отмененное задание прерывается.
+Задание в running с heartbeat старше JOB_STALE_SECONDS считается брошенным
+(процесс упал) и забирается заново, но не более JOB_MAX_ATTEMPTS раз.
+
+Тип задания регистрируется декоратором @job_type: обработчик получает
+JobContext (параметры, пользователь, отчет о прогрессе) и возвращает
+JSON-совместимый результат. Обработчики - корутины, которые работают в цикле
+событий приложения, поэтому CPU-емкую часть они передают в ctx.run_cpu().
+Для типов с cpu_bound=True она выполняется в пуле из JOB_PROCESS_WORKERS
+процессов (функция и аргументы должны сериализоваться pickle), для остальных -
+в пуле потоков по умолчанию. Сессии контекста открываются на шарде
+пользователя задания (таблица jobs всегда в основной базе); задания
+администратора по всем задачам обходят шарды по очереди.
+
+Переменные окружения:
+- JOB_WORKERS - число воркеров в процессе (по умолчанию 2, 0 - не выполнять задания здесь)
+- JOB_POLL_INTERVAL - как часто проверять очередь без уведомлений, секунды (по умолчанию 5)
+- JOB_HEARTBEAT_INTERVAL - период heartbeat, секунды (по умолчанию 10)
+- JOB_STALE_SECONDS - когда задание в running считается брошенным (по умолчанию 300)
+- JOB_BATCH_SIZE - строк на одну пачку в обработчиках (по умолчанию 1000)
+- JOB_PROCESS_WORKERS - процессов для CPU-емких заданий (по умолчанию 2, 0 - пул потоков)
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, Field, model_validator
+from sqlalchemy import select, update, func, and_, or_
+
+from database import AsyncSessionLocal, all_shard_sessionmakers, shard_for_user, shard_sessionmaker
+from metrics import Counter, registry
+from models import Job, Task
+from cache import stats_cache
+from rollups import backfill
+from positions import append_positions, set_positions
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "300"))
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "1000"))
+JOB_PROCESS_WORKERS = int(os.getenv("JOB_PROCESS_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = 3
+# Результат хранится в строке jobs - экспорт ограничен
+EXPORT_MAX_TASKS = 50000
+BACKFILL_WINDOW_DAYS = 31
+
+logger = logging.getLogger(__name__)
+
+jobs_total = registry.register(Counter(
+    "jobs_total",
+    "Завершенные фоновые задания по типу и статусу",
+    ["type", "status"]
+))
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobCancelled(Exception):
+    """Задание отменено пользователем"""
+
+
+class JobContext:
+    """То, что обработчик знает о своем задании"""
+
+    def __init__(
+        self,
+        job_id: int,
+        user_id: int,
+        params: dict,
+        session_factory=AsyncSessionLocal,
+        executor: Optional[Executor] = None
+    ):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.params = params
+        self.session_factory = session_factory
+        self.executor = executor
+        self.cancel_requested = False
+
+    async def run_cpu(self, func: Callable[..., Any], *args) -> Any:
+        """func(*args) вне цикла событий: в пуле процессов для cpu_bound типов, иначе в пуле потоков"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def progress(self, done: int, total: Optional[int] = None) -> None:
+        """Сохраняет прогресс; если задание отменили - прерывает обработчик"""
+        values = {"progress_done": done, "heartbeat_at": _utcnow()}
+        if total is not None:
+            values["progress_total"] = total
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(Job)
+                .where(Job.id == self.job_id)
+                .values(**values)
+                .returning(Job.cancel_requested)
+            )
+            cancel_requested = result.scalar_one_or_none()
+            await db.commit()
+        if cancel_requested:
+            self.cancel_requested = True
+            raise JobCancelled()
+
+
+@dataclass
+class JobType:
+    name: str
+    handler: Callable[[JobContext], Awaitable[Any]]
+    params_model: Optional[Type[BaseModel]]
+    admin_only: bool
+    cpu_bound: bool = False
+
+
+JOB_TYPES: Dict[str, JobType] = {}
+
+
+def job_type(
+    name: str,
+    params_model: Optional[Type[BaseModel]] = None,
+    admin_only: bool = False,
+    cpu_bound: bool = False
+):
+    """
+    Регистрирует обработчик типа заданий
+
+    cpu_bound=True - ctx.run_cpu() этого типа выполняется в пуле процессов.
+    """
+    def decorator(handler):
+        JOB_TYPES[name] = JobType(name, handler, params_model, admin_only, cpu_bound)
+        return handler
+    return decorator
+
+
+def validate_params(job: JobType, params: Optional[dict]) -> dict:
+    """Параметры задания по модели типа; ValidationError - некорректные параметры"""
+    if job.params_model is None:
+        return {}
+    return job.params_model.model_validate(params or {}).model_dump(mode="json")
+
+
+class JobRunner:
+    """Пул воркеров, выполняющих задания из таблицы jobs"""
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        workers: int = JOB_WORKERS,
+        poll_interval: float = JOB_POLL_INTERVAL,
+        heartbeat_interval: float = JOB_HEARTBEAT_INTERVAL,
+        stale_seconds: int = JOB_STALE_SECONDS,
+        process_workers: int = JOB_PROCESS_WORKERS
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale = timedelta(seconds=stale_seconds)
+        self.process_workers = process_workers
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    def notify(self) -> None:
+        """Вызывается после commit'а нового задания - воркеры не ждут опроса"""
+        self._wakeup.set()
+
+    async def _claim(self) -> Optional[Tuple[int, str, int, dict]]:
+        """Забирает следующее задание: (id, type, user_id, params) или None"""
+        while True:
+            now = _utcnow()
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    select(Job)
+                    .where(or_(
+                        Job.status == "queued",
+                        and_(Job.status == "running", Job.heartbeat_at < now - self.stale)
+                    ))
+                    .order_by(Job.id)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )
+                job = result.scalar_one_or_none()
+                if job is None:
+                    return None
+
+                values = {"attempts": job.attempts + 1, "heartbeat_at": now}
+                if job.cancel_requested or job.type not in JOB_TYPES or job.attempts >= JOB_MAX_ATTEMPTS:
+                    values["status"] = "cancelled" if job.cancel_requested else "failed"
+                    values["finished_at"] = now
+                    if job.type not in JOB_TYPES:
+                        values["error"] = "Неизвестный тип задания"
+                    elif not job.cancel_requested:
+                        values["error"] = "Задание прерывалось слишком много раз"
+                else:
+                    values["status"] = "running"
+                    values["started_at"] = now
+
+                # Сравнение с прочитанным attempts - защита от двойного захвата там,
+                # где SKIP LOCKED недоступен (SQLite)
+                result = await db.execute(
+                    update(Job)
+                    .where(Job.id == job.id, Job.attempts == job.attempts)
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                if result.rowcount == 0:
+                    continue
+                if values["status"] != "running":
+                    jobs_total.inc(job.type, values["status"])
+                    continue
+                return job.id, job.type, job.user_id, job.params or {}
+
+    async def _finish(self, job_id: int, **values) -> None:
+        async with self.session_factory() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(heartbeat_at=_utcnow(), **values)
+            )
+            await db.commit()
+
+    async def _heartbeat(self, ctx: JobContext, handler: asyncio.Task) -> None:
+        """Продлевает задание и прерывает обработчик, если задание отменили"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                async with self.session_factory() as db:
+                    result = await db.execute(
+                        update(Job)
+                        .where(Job.id == ctx.job_id)
+                        .values(heartbeat_at=_utcnow())
+                        .returning(Job.cancel_requested)
+                    )
+                    cancel_requested = result.scalar_one_or_none()
+                    await db.commit()
+            except Exception as e:
+                logger.warning("Ошибка heartbeat задания", extra={"job_id": ctx.job_id, "error": str(e)})
+                continue
+            if cancel_requested:
+                ctx.cancel_requested = True
+                handler.cancel()
+                return
+
+    async def _execute(self, job_id: int, type_name: str, user_id: int, params: dict) -> None:
+        session_factory = self.session_factory
+        if session_factory is AsyncSessionLocal:
+            session_factory = shard_sessionmaker(shard_for_user(user_id))
+        executor = self._process_pool if JOB_TYPES[type_name].cpu_bound else None
+        ctx = JobContext(job_id, user_id, params, session_factory, executor)
+        handler = asyncio.create_task(JOB_TYPES[type_name].handler(ctx))
+        heartbeat = asyncio.create_task(self._heartbeat(ctx, handler))
+        status = "failed"
+        try:
+            result = await handler
+            status = "succeeded"
+            await self._finish(job_id, status=status, result=result, finished_at=_utcnow())
+        except (JobCancelled, asyncio.CancelledError):
+            if not ctx.cancel_requested:
+                # Остановка приложения: задание вернется в очередь
+                status = "queued"
+                await self._finish(job_id, status=status, attempts=Job.attempts - 1)
+                raise
+            status = "cancelled"
+            await self._finish(job_id, status=status, finished_at=_utcnow())
+        except Exception as e:
+            logger.exception("Ошибка фонового задания", extra={"job_id": job_id, "type": type_name})
+            await self._finish(job_id, status=status, error=str(e) or type(e).__name__, finished_at=_utcnow())
+        finally:
+            heartbeat.cancel()
+            if status != "queued":
+                jobs_total.inc(type_name, status)
+                logger.info("Фоновое задание завершено", extra={"job_id": job_id, "type": type_name, "status": status})
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                claimed = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка выбора задания", extra={"error": str(e)})
+                claimed = None
+
+            if claimed is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            try:
+                await self._execute(*claimed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка сохранения статуса задания", extra={"job_id": claimed[0], "error": str(e)})
+
+    async def start(self) -> None:
+        if self._tasks or self.workers <= 0:
+            return
+        if self.process_workers > 0:
+            # spawn: дочерние процессы не наследуют цикл событий и соединения пула
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(
+            "Воркеры фоновых заданий запущены",
+            extra={"workers": self.workers, "process_workers": self.process_workers}
+        )
+
+    async def stop(self) -> None:
+        """Прерывает выполняемые задания и возвращает их в очередь"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+
+job_runner = JobRunner()
+
+
+# ---------------------------------------------------------------------------
+# Типы заданий
+# ---------------------------------------------------------------------------
+
+async def _recompute_quadrants(ctx: JobContext, user_id: Optional[int], session_factories: list) -> dict:
+    """
+    Пересчитывает квадранты невыполненных задач: срочность зависит от даты,
+    поэтому сохраненный квадрант устаревает по мере приближения дедлайна.
+    Выполненные задачи не трогаются - их квадрант учтен в rollup'ах.
+    """
+    today = date.today()
+    conditions = [Task.completed == False]
+    if user_id is not None:
+        conditions.append(Task.user_id == user_id)
+
+    total = 0
+    for session_factory in session_factories:
+        async with session_factory() as db:
+            total += (await db.execute(select(func.count(Task.id)).where(*conditions))).scalar()
+    await ctx.progress(0, total)
+
+    checked = 0
+    changed = 0
+    affected_users = set()
+    for session_factory in session_factories:
+        shard_checked, shard_changed = await _recompute_shard_quadrants(
+            ctx, session_factory, conditions, today, affected_users, checked
+        )
+        checked += shard_checked
+        changed += shard_changed
+
+    for owner_id in affected_users:
+        stats_cache.invalidate_user(owner_id)
+    return {"checked": checked, "changed": changed}
+
+
+async def _recompute_shard_quadrants(
+    ctx: JobContext,
+    session_factory,
+    conditions: list,
+    today: date,
+    affected_users: set,
+    checked_before: int
+) -> Tuple[int, int]:
+    """Пересчет квадрантов на одном шарде пачками по id; возвращает (checked, changed)"""
+    # routers.tasks импортирует пакет routers, а он - routers.jobs и этот модуль
+    from routers.tasks import calculate_urgency_and_quadrant
+
+    checked = 0
+    changed = 0
+    last_id = 0
+    while True:
+        async with session_factory() as db:
+            rows = (await db.execute(
+                select(Task.id, Task.user_id, Task.deadline_at, Task.is_important, Task.quadrant)
+                .where(*conditions, Task.id > last_id)
+                .order_by(Task.id)
+                .limit(JOB_BATCH_SIZE)
+            )).all()
+            if not rows:
+                break
+
+            moves: Dict[Tuple[int, str], List[int]] = defaultdict(list)
+            for task_id, owner_id, deadline_at, is_important, quadrant in rows:
+                _, new_quadrant = calculate_urgency_and_quadrant(deadline_at, is_important, today)
+                if new_quadrant != quadrant:
+                    moves[(owner_id, new_quadrant)].append(task_id)
+                    affected_users.add(owner_id)
+            # Перемещенные задачи встают в конец нового квадранта пользователя (по id):
+            # одно чтение максимума и один executemany на группу
+            for (owner_id, quadrant), ids in moves.items():
+                positions = await append_positions(db, owner_id, quadrant, len(ids))
+                await set_positions(db, zip(ids, positions), quadrant=quadrant)
+            await db.commit()
+
+        last_id = rows[-1].id
+        checked += len(rows)
+        changed += sum(len(ids) for ids in moves.values())
+        await ctx.progress(checked_before + checked)
+
+    return checked, changed
+
+
+@job_type("recompute_quadrants")
+async def recompute_own_quadrants(ctx: JobContext) -> dict:
+    return await _recompute_quadrants(ctx, ctx.user_id, [ctx.session_factory])
+
+
+@job_type("recompute_all_quadrants", admin_only=True)
+async def recompute_all_quadrants(ctx: JobContext) -> dict:
+    return await _recompute_quadrants(ctx, None, all_shard_sessionmakers())
+
+
+class ExportParams(BaseModel):
+    include_completed: bool = Field(True, description="Включать выполненные задачи")
+
+
+def _export_rows(rows: List[dict], tags_by_task: Dict[int, List[str]]) -> List[dict]:
+    """Строки задач в формате ответа API - CPU-часть экспорта (выполняется в пуле процессов)"""
+    from types import SimpleNamespace
+    from routers.tasks import task_response
+
+    return [
+        task_response(SimpleNamespace(**row), tags_by_task.get(row["id"])).model_dump(mode="json")
+        for row in rows
+    ]
+
+
+@job_type("export_tasks", params_model=ExportParams, cpu_bound=True)
+async def export_tasks(ctx: JobContext) -> dict:
+    """
+    Экспорт задач пользователя (в формате ответа API, с метками) в результат задания
+
+    Пачки читаются из БД в цикле событий, а модели ответа строятся в пуле
+    процессов: в процесс передаются простые словари строк и метки.
+    """
+    from routers.tags import load_task_tags
+
+    conditions = [Task.user_id == ctx.user_id]
+    if not ctx.params.get("include_completed", True):
+        conditions.append(Task.completed == False)
+
+    async with ctx.session_factory() as db:
+        total = (await db.execute(select(func.count(Task.id)).where(*conditions))).scalar()
+    if total > EXPORT_MAX_TASKS:
+        raise ValueError(f"Слишком много задач для экспорта: {total} (максимум {EXPORT_MAX_TASKS})")
+    await ctx.progress(0, total)
+
+    exported: List[dict] = []
+    last_id = 0
+    while True:
+        async with ctx.session_factory() as db:
+            result = await db.execute(
+                select(*(getattr(Task, column.key) for column in Task.__mapper__.column_attrs))
+                .where(*conditions, Task.id > last_id)
+                .order_by(Task.id)
+                .limit(JOB_BATCH_SIZE)
+            )
+            rows = [dict(row) for row in result.mappings().all()]
+            if not rows:
+                break
+            tags_by_task = await load_task_tags(db, [row["id"] for row in rows])
+        exported.extend(await ctx.run_cpu(_export_rows, rows, tags_by_task))
+
+        last_id = rows[-1]["id"]
+        await ctx.progress(len(exported))
+
+    return {"count": len(exported), "tasks": exported}
+
+
+class BackfillParams(BaseModel):
+    date_from: date
+    date_to: date
+
+    @model_validator(mode="after")
+    def validate_period(self):
+        if self.date_to < self.date_from:
+            raise ValueError("date_to раньше date_from")
+        if (self.date_to - self.date_from).days > 3660:
+            raise ValueError("Период не длиннее 10 лет")
+        return self
+
+
+@job_type("rollups_backfill", params_model=BackfillParams, admin_only=True)
+async def rollups_backfill(ctx: JobContext) -> dict:
+    """Пересчет дневных rollup'ов за период окнами по BACKFILL_WINDOW_DAYS дней"""
+    date_from = date.fromisoformat(ctx.params["date_from"])
+    date_to = date.fromisoformat(ctx.params["date_to"])
+    total_days = (date_to - date_from).days + 1
+    await ctx.progress(0, total_days)
+
+    rows = 0
+    window_start = date_from
+    while window_start <= date_to:
+        window_end = min(window_start + timedelta(days=BACKFILL_WINDOW_DAYS - 1), date_to)
+        for session_factory in all_shard_sessionmakers():
+            async with session_factory() as db:
+                rows += await backfill(db, window_start, window_end)
+        window_start = window_end + timedelta(days=1)
+        await ctx.progress((window_start - date_from).days)
+
+    return {"rows": rows, "date_from": date_from.isoformat(), "date_to": date_to.isoformat()}
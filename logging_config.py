@@ -0,0 +1,160 @@
+# logging_config.py
+"""
+Структурированное логирование с неблокирующей записью.
+
+Обработчики запросов только кладут запись в ограниченную очередь
+(QueueHandler), а форматирование и запись в stdout выполняет отдельный
+поток QueueListener. При переполнении очереди записи отбрасываются,
+а не блокируют запрос.
+
+Переменные окружения:
+- LOG_LEVEL - уровень корневого логгера (по умолчанию INFO)
+- LOG_LEVELS - уровни отдельных логгеров: "routers.tasks=DEBUG,dependencies=WARNING"
+- LOG_FORMAT - json или text (по умолчанию json)
+- LOG_DEBUG_SAMPLE_RATE - доля DEBUG-записей, которые попадают в лог (по умолчанию 1.0)
+- LOG_QUEUE_SIZE - размер очереди записей (по умолчанию 10000)
+"""
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Стандартные атрибуты LogRecord - все остальные считаются полями из extra
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, логгер, сообщение и поля из extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Человекочитаемый формат для локальной разработки"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = {
+            key: value for key, value in record.__dict__.items()
+            if key not in _RESERVED_ATTRS and not key.startswith("_")
+        }
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Пропускает только долю DEBUG-записей; записи уровнем выше проходят всегда"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler, который никогда не блокирует вызывающий код"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Фиксируем только текст сообщения; форматирование выполнит поток слушателя
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> None:
+    """Настраивает корневой логгер на неблокирующую очередь (идемпотентно)"""
+    global _listener, _queue_handler
+
+    if _queue_handler is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(DebugSamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(LOG_LEVEL)
+
+    for name, level in _parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(_queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Останавливает поток записи, дописав накопленные записи"""
+    global _listener, _queue_handler
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+def dropped_records() -> int:
+    """Количество записей, отброшенных из-за переполнения очереди"""
+    return _queue_handler.dropped if _queue_handler is not None else 0
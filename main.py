@@ -1,21 +1,59 @@
 # main.py
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse, JSONResponse
 from contextlib import asynccontextmanager
-from database import init_db, get_async_session
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-from routers import tasks, stats, auth, admin
+from database import engine
+from health import DatabaseHealthMonitor
+from reminders import REMINDERS_ENABLED, reminder_scheduler
+from trash import trash_purger
+from activity_log import activity_writer
+from jobs import job_runner
+from positions import position_rebalancer
+from static_files import FRONTEND_DIST_DIR, PrecompressedStaticFiles
+from routers import tasks, stats, auth, admin, recurring, tags, trash, imports, jobs, calendar
+from logging_config import setup_logging, shutdown_logging
+from metrics import MetricsMiddleware, registry
+from profiler import SQL_PROFILER_ENABLED, SQLProfilerMiddleware, install_profiler
+from deadlines import DeadlineMiddleware, database_timeout_handler, pool_timeout_handler
+from sqlalchemy import exc as sa_exc
+import logging
+import os
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Статус БД для проб обновляется в фоне, сами пробы к базе не обращаются
+health_monitor = DatabaseHealthMonitor(engine)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("🚀 Запуск приложения...")
+    setup_logging()
+    logger.info("🚀 Запуск приложения...")
     # Для Supabase не вызываем init_db() - таблицы уже созданы через SQL
-    print("✅ Приложение готово к работе!")
+    await health_monitor.start()
+    if REMINDERS_ENABLED:
+        await reminder_scheduler.start()
+    await trash_purger.start()
+    await activity_writer.start()
+    await job_runner.start()
+    await position_rebalancer.start()
+    logger.info("✅ Приложение готово к работе!")
     yield
-    print("🛑 Остановка приложения...")
+    logger.info("🛑 Остановка приложения...")
+    await trash_purger.stop()
+    await position_rebalancer.stop()
+    # Выполняемые задания возвращаются в очередь
+    await job_runner.stop()
+    # Дописываем накопленный журнал действий до закрытия пула
+    await activity_writer.stop()
+    await reminder_scheduler.stop()
+    await health_monitor.stop()
+    # Запросы уже завершены (graceful shutdown сервера) - закрываем соединения пула
+    await engine.dispose()
+    shutdown_logging()
 
 
 app = FastAPI(
@@ -25,6 +63,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Дедлайны /api, отмена при отключении клиента и 503 при перегрузке пула.
+# Добавляется первым (внутренний слой): ответы 503/504 проходят через CORS и метрики
+app.add_middleware(DeadlineMiddleware, pool=engine.sync_engine.pool)
+app.add_exception_handler(sa_exc.DBAPIError, database_timeout_handler)
+app.add_exception_handler(sa_exc.TimeoutError, pool_timeout_handler)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -33,14 +77,32 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization"],
 )
 
+# Метрики по маршрутам: количество, латентность, запросы в работе
+app.add_middleware(MetricsMiddleware)
+
+# Профилировщик SQL (opt-in): Server-Timing, N+1 и лог медленных запросов
+if SQL_PROFILER_ENABLED:
+    install_profiler(engine)
+    app.add_middleware(SQLProfilerMiddleware)
+
 # Подключение роутеров - ВЕРСИЯ 3.0
 app.include_router(auth.router, prefix="/api/v3", tags=["auth"])
 app.include_router(tasks.router, prefix="/api/v3", tags=["tasks"])
 app.include_router(stats.router, prefix="/api/v3", tags=["stats"])
 app.include_router(admin.router, prefix="/api/v3", tags=["admin"])
+app.include_router(recurring.router, prefix="/api/v3", tags=["recurring"])
+app.include_router(tags.router, prefix="/api/v3", tags=["tags"])
+app.include_router(trash.router, prefix="/api/v3", tags=["trash"])
+app.include_router(imports.router, prefix="/api/v3", tags=["import"])
+app.include_router(jobs.router, prefix="/api/v3", tags=["jobs"])
+app.include_router(calendar.router, prefix="/api/v3", tags=["calendar"])
 
-# Подключение статических файлов для фронтенда
-app.mount("/frontend", StaticFiles(directory="frontend", html=True), name="frontend")
+# Подключение статических файлов для фронтенда: собранная версия (build_frontend.py),
+# если она есть, иначе исходники без кэширования
+if os.path.isdir(FRONTEND_DIST_DIR):
+    app.mount("/frontend", PrecompressedStaticFiles(directory=FRONTEND_DIST_DIR, html=True), name="frontend")
+else:
+    app.mount("/frontend", StaticFiles(directory="frontend", html=True), name="frontend")
 
 @app.get("/")
 async def read_root() -> dict:
@@ -54,11 +116,27 @@ async def read_root() -> dict:
 
 
 @app.get("/health")
-async def health_check(db: AsyncSession = Depends(get_async_session)):
-    try:
-        await db.execute(text("SELECT 1"))
-        db_status = "connected"
-    except Exception as e:
-        db_status = f"disconnected: {str(e)}"
-    
-    return {"status": "healthy", "database": db_status}
\ No newline at end of file
+async def health_check():
+    """Liveness: процесс жив; статус БД - последний результат фоновой проверки"""
+    return {"status": "healthy", "database": health_monitor.db_status}
+
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness-проба: не зависит от базы данных"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness-проба: 503, пока пул не прогрет или база недоступна"""
+    snapshot = health_monitor.snapshot()
+    if not snapshot["ready"]:
+        return JSONResponse(status_code=503, content={"status": "not ready", **snapshot})
+    return {"status": "ready", **snapshot}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,230 @@
+# metrics.py
+"""
+Метрики приложения в текстовом формате Prometheus.
+
+Собственная минимальная реализация без внешних зависимостей: счетчики,
+gauge и гистограммы хранятся в словарях по кортежу значений меток, а
+накопительные значения бакетов считаются только при выдаче /metrics,
+поэтому наблюдение на пути запроса - это один bisect и пара инкрементов.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Бакеты латентности запросов и ожидания соединения из пула (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1.0) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], Dict[Tuple, float]]] = None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # collect - функция, вычисляющая значения в момент выдачи метрик
+        self._collect = collect
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1.0) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def dec(self, *labelvalues, amount: float = 1.0) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) - amount
+
+    def set(self, *labelvalues, value: float) -> None:
+        self._values[labelvalues] = value
+
+    def render(self) -> List[str]:
+        values = self._collect() if self._collect is not None else self._values
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labelvalues, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # На каждый набор меток: [счетчики по бакетам (+Inf последним), сумма]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues) -> None:
+        series = self._values.get(labelvalues)
+        if series is None:
+            series = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        labelnames = self.labelnames + ("le",)
+        for labelvalues, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(labelnames, labelvalues + (le,))} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total",
+    "Количество HTTP-запросов",
+    ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Латентность HTTP-запросов",
+    ("method", "route")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight",
+    "Запросы, обрабатываемые в данный момент",
+    ("method",)
+))
+db_pool_wait_seconds = registry.register(Histogram(
+    "db_pool_wait_seconds",
+    "Время получения соединения из пула SQLAlchemy",
+    buckets=POOL_WAIT_BUCKETS
+))
+
+
+def observe_pool_wait(seconds: float) -> None:
+    db_pool_wait_seconds.observe(seconds)
+
+
+def register_pool(pool) -> None:
+    """Регистрирует gauge'и состояния пула соединений (читаются при выдаче /metrics)"""
+    def collector(read: Callable[[], float]) -> Callable[[], Dict[Tuple, float]]:
+        def collect() -> Dict[Tuple, float]:
+            try:
+                return {(): read()}
+            except AttributeError:
+                # Пул без статистики (например, NullPool)
+                return {}
+        return collect
+
+    registry.register(Gauge(
+        "db_pool_size", "Размер пула соединений",
+        collect=collector(lambda: pool.size())
+    ))
+    registry.register(Gauge(
+        "db_pool_checked_out", "Соединения, выданные из пула",
+        collect=collector(lambda: pool.checkedout())
+    ))
+    registry.register(Gauge(
+        "db_pool_checked_in", "Свободные соединения в пуле",
+        collect=collector(lambda: pool.checkedin())
+    ))
+    # QueuePool.overflow() отрицателен, пока пул не заполнен
+    registry.register(Gauge(
+        "db_pool_overflow", "Соединения сверх размера пула",
+        collect=collector(lambda: max(pool.overflow(), 0))
+    ))
+
+
+def _route_label(scope) -> str:
+    # Шаблон пути маршрута, а не фактический путь - иначе кардинальность меток не ограничена
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unmatched")
+    if "endpoint" in scope:
+        # Смонтированное приложение (статика фронтенда)
+        return scope.get("root_path") or "mount"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: количество запросов, латентность и запросы в работе по маршрутам"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        start = time.perf_counter()
+        http_requests_in_flight.inc(method)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            http_requests_in_flight.dec(method)
+            route = _route_label(scope)
+            http_requests_total.inc(method, route, str(status_code))
+            http_request_duration_seconds.observe(duration, method, route)
@@ -2,5 +2,11 @@
 from database import Base
 from models.task import Task
 from models.user import User, UserRole
+from models.task_daily_stat import TaskDailyStat
+from models.recurring_task import RecurringTask
+from models.reminder import ReminderOutbox
+from models.tag import Tag, task_tags
+from models.activity_event import ActivityEvent
+from models.job import Job
 
-__all__ = ["Base", "Task", "User", "UserRole"]
\ No newline at end of file
+__all__ = ["Base", "Task", "User", "UserRole", "TaskDailyStat", "RecurringTask", "ReminderOutbox", "Tag", "task_tags", "ActivityEvent", "Job"]
\ No newline at end of file
@@ -0,0 +1,33 @@
+# models/activity_event.py
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, JSON, Index
+from database import Base
+
+
+class ActivityEvent(Base):
+    """
+    Журнал действий пользователей (см. activity_log.py).
+
+    Строки только добавляются; created_at - время события в приложении,
+    а не время записи (в режиме write-behind запись происходит позже).
+    """
+    __tablename__ = "activity_log"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    # NULL - событие без пользователя (например, вход с неизвестным email)
+    user_id = Column(Integer, nullable=True)
+    # task_create, task_update, task_complete, task_delete, task_restore, login, login_failed, ...
+    action = Column(String(32), nullable=False)
+    entity_type = Column(String(16), nullable=True)
+    entity_id = Column(Integer, nullable=True)
+    details = Column(JSON, nullable=True)
+
+    # Журнал читается от новых к старым с курсором по id (см. GET /admin/activity)
+    __table_args__ = (
+        Index("ix_activity_log_created_at", "created_at"),
+        Index("ix_activity_log_user_id", "user_id", "id"),
+        Index("ix_activity_log_entity", "entity_type", "entity_id", "id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ActivityEvent(id={self.id}, action='{self.action}', user_id={self.user_id})>"
@@ -0,0 +1,44 @@
+# models/job.py
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, JSON, ForeignKey, Index
+from sqlalchemy.sql import func
+from database import Base
+
+
+class Job(Base):
+    """
+    Фоновая задача (экспорт, пересчет квадрантов, отчеты - см. jobs.py).
+
+    status: queued -> running -> succeeded | failed | cancelled.
+    heartbeat_at обновляется при отчете о прогрессе: задание в running
+    с устаревшим heartbeat считается брошенным (процесс упал) и забирается заново.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    type = Column(String(32), nullable=False)
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    status = Column(String(16), nullable=False, default="queued")
+    params = Column(JSON, nullable=True)
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Воркеры выбирают очередь по порядку; завершенные задания в индекс не попадают
+        Index("ix_jobs_pending", "id", postgresql_where=status.in_(["queued", "running"])),
+        Index("ix_jobs_user_id", "user_id", "id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Job(id={self.id}, type='{self.type}', status='{self.status}')>"
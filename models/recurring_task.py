@@ -0,0 +1,71 @@
+# models/recurring_task.py
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from dateutil.rrule import rrule, DAILY, WEEKLY, MONTHLY
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy.sql import func
+from database import Base
+
+FREQUENCIES = {"daily": DAILY, "weekly": WEEKLY, "monthly": MONTHLY}
+
+
+class RecurringTask(Base):
+    """
+    Правило повторяющейся задачи.
+
+    Хранится только правило; вхождения вычисляются при чтении за нужный
+    период и сохраняются в tasks (recurring_task_id, occurrence_at) лишь
+    когда пользователь выполняет или редактирует конкретное вхождение.
+    """
+    __tablename__ = "recurring_tasks"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    title = Column(Text, nullable=False)
+    description = Column(Text, nullable=True)
+    is_important = Column(Boolean, nullable=False, default=False)
+    # daily | weekly | monthly, шаг - каждые interval единиц
+    frequency = Column(String(10), nullable=False)
+    interval = Column(Integer, nullable=False, default=1)
+    # Дни недели для weekly через запятую (0 - понедельник), например "0,2,4"
+    weekdays = Column(String(20), nullable=True)
+    # Первое вхождение; его время суток - срок (deadline) каждого вхождения
+    starts_at = Column(DateTime(timezone=True), nullable=False)
+    until = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+
+    def weekday_list(self) -> Optional[List[int]]:
+        if not self.weekdays:
+            return None
+        return [int(day) for day in self.weekdays.split(",")]
+
+    def rule(self) -> rrule:
+        starts_at = as_utc(self.starts_at)
+        return rrule(
+            FREQUENCIES[self.frequency],
+            dtstart=starts_at,
+            interval=self.interval,
+            byweekday=self.weekday_list(),
+            until=as_utc(self.until) if self.until else None
+        )
+
+    def occurrences_between(self, start: datetime, end: datetime) -> List[datetime]:
+        """Вхождения правила в [start, end] (включительно)"""
+        return self.rule().between(as_utc(start), as_utc(end), inc=True)
+
+    def __repr__(self) -> str:
+        return f"<RecurringTask(id={self.id}, title='{self.title}', frequency='{self.frequency}', user_id={self.user_id})>"
+
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite возвращает naive datetime - считаем его UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
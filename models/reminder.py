@@ -0,0 +1,44 @@
+# models/reminder.py
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from database import Base
+
+
+class ReminderOutbox(Base):
+    """
+    Outbox напоминаний о дедлайнах (см. reminders.py).
+
+    Уникальный ключ (task_id, offset_seconds, deadline_at) - это заявка на
+    отправку: из нескольких воркеров строку вставляет ровно один, и только он
+    доставляет напоминание. Смена дедлайна дает новый ключ и новое напоминание.
+    delivered_at = NULL - напоминание еще не доставлено (нет webhook или ошибка);
+    next_attempt_at - когда цикл доставки повторит попытку.
+    """
+    __tablename__ = "reminder_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(
+        Integer,
+        ForeignKey("tasks.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    user_id = Column(Integer, nullable=False)
+    offset_seconds = Column(Integer, nullable=False)
+    deadline_at = Column(DateTime(timezone=True), nullable=False)
+    fire_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("task_id", "offset_seconds", "deadline_at", name="uq_reminder_outbox_task_offset_deadline"),
+        # Потребители outbox читают недоставленные напоминания по порядку
+        Index("ix_reminder_outbox_undelivered", "fire_at", postgresql_where=delivered_at.is_(None)),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<ReminderOutbox(task_id={self.task_id}, offset_seconds={self.offset_seconds}, "
+            f"fire_at={self.fire_at}, delivered_at={self.delivered_at})>"
+        )
@@ -0,0 +1,38 @@
+# models/tag.py
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, Table, UniqueConstraint
+from sqlalchemy.sql import func
+from database import Base
+
+
+# Связь задач и меток (многие-ко-многим).
+# Первичный ключ (task_id, tag_id) отдает метки задачи, индекс (tag_id, task_id) -
+# задачи с меткой: фильтры по меткам выполняются по индексам без чтения задач.
+task_tags = Table(
+    "task_tags",
+    Base.metadata,
+    Column("task_id", Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_task_tags_tag_task", "tag_id", "task_id"),
+)
+
+
+class Tag(Base):
+    """Метка задачи. Словарь меток у каждого пользователя свой"""
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    # Хранится в нижнем регистре (см. schemas.normalize_tag_names)
+    name = Column(String(50), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_tags_user_name"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Tag(id={self.id}, name='{self.name}', user_id={self.user_id})>"
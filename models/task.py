@@ -1,10 +1,16 @@
 # models/task.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, UniqueConstraint, Index, and_, event
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, Session, with_loader_criteria
+from typing import List
+from datetime import datetime, timezone
 from database import Base
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class Task(Base):
     __tablename__ = "tasks"
     
@@ -17,6 +23,17 @@ class Task(Base):
     completed = Column(Boolean, nullable=False, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    # Корзина: задача с deleted_at скрыта из всех запросов (см. _exclude_deleted_tasks)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # Время последнего изменения строки (включая массовые UPDATE) - валидатор ICS-ленты.
+    # Значение вычисляется в приложении, чтобы после flush атрибут не истекал
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=_utcnow,
+        onupdate=_utcnow,
+        server_default=func.now()
+    )
     
     # Внешний ключ для связи с пользователем
     user_id = Column(
@@ -26,12 +43,67 @@ class Task(Base):
         index=True
     )
     
+    # Материализованное вхождение повторяющейся задачи (см. RecurringTask)
+    recurring_task_id = Column(
+        Integer,
+        ForeignKey("recurring_tasks.id", ondelete="SET NULL"),
+        nullable=True
+    )
+    occurrence_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Подзадачи: материализованный путь - id предков от корня через "/", например "1/5/"
+    # (у корневой задачи - пустая строка). Поддерево задачи - id = X или path LIKE 'X.path||X.id/%'
+    parent_id = Column(
+        Integer,
+        ForeignKey("tasks.id", ondelete="CASCADE"),
+        nullable=True
+    )
+    path = Column(Text, nullable=False, default="", server_default="")
+    # Счетчики всех потомков (не только прямых), обновляются вместе с записью подзадач
+    subtasks_total = Column(Integer, nullable=False, default=0, server_default="0")
+    subtasks_completed = Column(Integer, nullable=False, default=0, server_default="0")
+    # Ручной порядок внутри квадранта - дробный индекс (см. positions.py). Сравнение побайтное:
+    # в PostgreSQL COLLATE "C", в SQLite BINARY по умолчанию. NULL - в конце квадранта по id
+    position = Column(
+        String(64).with_variant(String(64, collation="C"), "postgresql"),
+        nullable=True
+    )
+    
     # Связь с пользователем
     owner = relationship(
         "User",
         back_populates="tasks"
     )
     
+    __table_args__ = (
+        # Одно вхождение материализуется не больше одного раза
+        UniqueConstraint("recurring_task_id", "occurrence_at", name="uq_tasks_recurring_occurrence"),
+        # Планировщик напоминаний читает ближайшие дедлайны невыполненных задач диапазоном по индексу
+        Index(
+            "ix_tasks_pending_deadline", "deadline_at",
+            postgresql_where=and_(completed.is_(False), deleted_at.is_(None))
+        ),
+        # Списки задач пользователя читают только строки вне корзины
+        Index("ix_tasks_user_active", "user_id", "quadrant", postgresql_where=deleted_at.is_(None)),
+        # Ручной порядок: сортировка квадранта и максимальная позиция - по индексу
+        Index("ix_tasks_user_position", "user_id", "quadrant", "position"),
+        # Календарь и ICS-лента: диапазон дедлайнов задач пользователя
+        Index("ix_tasks_user_deadline", "user_id", "deadline_at", postgresql_where=deleted_at.is_(None)),
+        # Последнее изменение задач пользователя (ETag ICS-ленты) - одно чтение по индексу
+        Index("ix_tasks_user_updated", "user_id", "updated_at"),
+        # Корзина и очистка просроченной корзины
+        Index("ix_tasks_deleted_at", "deleted_at", postgresql_where=deleted_at.isnot(None)),
+        # LIKE 'префикс%' по индексу независимо от collation базы
+        Index("ix_tasks_path", "path", postgresql_ops={"path": "text_pattern_ops"}),
+    )
+    
+    def subtree_prefix(self) -> str:
+        """Префикс path всех потомков задачи"""
+        return f"{self.path}{self.id}/"
+    
+    def ancestor_ids(self) -> List[int]:
+        return [int(ancestor_id) for ancestor_id in self.path.split("/") if ancestor_id]
+    
     def __repr__(self) -> str:
         return f"<Task(id={self.id}, title='{self.title}', quadrant='{self.quadrant}', user_id={self.user_id})>"
     
@@ -47,4 +119,22 @@ class Task(Base):
             "completed_at": self.completed_at,
             "deadline_at": self.deadline_at,
             "user_id": self.user_id
-        }
\ No newline at end of file
+        }
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _exclude_deleted_tasks(execute_state) -> None:
+    """
+    Задачи в корзине не видны ни одному ORM-запросу (списки, статистика, админка,
+    напоминания), включая UPDATE/DELETE. Корзина и очистка читают их с
+    execution_options(include_deleted=True).
+    """
+    if (
+        execute_state.is_column_load
+        or execute_state.is_relationship_load
+        or execute_state.execution_options.get("include_deleted", False)
+    ):
+        return
+    execute_state.statement = execute_state.statement.options(
+        with_loader_criteria(Task, Task.deleted_at.is_(None), include_aliases=True)
+    )
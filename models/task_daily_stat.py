@@ -0,0 +1,35 @@
+# models/task_daily_stat.py
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Index
+from database import Base
+
+
+class TaskDailyStat(Base):
+    """
+    Дневной rollup по задачам: сколько задач создано и выполнено
+    за день в разрезе пользователя и квадранта.
+
+    Поддерживается инкрементально при записи задач (см. rollups.py),
+    поэтому графики трендов читают только эту таблицу.
+    """
+    __tablename__ = "task_daily_stats"
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    day = Column(Date, primary_key=True)
+    quadrant = Column(String(2), primary_key=True)
+    created_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Глобальные тренды администратора читают диапазон дней без user_id
+        Index("ix_task_daily_stats_day", "day"),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<TaskDailyStat(user_id={self.user_id}, day={self.day}, quadrant='{self.quadrant}', "
+            f"created={self.created_count}, completed={self.completed_count})>"
+        )
@@ -1,5 +1,5 @@
 # models/user.py
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, Index
 from sqlalchemy.orm import relationship
 from database import Base
 import enum
@@ -47,6 +47,23 @@ class User(Base):
         default=UserRole.USER.value  # Используем .value для строки
     )
     
+    # Денормализованный счетчик задач: поддерживается при создании и удалении задач,
+    # чтобы список пользователей в админ-панели не делал JOIN с tasks
+    task_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0"
+    )
+    
+    # Секрет в адресе ICS-ленты задач (календарные приложения не передают токен авторизации);
+    # NULL - лента выключена
+    calendar_token = Column(
+        String(64),
+        unique=True,
+        nullable=True
+    )
+    
     # Связь с задачами
     tasks = relationship(
         "Task",
@@ -54,5 +71,10 @@ class User(Base):
         cascade="all, delete-orphan"
     )
     
+    __table_args__ = (
+        # Сортировка каталога пользователей по количеству задач
+        Index("ix_users_task_count_id", "task_count", "id"),
+    )
+    
     def __repr__(self) -> str:
         return f"<User(id={self.id}, nickname='{self.nickname}', role='{self.role}')>"
\ No newline at end of file
@@ -0,0 +1,258 @@
+# positions.py
+"""
+Ручной порядок задач внутри квадранта: дробные (лексикографические) индексы.
+
+Позиция - строка из цифр base62 ("0-9A-Za-z"), задачи квадранта сортируются
+по ней побайтно (в PostgreSQL колонка с COLLATE "C"). Между любыми двумя
+позициями есть третья (key_between), поэтому перемещение задачи меняет одну
+строку, а не перенумеровывает соседей. Ключи без завершающих "0", иначе между
+"a" и "a0" ничего не вставить.
+
+Добавление в конец (key_after) не делит промежуток пополам, а увеличивает
+ключ на единицу младшего разряда: ключ уровня e - это e символов "z" и
+число из e + 1 цифр, не начинающееся с "z". Когда числа уровня кончаются,
+начинается уровень e + 1, поэтому длина растет логарифмически: 31 ключ
+длины 1, затем около 3800 ключей длины до 3, 230 тысяч - до 5.
+
+Ключи растут при многократной вставке в одно место, поэтому группа
+(пользователь, квадрант) иногда перенумеровывается равномерно (rebalance_group):
+- сразу, если новый ключ длиннее POSITION_MAX_LENGTH (длина колонки);
+- в фоне раз в POSITION_REBALANCE_INTERVAL секунд - группы с ключами длиннее
+  POSITION_REBALANCE_LENGTH и с задачами без позиции (строки до миграции).
+  Задачи без позиции стоят в конце квадранта по id.
+
+Переменные окружения:
+- POSITION_REBALANCE_INTERVAL - период фоновой перенумерации, секунды (по умолчанию 3600, 0 - выключить)
+- POSITION_REBALANCE_LENGTH - длина ключа, после которой группа перенумеровывается в фоне (по умолчанию 12)
+- POSITION_REBALANCE_BATCH - групп за один проход (по умолчанию 100)
+"""
+import asyncio
+import logging
+import os
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import all_shard_sessionmakers
+from models import Task
+
+POSITION_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+POSITION_BASE = len(POSITION_DIGITS)
+# Длина колонки Task.position
+POSITION_MAX_LENGTH = 64
+POSITION_REBALANCE_INTERVAL = float(os.getenv("POSITION_REBALANCE_INTERVAL", "3600"))
+POSITION_REBALANCE_LENGTH = int(os.getenv("POSITION_REBALANCE_LENGTH", "12"))
+POSITION_REBALANCE_BATCH = int(os.getenv("POSITION_REBALANCE_BATCH", "100"))
+
+logger = logging.getLogger(__name__)
+
+
+def _midpoint(lower: str, upper: Optional[str]) -> str:
+    """Ключ строго между lower и upper (upper=None - без верхней границы)"""
+    if upper is not None:
+        # Общий префикс (lower дополняется "0") переносится в результат как есть
+        prefix = 0
+        while prefix < len(upper) and (lower[prefix] if prefix < len(lower) else "0") == upper[prefix]:
+            prefix += 1
+        if prefix:
+            return upper[:prefix] + _midpoint(lower[prefix:], upper[prefix:])
+
+    low = POSITION_DIGITS.index(lower[0]) if lower else 0
+    high = POSITION_DIGITS.index(upper[0]) if upper is not None else POSITION_BASE
+    if high - low > 1:
+        return POSITION_DIGITS[(low + high + 1) // 2]
+    # Соседние цифры: берем более короткий вариант или удлиняем ключ
+    if upper is not None and len(upper) > 1:
+        return upper[0]
+    return POSITION_DIGITS[low] + _midpoint(lower[1:], None)
+
+
+def key_between(lower: Optional[str], upper: Optional[str]) -> str:
+    """
+    Позиция между lower и upper; None - начало или конец квадранта.
+
+    ValueError - если lower >= upper (одинаковые ключи разводит перенумерация).
+    """
+    if lower is not None and upper is not None and lower >= upper:
+        raise ValueError(f"Позиция {lower!r} не меньше {upper!r}")
+    return _midpoint(lower or "", upper)
+
+
+def key_after(key: Optional[str]) -> str:
+    """Следующий ключ после key для добавления в конец (None - первый ключ квадранта)"""
+    if not key:
+        return key_between(None, None)
+    level = len(key) - len(key.lstrip("z"))
+    width = level + 1
+    # Число уровня: цифры после "z"*level, дополненные или обрезанные до width
+    digits = [POSITION_DIGITS.index(char) for char in key[level:level + width].ljust(width, "0")]
+    index = width - 1
+    while index >= 0 and digits[index] == POSITION_BASE - 1:
+        digits[index] = 0
+        index -= 1
+    if index >= 0:
+        digits[index] += 1
+    if index < 0 or digits[0] == POSITION_BASE - 1:
+        # Числа уровня кончились - первый ключ следующего уровня
+        return "z" * (level + 1) + POSITION_DIGITS[1]
+    return ("z" * level + "".join(POSITION_DIGITS[digit] for digit in digits)).rstrip("0")
+
+
+def spaced_keys(count: int) -> List[str]:
+    """count возрастающих ключей одной длины с равными промежутками"""
+    width = 1
+    # Между соседними ключами остается не меньше POSITION_BASE свободных значений
+    while POSITION_BASE ** width < (count + 1) * POSITION_BASE:
+        width += 1
+    step = POSITION_BASE ** width // (count + 1)
+
+    keys = []
+    for index in range(1, count + 1):
+        value = step * index
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, POSITION_BASE)
+            digits.append(POSITION_DIGITS[digit])
+        keys.append("".join(reversed(digits)).rstrip("0"))
+    return keys
+
+
+def position_order(query):
+    """Сортировка по ручному порядку: квадрант, позиция (задачи без позиции - в конце по id)"""
+    return query.order_by(Task.quadrant, Task.position.nulls_last(), Task.id)
+
+
+def position_sort_key(task) -> tuple:
+    """Ключ position_order в Python (для слияния отсортированных списков шардов)"""
+    return (task.quadrant, task.position is None, task.position or "", task.id)
+
+
+async def last_position(db: AsyncSession, user_id: int, quadrant: str) -> Optional[str]:
+    """
+    Максимальная позиция в квадранте - одно чтение по индексу (user_id, quadrant, position)
+    
+    Учитываются только задачи вне корзины, как и при перенумерации: ключи
+    задач в корзине устаревают, при восстановлении задача получает новую позицию.
+    """
+    result = await db.execute(
+        select(func.max(Task.position))
+        .where(Task.user_id == user_id, Task.quadrant == quadrant)
+    )
+    return result.scalar_one_or_none()
+
+
+async def append_position(db: AsyncSession, user_id: int, quadrant: str) -> Optional[str]:
+    """Позиция в конце квадранта; None, если ключ стал бы слишком длинным (встанет по id)"""
+    return (await append_positions(db, user_id, quadrant, 1))[0]
+
+
+async def append_positions(db: AsyncSession, user_id: int, quadrant: str, count: int) -> List[Optional[str]]:
+    """count позиций подряд в конце квадранта - одно чтение максимума на группу"""
+    keys: List[Optional[str]] = []
+    key = await last_position(db, user_id, quadrant)
+    for _ in range(count):
+        key = key_after(key)
+        if len(key) > POSITION_MAX_LENGTH:
+            # Остальные задачи встанут в конец по id до перенумерации
+            return keys + [None] * (count - len(keys))
+        keys.append(key)
+    return keys
+
+
+async def set_positions(db: AsyncSession, positions: Iterable[Tuple[int, Optional[str]]], **values) -> None:
+    """
+    Позиции (task_id, key) нескольких задач одним executemany (без commit).
+    
+    values - общие для всех строк поля (например, новый квадрант).
+    """
+    params = [{"b_id": task_id, "b_position": key} for task_id, key in positions]
+    if not params:
+        return
+    tasks = Task.__table__
+    await db.execute(
+        update(tasks)
+        .where(tasks.c.id == bindparam("b_id"))
+        .values(position=bindparam("b_position"), **values),
+        params
+    )
+
+
+async def rebalance_group(db: AsyncSession, user_id: int, quadrant: str) -> int:
+    """
+    Равномерная перенумерация задач квадранта в текущем порядке (без commit).
+
+    Строки группы блокируются (FOR UPDATE), чтобы параллельное перемещение
+    не получило ключ из старой нумерации. Возвращает число задач группы.
+    """
+    result = await db.execute(
+        position_order(
+            select(Task.id)
+            .where(Task.user_id == user_id, Task.quadrant == quadrant)
+        )
+        .with_for_update()
+    )
+    task_ids = result.scalars().all()
+    await set_positions(db, zip(task_ids, spaced_keys(len(task_ids))))
+    return len(task_ids)
+
+
+async def rebalance_pending(
+    session_factory,
+    max_length: int = POSITION_REBALANCE_LENGTH,
+    batch_size: int = POSITION_REBALANCE_BATCH
+) -> int:
+    """Перенумеровывает группы с длинными ключами или задачами без позиции; возвращает число групп"""
+    async with session_factory() as db:
+        result = await db.execute(
+            select(Task.user_id, Task.quadrant)
+            .where(or_(Task.position.is_(None), func.length(Task.position) > max_length))
+            .group_by(Task.user_id, Task.quadrant)
+            .limit(batch_size)
+        )
+        groups = result.all()
+
+    # Каждая группа - отдельная короткая транзакция
+    for user_id, quadrant in groups:
+        async with session_factory() as db:
+            await rebalance_group(db, user_id, quadrant)
+            await db.commit()
+    return len(groups)
+
+
+class PositionRebalancer:
+    """Фоновая перенумерация позиций раз в interval секунд на всех шардах"""
+
+    def __init__(self, interval: float = POSITION_REBALANCE_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                groups = 0
+                for session_factory in all_shard_sessionmakers():
+                    groups += await rebalance_pending(session_factory)
+                if groups:
+                    logger.info("Позиции задач перенумерованы", extra={"groups": groups})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка перенумерации позиций", extra={"error": str(e)})
+
+    async def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+position_rebalancer = PositionRebalancer()
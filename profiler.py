@@ -0,0 +1,137 @@
+# profiler.py
+"""
+Профилировщик SQL по запросам (включается переменной SQL_PROFILER=1).
+
+Обработчики событий движка SQLAlchemy считают запросы и время в БД для
+текущего HTTP-запроса (через contextvars), middleware добавляет к ответу
+заголовок Server-Timing, а повторяющиеся одинаковые запросы (признак N+1)
+и медленные запросы пишутся в лог. Параметры запросов в лог не попадают -
+вместо значений пишутся только их типы.
+
+Переменные окружения:
+- SQL_PROFILER - 1, чтобы включить профилировщик
+- SQL_SLOW_QUERY_MS - порог медленного запроса в миллисекундах (по умолчанию 200)
+- SQL_REPEAT_THRESHOLD - сколько одинаковых запросов за HTTP-запрос считать N+1 (по умолчанию 3)
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+SQL_PROFILER_ENABLED = os.getenv("SQL_PROFILER", "0") == "1"
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "3"))
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("sql.slow")
+
+
+class RequestProfile:
+    """Статистика SQL в рамках одного HTTP-запроса"""
+
+    __slots__ = ("query_count", "db_time", "statements")
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        return {stmt: count for stmt, count in self.statements.items() if count >= threshold}
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+
+
+def redact_parameters(parameters):
+    """Заменяет значения параметров их типами"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: показываем только первый набор и количество
+            return {"first": redact_parameters(parameters[0]), "rows": len(parameters)}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.query_count += 1
+        profile.db_time += elapsed
+        profile.statements[statement] = profile.statements.get(statement, 0) + 1
+
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms >= SQL_SLOW_QUERY_MS:
+        slow_query_logger.warning(
+            "Медленный SQL-запрос",
+            extra={
+                "duration_ms": round(elapsed_ms, 2),
+                "statement": statement,
+                "parameters": redact_parameters(parameters),
+            }
+        )
+
+
+def install_profiler(engine) -> None:
+    """Подписывает профилировщик на события движка (engine - AsyncEngine или Engine)"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SQLProfilerMiddleware:
+    """ASGI middleware: Server-Timing с количеством и временем SQL-запросов"""
+
+    def __init__(self, app, repeat_threshold: int = SQL_REPEAT_THRESHOLD):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - start) * 1000
+                db_ms = profile.db_time * 1000
+                server_timing = (
+                    f'db;dur={db_ms:.2f};desc="{profile.query_count} queries", '
+                    f"app;dur={max(total_ms - db_ms, 0.0):.2f}"
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            repeated = profile.repeated(self.repeat_threshold)
+            if repeated:
+                logger.warning(
+                    "Повторяющиеся SQL-запросы (возможен N+1)",
+                    extra={
+                        "path": scope.get("path"),
+                        "query_count": profile.query_count,
+                        "repeated": repeated,
+                    }
+                )
@@ -0,0 +1,435 @@
+# reminders.py
+"""
+Напоминания о дедлайнах (включаются переменной REMINDERS_ENABLED=1).
+
+Планировщик работает в процессе приложения: раз в окно (REMINDER_WINDOW_SECONDS)
+он читает по индексу ix_tasks_pending_deadline только задачи, напоминания по
+которым наступают в этом окне, и кладет их в min-heap по времени срабатывания.
+Между загрузками таблица задач не опрашивается: цикл спит до ближайшего
+напоминания, а изменения задач из API (task_changed) добавляют записи в heap сразу.
+
+Перед отправкой задача перечитывается: удаленные, выполненные задачи и задачи
+с измененным дедлайном пропускаются. Напоминание создается ровно один раз при
+нескольких воркерах: строку outbox-таблицы reminder_outbox вставляет только
+воркер, чья вставка с ON CONFLICT DO NOTHING прошла.
+
+Если задан REMINDER_WEBHOOK_URL, недоставленные строки outbox отправляет
+цикл доставки: строки забираются с FOR UPDATE SKIP LOCKED, next_attempt_at
+сдвигается с экспоненциальной паузой до POST-запроса, после успеха ставится
+delivered_at. Ошибки и падение процесса между вставкой и отправкой приводят к
+повтору, но не больше REMINDER_MAX_ATTEMPTS попыток (доставка at-least-once:
+падение между POST и отметкой delivered_at дает повторную отправку).
+Без webhook'а строки outbox остаются для внешнего потребителя.
+
+Задачи и outbox лежат в шарде пользователя (database.DATABASE_SHARD_URLS),
+поэтому на каждый шард запускается свой планировщик; изменения задач из API
+направляются в планировщик шарда владельца.
+
+Переменные окружения:
+- REMINDERS_ENABLED - 1, чтобы запустить планировщик
+- REMINDER_OFFSETS - за сколько секунд до дедлайна напоминать (по умолчанию "86400,3600")
+- REMINDER_WINDOW_SECONDS - окно предзагрузки (по умолчанию 3600)
+- REMINDER_WINDOW_LIMIT - максимум задач на один запрос окна, окно читается страницами (по умолчанию 5000)
+- REMINDER_GRACE_SECONDS - насколько опоздавшие напоминания еще отправляются, например после рестарта (по умолчанию 600)
+- REMINDER_WEBHOOK_URL - адрес webhook'а (необязательно)
+- REMINDER_RETRY_SECONDS - пауза перед первым повтором доставки, дальше удваивается (по умолчанию 30)
+- REMINDER_MAX_ATTEMPTS - максимум попыток доставки (по умолчанию 8)
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update, and_, or_
+
+from database import AsyncSessionLocal, all_shard_sessionmakers, shard_for_user
+from models import Task, ReminderOutbox
+from models.recurring_task import as_utc
+from rollups import _dialect_insert
+
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "0") == "1"
+REMINDER_OFFSETS = [int(offset) for offset in os.getenv("REMINDER_OFFSETS", "86400,3600").split(",") if offset.strip()]
+REMINDER_WINDOW_SECONDS = int(os.getenv("REMINDER_WINDOW_SECONDS", "3600"))
+REMINDER_WINDOW_LIMIT = int(os.getenv("REMINDER_WINDOW_LIMIT", "5000"))
+REMINDER_GRACE_SECONDS = int(os.getenv("REMINDER_GRACE_SECONDS", "600"))
+REMINDER_WEBHOOK_URL = os.getenv("REMINDER_WEBHOOK_URL")
+REMINDER_RETRY_SECONDS = int(os.getenv("REMINDER_RETRY_SECONDS", "30"))
+REMINDER_MAX_ATTEMPTS = int(os.getenv("REMINDER_MAX_ATTEMPTS", "8"))
+WEBHOOK_TIMEOUT_SECONDS = 10
+# Строк outbox за один проход доставки и максимальная пауза между повторами
+DELIVERY_BATCH_SIZE = 100
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+logger = logging.getLogger(__name__)
+
+# (fire_at, task_id, offset_seconds, deadline_at)
+Entry = Tuple[datetime, int, int, datetime]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _post_webhook(url: str, payload: dict) -> None:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload, default=str).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT_SECONDS) as response:
+        response.read()
+
+
+class ReminderScheduler:
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        offsets: List[int] = REMINDER_OFFSETS,
+        window_seconds: int = REMINDER_WINDOW_SECONDS,
+        window_limit: int = REMINDER_WINDOW_LIMIT,
+        grace_seconds: int = REMINDER_GRACE_SECONDS,
+        webhook_url: Optional[str] = REMINDER_WEBHOOK_URL,
+        retry_seconds: int = REMINDER_RETRY_SECONDS,
+        max_attempts: int = REMINDER_MAX_ATTEMPTS
+    ):
+        self.session_factory = session_factory
+        self.offsets = sorted(set(offsets))
+        self.window = timedelta(seconds=window_seconds)
+        self.window_limit = window_limit
+        self.grace = timedelta(seconds=grace_seconds)
+        self.webhook_url = webhook_url
+        self.retry = timedelta(seconds=retry_seconds)
+        self.max_attempts = max_attempts
+
+        self._heap: List[Entry] = []
+        self._scheduled: Set[Tuple[int, int, datetime]] = set()
+        self._loaded_until: Optional[datetime] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._delivery_wakeup = asyncio.Event()
+        self._delivery_task: Optional[asyncio.Task] = None
+        self.fired = 0
+        self.delivered = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._loaded_until = _utcnow() - self.grace
+        self._task = asyncio.create_task(self._run())
+        if self.webhook_url:
+            self._delivery_task = asyncio.create_task(self._deliver_loop())
+        logger.info("Планировщик напоминаний запущен", extra={"offsets": self.offsets})
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        for task in (self._task, self._delivery_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._delivery_task = None
+        self._heap.clear()
+        self._scheduled.clear()
+
+    def _push(self, task_id: int, deadline_at: datetime, now: datetime) -> bool:
+        """Добавляет напоминания задачи, срабатывающие в уже загруженном окне"""
+        deadline_at = as_utc(deadline_at)
+        pushed = False
+        for offset in self.offsets:
+            fire_at = deadline_at - timedelta(seconds=offset)
+            key = (task_id, offset, deadline_at)
+            if fire_at < now - self.grace or fire_at > self._loaded_until or key in self._scheduled:
+                continue
+            heapq.heappush(self._heap, (fire_at, task_id, offset, deadline_at))
+            self._scheduled.add(key)
+            pushed = True
+        return pushed
+
+    def task_changed(self, task: Task) -> None:
+        """
+        Вызывается после коммита создания или изменения задачи.
+
+        Устаревшие записи (старый дедлайн, выполненная задача) не удаляются
+        из heap - они отбрасываются проверкой при срабатывании.
+        """
+        if task.completed:
+            return
+        self.schedule(task.id, task.deadline_at)
+    
+    def schedule(self, task_id: int, deadline_at: Optional[datetime]) -> None:
+        """Напоминания для новой невыполненной задачи"""
+        if not self.running or deadline_at is None:
+            return
+        if self._push(task_id, deadline_at, _utcnow()):
+            self._wakeup.set()
+
+    async def _load_window(self, now: datetime) -> None:
+        """
+        Загружает напоминания со временем срабатывания в (loaded_until, now + window]
+
+        Окно читается страницами по REMINDER_WINDOW_LIMIT с курсором (deadline_at, id):
+        задачи с одинаковым дедлайном на границе страницы не теряются.
+        """
+        window_start = self._loaded_until
+        window_end = now + self.window
+
+        async with self.session_factory() as db:
+            for offset in self.offsets:
+                shift = timedelta(seconds=offset)
+                cursor: Optional[Tuple[datetime, int]] = None
+                while True:
+                    query = (
+                        select(Task.id, Task.deadline_at)
+                        .where(
+                            Task.completed == False,
+                            Task.deadline_at > window_start + shift,
+                            Task.deadline_at <= window_end + shift
+                        )
+                        .order_by(Task.deadline_at, Task.id)
+                        .limit(self.window_limit)
+                    )
+                    if cursor is not None:
+                        query = query.where(or_(
+                            Task.deadline_at > cursor[0],
+                            and_(Task.deadline_at == cursor[0], Task.id > cursor[1])
+                        ))
+                    rows = (await db.execute(query)).all()
+
+                    for task_id, deadline_at in rows:
+                        key = (task_id, offset, as_utc(deadline_at))
+                        if key not in self._scheduled:
+                            heapq.heappush(self._heap, (as_utc(deadline_at) - shift, task_id, offset, as_utc(deadline_at)))
+                            self._scheduled.add(key)
+
+                    if len(rows) < self.window_limit:
+                        break
+                    cursor = (rows[-1].deadline_at, rows[-1].id)
+
+        self._loaded_until = window_end
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                now = _utcnow()
+                if now >= self._loaded_until:
+                    await self._load_window(now)
+
+                while self._heap and self._heap[0][0] <= now:
+                    entry = heapq.heappop(self._heap)
+                    self._scheduled.discard((entry[1], entry[2], entry[3]))
+                    await self._fire(entry)
+
+                wake_at = self._loaded_until
+                if self._heap:
+                    wake_at = min(wake_at, self._heap[0][0])
+                delay = max((wake_at - _utcnow()).total_seconds(), 0.0)
+
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка планировщика напоминаний", extra={"error": str(e)})
+                await asyncio.sleep(5)
+
+    async def _fire(self, entry: Entry) -> None:
+        fire_at, task_id, offset, deadline_at = entry
+
+        async with self.session_factory() as db:
+            task = await db.get(Task, task_id)
+            # Задача удалена, выполнена или дедлайн перенесен - напоминание устарело
+            if task is None or task.completed or task.deadline_at is None or as_utc(task.deadline_at) != deadline_at:
+                return
+
+            payload = {
+                "task_id": task.id,
+                "user_id": task.user_id,
+                "title": task.title,
+                "deadline_at": deadline_at.isoformat(),
+                "offset_seconds": offset,
+            }
+
+            dialect_insert = _dialect_insert(db)
+            result = await db.execute(
+                dialect_insert(ReminderOutbox)
+                .values(
+                    task_id=task.id,
+                    user_id=task.user_id,
+                    offset_seconds=offset,
+                    deadline_at=deadline_at,
+                    fire_at=fire_at,
+                    next_attempt_at=_utcnow(),
+                    attempts=0
+                )
+                .on_conflict_do_nothing(index_elements=["task_id", "offset_seconds", "deadline_at"])
+                .returning(ReminderOutbox.id)
+            )
+            outbox_id = result.scalar_one_or_none()
+            await db.commit()
+
+        if outbox_id is None:
+            # Напоминание уже создал другой воркер
+            return
+
+        self.fired += 1
+        logger.info("Напоминание о дедлайне", extra=payload)
+        self._delivery_wakeup.set()
+
+    def _retry_delay(self, attempts: int) -> timedelta:
+        return min(self.retry * (2 ** attempts), MAX_RETRY_DELAY)
+
+    async def _claim_deliveries(self) -> List[Tuple[int, dict]]:
+        """
+        Забирает недоставленные строки outbox, срок попытки которых наступил.
+
+        next_attempt_at сдвигается до отправки и фиксируется сразу: другие
+        воркеры не возьмут строку повторно, а при падении процесса попытка
+        повторится после паузы.
+        """
+        now = _utcnow()
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(ReminderOutbox)
+                .where(
+                    ReminderOutbox.delivered_at.is_(None),
+                    ReminderOutbox.attempts < self.max_attempts,
+                    or_(ReminderOutbox.next_attempt_at.is_(None), ReminderOutbox.next_attempt_at <= now)
+                )
+                .order_by(ReminderOutbox.fire_at)
+                .limit(DELIVERY_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.scalars().all()
+            if not rows:
+                return []
+
+            tasks_result = await db.execute(select(Task).where(Task.id.in_({row.task_id for row in rows})))
+            tasks = {task.id: task for task in tasks_result.scalars().all()}
+
+            claimed = []
+            for row in rows:
+                task = tasks.get(row.task_id)
+                row.attempts += 1
+                row.next_attempt_at = now + self._retry_delay(row.attempts)
+                if task is None:
+                    # Задача удалена в корзину - доставлять нечего
+                    row.attempts = self.max_attempts
+                    continue
+                claimed.append((row.id, {
+                    "task_id": task.id,
+                    "user_id": row.user_id,
+                    "title": task.title,
+                    "deadline_at": as_utc(row.deadline_at).isoformat(),
+                    "offset_seconds": row.offset_seconds,
+                }))
+            await db.commit()
+        return claimed
+
+    async def _deliver(self) -> int:
+        """Один проход доставки; возвращает число доставленных напоминаний"""
+        delivered = 0
+        for outbox_id, payload in await self._claim_deliveries():
+            try:
+                await asyncio.to_thread(_post_webhook, self.webhook_url, payload)
+            except Exception as e:
+                logger.warning("Не удалось доставить напоминание", extra={"task_id": payload["task_id"], "error": str(e)})
+                continue
+
+            async with self.session_factory() as db:
+                await db.execute(
+                    update(ReminderOutbox)
+                    .where(ReminderOutbox.id == outbox_id)
+                    .values(delivered_at=_utcnow())
+                )
+                await db.commit()
+            delivered += 1
+        self.delivered += delivered
+        return delivered
+
+    async def _deliver_loop(self) -> None:
+        while True:
+            try:
+                self._delivery_wakeup.clear()
+                await self._deliver()
+                try:
+                    await asyncio.wait_for(self._delivery_wakeup.wait(), timeout=self.retry.total_seconds())
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка доставки напоминаний", extra={"error": str(e)})
+                await asyncio.sleep(5)
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "running": self.running,
+            "scheduled": len(self._heap),
+            "loaded_until": self._loaded_until.isoformat() if self._loaded_until else None,
+            "fired": self.fired,
+            "delivered": self.delivered,
+        }
+
+
+class ShardedReminderScheduler:
+    """Планировщики напоминаний всех шардов; задачи направляются по владельцу"""
+
+    def __init__(self, **options):
+        self.options = options
+        self.schedulers: List[ReminderScheduler] = []
+
+    @property
+    def running(self) -> bool:
+        return any(scheduler.running for scheduler in self.schedulers)
+
+    async def start(self) -> None:
+        if not self.schedulers:
+            self.schedulers = [
+                ReminderScheduler(session_factory=session_factory, **self.options)
+                for session_factory in all_shard_sessionmakers()
+            ]
+        for scheduler in self.schedulers:
+            await scheduler.start()
+
+    async def stop(self) -> None:
+        for scheduler in self.schedulers:
+            await scheduler.stop()
+
+    def task_changed(self, task: Task) -> None:
+        if self.schedulers:
+            self.schedulers[shard_for_user(task.user_id)].task_changed(task)
+
+    def schedule(self, task_id: int, user_id: int, deadline_at: Optional[datetime]) -> None:
+        """Напоминания для новой невыполненной задачи (например, из импорта)"""
+        if self.schedulers:
+            self.schedulers[shard_for_user(user_id)].schedule(task_id, deadline_at)
+
+    def metrics(self) -> Dict[str, object]:
+        shards = [scheduler.metrics() for scheduler in self.schedulers]
+        return {
+            "running": self.running,
+            "scheduled": sum(shard["scheduled"] for shard in shards),
+            "fired": sum(shard["fired"] for shard in shards),
+            "delivered": sum(shard["delivered"] for shard in shards),
+            "shards": shards,
+        }
+
+
+reminder_scheduler = ShardedReminderScheduler()
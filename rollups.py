@@ -0,0 +1,318 @@
+# rollups.py
+"""
+Дневные rollup'ы по задачам (таблица task_daily_stats).
+
+Счетчики обновляются инкрементально в той же транзакции, что и запись задачи:
+создание увеличивает created_count за день создания, выполнение - completed_count
+за день выполнения. Удаление задачи историю не меняет: rollup'ы - это журнал
+активности, а не снимок текущих задач.
+
+Оба пути - инкрементальный и backfill - следуют одним правилам, поэтому
+повторный backfill не меняет уже записанную историю:
+- считаются и задачи в корзине (удаление не уменьшает счетчики);
+- день события - календарная дата в часовом поясе сервера (rollup_day).
+Задачи, окончательно удаленные из корзины, backfill восстановить не может -
+его стоит запускать только для периодов, когда rollup'ов еще не было.
+
+Здесь же поддерживается денормализованный счетчик users.task_count,
+по которому админ-панель сортирует и показывает пользователей без JOIN с tasks.
+
+Заполнение истории по уже существующим задачам:
+    python rollups.py backfill --from 2024-01-01 --to 2024-12-31
+Пересчет счетчиков задач пользователей:
+    python rollups.py recount-users
+"""
+import argparse
+import asyncio
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, delete, func, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import gather_shards, shard_count
+from models import Task, TaskDailyStat, User
+
+QUADRANTS = ["Q1", "Q2", "Q3", "Q4"]
+BACKFILL_BATCH_SIZE = 1000
+
+
+def rollup_day(moment: Optional[datetime] = None) -> date:
+    """День rollup'а для момента события: дата в часовом поясе сервера (без moment - сегодня)"""
+    if moment is None:
+        return date.today()
+    if moment.tzinfo is not None:
+        moment = moment.astimezone()
+    return moment.date()
+
+
+def _dialect_insert(db: AsyncSession):
+    """insert() с поддержкой ON CONFLICT для текущего диалекта"""
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    return dialect_insert
+
+
+async def record_task_event(
+    db: AsyncSession,
+    user_id: int,
+    quadrant: str,
+    created: int = 0,
+    completed: int = 0,
+    day: Optional[date] = None
+) -> None:
+    """
+    Инкрементальное обновление дневного rollup'а одним UPSERT.
+
+    Не выполняет commit - изменения фиксируются вместе с записью задачи.
+    """
+    if not created and not completed:
+        return
+
+    dialect_insert = _dialect_insert(db)
+    stmt = dialect_insert(TaskDailyStat).values(
+        user_id=user_id,
+        day=day or rollup_day(),
+        quadrant=quadrant,
+        created_count=created,
+        completed_count=completed
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "day", "quadrant"],
+        set_={
+            "created_count": TaskDailyStat.created_count + stmt.excluded.created_count,
+            "completed_count": TaskDailyStat.completed_count + stmt.excluded.completed_count,
+        }
+    )
+    await db.execute(stmt)
+
+
+async def adjust_task_count(db: AsyncSession, user_id: int, delta: int) -> None:
+    """Атомарное изменение users.task_count (без commit)"""
+    if not delta:
+        return
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(task_count=User.task_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def recount_user_tasks(db: AsyncSession) -> None:
+    """
+    Пересчитывает users.task_count одним UPDATE с коррелированным подзапросом.
+
+    При нескольких шардах задачи считаются на каждом шарде, суммируются
+    и записываются в users основной базы.
+    """
+    if shard_count() == 1:
+        task_count = (
+            select(func.count(Task.id))
+            .where(Task.user_id == User.id)
+            .scalar_subquery()
+        )
+        await db.execute(
+            update(User)
+            .values(task_count=task_count)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return
+
+    async def shard_counts(session: AsyncSession):
+        result = await session.execute(
+            select(Task.user_id, func.count(Task.id)).group_by(Task.user_id)
+        )
+        return result.all()
+
+    counts: Dict[int, int] = {}
+    for rows in await gather_shards(shard_counts):
+        for user_id, count in rows:
+            counts[user_id] = counts.get(user_id, 0) + count
+
+    await db.execute(
+        update(User)
+        .values(task_count=0)
+        .execution_options(synchronize_session=False)
+    )
+    for user_id, count in counts.items():
+        await db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(task_count=count)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+
+
+async def backfill(db: AsyncSession, date_from: date, date_to: date) -> int:
+    """
+    Пересчитывает rollup'ы за период [date_from, date_to] по таблице tasks.
+
+    Идемпотентно: строки за период удаляются и вставляются заново.
+    Правила те же, что у record_task_event: задачи в корзине учитываются,
+    день - rollup_day() от времени создания или выполнения. Поэтому день
+    вычисляется в Python, а строки читаются потоком с запасом в сутки по краям.
+    Возвращает количество записанных строк rollup'а.
+    """
+    start = datetime.combine(date_from - timedelta(days=1), time.min)
+    end = datetime.combine(date_to + timedelta(days=2), time.min)
+
+    rows: Dict[Tuple[int, date, str], Dict[str, int]] = {}
+
+    async def count_events(query, field: str) -> None:
+        result = await db.stream(
+            query.execution_options(include_deleted=True, yield_per=BACKFILL_BATCH_SIZE)
+        )
+        async for user_id, quadrant, moment in result:
+            day = rollup_day(moment)
+            if date_from <= day <= date_to:
+                key = (user_id, day, quadrant)
+                rows.setdefault(key, {"created_count": 0, "completed_count": 0})[field] += 1
+
+    await count_events(
+        select(Task.user_id, Task.quadrant, Task.created_at)
+        .where(Task.created_at >= start, Task.created_at < end),
+        "created_count"
+    )
+    await count_events(
+        select(Task.user_id, Task.quadrant, Task.completed_at)
+        .where(
+            Task.completed == True,
+            Task.completed_at >= start,
+            Task.completed_at < end
+        ),
+        "completed_count"
+    )
+
+    await db.execute(
+        delete(TaskDailyStat).where(TaskDailyStat.day.between(date_from, date_to))
+    )
+
+    values = [
+        {"user_id": user_id, "day": day, "quadrant": quadrant, **counts}
+        for (user_id, day, quadrant), counts in rows.items()
+    ]
+    for i in range(0, len(values), BACKFILL_BATCH_SIZE):
+        await db.execute(insert(TaskDailyStat), values[i:i + BACKFILL_BATCH_SIZE])
+
+    await db.commit()
+    return len(values)
+
+
+async def load_trends(
+    db: AsyncSession,
+    date_from: date,
+    date_to: date,
+    granularity: str = "day",
+    user_id: Optional[int] = None,
+    quadrant: Optional[str] = None
+) -> List[dict]:
+    """
+    Ряды трендов из rollup'ов: не более (дней в периоде * 4) строк из БД.
+
+    user_id=None - агрегат по всем пользователям (сумма по всем шардам);
+    для одного пользователя db должна быть сессией его шарда.
+    """
+    query = (
+        select(
+            TaskDailyStat.day,
+            TaskDailyStat.quadrant,
+            func.sum(TaskDailyStat.created_count),
+            func.sum(TaskDailyStat.completed_count)
+        )
+        .where(TaskDailyStat.day.between(date_from, date_to))
+        .group_by(TaskDailyStat.day, TaskDailyStat.quadrant)
+    )
+    if user_id is not None:
+        query = query.where(TaskDailyStat.user_id == user_id)
+    if quadrant is not None:
+        query = query.where(TaskDailyStat.quadrant == quadrant)
+
+    async def trend_rows(session: AsyncSession):
+        result = await session.execute(query)
+        return result.all()
+
+    if user_id is None and shard_count() > 1:
+        shard_rows = await gather_shards(trend_rows)
+    else:
+        shard_rows = [await trend_rows(db)]
+
+    # Заполняем все периоды нулями, чтобы на графике не было разрывов
+    series: "OrderedDict[date, dict]" = OrderedDict()
+    period = _period_start(date_from, granularity)
+    while period <= date_to:
+        series[period] = {
+            "period": period.isoformat(),
+            "created": 0,
+            "completed": 0,
+            "by_quadrant": {q: {"created": 0, "completed": 0} for q in QUADRANTS}
+        }
+        period += timedelta(days=7 if granularity == "week" else 1)
+
+    for rows in shard_rows:
+        for day, row_quadrant, created, completed in rows:
+            point = series[_period_start(_as_date(day), granularity)]
+            point["created"] += created or 0
+            point["completed"] += completed or 0
+            if row_quadrant in point["by_quadrant"]:
+                point["by_quadrant"][row_quadrant]["created"] += created or 0
+                point["by_quadrant"][row_quadrant]["completed"] += completed or 0
+
+    return list(series.values())
+
+
+def _period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _as_date(value) -> date:
+    # SQLite возвращает func.date() строкой
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+async def _run_backfill(date_from: date, date_to: date) -> None:
+    from database import all_shard_sessionmakers
+
+    written = 0
+    for session_factory in all_shard_sessionmakers():
+        async with session_factory() as session:
+            written += await backfill(session, date_from, date_to)
+    print(f"✅ Rollup'ы пересчитаны за {date_from} - {date_to}: {written} строк")
+
+
+async def _run_recount_users() -> None:
+    from database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        await recount_user_tasks(session)
+    print("✅ Счетчики задач пользователей пересчитаны")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Обслуживание дневных rollup'ов по задачам")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = subparsers.add_parser("backfill", help="Пересчитать rollup'ы за период")
+    backfill_parser.add_argument("--from", dest="date_from", type=date.fromisoformat, required=True)
+    backfill_parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None, help="По умолчанию - сегодня")
+
+    subparsers.add_parser("recount-users", help="Пересчитать users.task_count")
+
+    args = parser.parse_args()
+    if args.command == "backfill":
+        asyncio.run(_run_backfill(args.date_from, args.date_to or date.today()))
+    elif args.command == "recount-users":
+        asyncio.run(_run_recount_users())
+
+
+if __name__ == "__main__":
+    main()
@@ -3,5 +3,11 @@ from . import tasks
 from . import stats
 from . import auth
 from . import admin
+from . import recurring
+from . import tags
+from . import trash
+from . import imports
+from . import jobs
+from . import calendar
 
-__all__ = ["tasks", "stats", "auth", "admin"]
\ No newline at end of file
+__all__ = ["tasks", "stats", "auth", "admin", "recurring", "tags", "trash", "imports", "jobs", "calendar"]
\ No newline at end of file
@@ -1,14 +1,25 @@
 # routers/admin.py
 from sqlalchemy import case
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from database import get_async_session
-from models import User, Task
+from sqlalchemy import select, func, or_
+from database import get_async_session, gather_shards, shard_for_user, shard_sessionmaker
+from models import User, Task, ActivityEvent
 from dependencies import get_current_admin
-from typing import List, Dict, Any
+from cache import stats_cache, GLOBAL_SCOPE
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+from deadlines import request_deadline
+import os
 
-router = APIRouter(prefix="/admin", tags=["admin"])
+# Отчеты администратора тяжелее обычных запросов, но ограничены - см. deadlines.py
+ADMIN_REQUEST_DEADLINE = float(os.getenv("ADMIN_REQUEST_DEADLINE", "30"))
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(request_deadline(ADMIN_REQUEST_DEADLINE))]
+)
 
 
 @router.get("/users")
@@ -21,17 +32,15 @@ async def get_all_users(
     
     Только для администраторов
     """
-    # Получаем всех пользователей с подсчетом их задач
+    # Количество задач берем из счетчика users.task_count, без JOIN с tasks
     result = await db.execute(
         select(
             User.id,
             User.nickname,
             User.email,
             User.role,
-            func.count(Task.id).label("task_count")
+            User.task_count
         )
-        .outerjoin(Task, User.id == Task.user_id)
-        .group_by(User.id)
         .order_by(User.id)
     )
     
@@ -49,6 +58,81 @@ async def get_all_users(
     ]
 
 
+@router.get("/users/directory")
+async def get_users_directory(
+    q: Optional[str] = Query(None, min_length=1, max_length=100, description="Префикс никнейма или email"),
+    sort: str = Query("task_count", pattern="^(task_count|id|nickname)$", description="Сортировка"),
+    limit: int = Query(20, ge=1, le=100, description="Размер страницы"),
+    offset: int = Query(0, ge=0, description="Смещение"),
+    db: AsyncSession = Depends(get_async_session),
+    admin: User = Depends(get_current_admin)
+):
+    """
+    Каталог пользователей с поиском по префиксу и пагинацией
+    
+    Поиск по префиксу использует индексы nickname/email, количество задач
+    читается из счетчика users.task_count.
+    
+    Только для администраторов
+    """
+    conditions = []
+    if q:
+        # Поиск без учета регистра по обоим полям (индексы по lower(...), см. README)
+        pattern = _escape_like(q.lower()) + "%"
+        conditions.append(
+            or_(
+                func.lower(User.nickname).like(pattern, escape="\\"),
+                func.lower(User.email).like(pattern, escape="\\")
+            )
+        )
+    
+    order_by = {
+        "task_count": (User.task_count.desc(), User.id.desc()),
+        "id": (User.id,),
+        "nickname": (User.nickname,),
+    }[sort]
+    
+    total_result = await db.execute(
+        select(func.count(User.id)).where(*conditions)
+    )
+    total = total_result.scalar() or 0
+    
+    result = await db.execute(
+        select(
+            User.id,
+            User.nickname,
+            User.email,
+            User.role,
+            User.task_count
+        )
+        .where(*conditions)
+        .order_by(*order_by)
+        .limit(limit)
+        .offset(offset)
+    )
+    
+    return {
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "items": [
+            {
+                "id": user.id,
+                "nickname": user.nickname,
+                "email": user.email,
+                "role": user.role,
+                "task_count": user.task_count
+            }
+            for user in result.all()
+        ]
+    }
+
+
+def _escape_like(value: str) -> str:
+    """Экранирование спецсимволов LIKE"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
 @router.get("/users/{user_id}/tasks")
 async def get_user_tasks(
     user_id: int,
@@ -69,11 +153,12 @@ async def get_user_tasks(
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    # Получаем задачи пользователя
-    tasks_result = await db.execute(
-        select(Task).where(Task.user_id == user_id).order_by(Task.created_at.desc())
-    )
-    tasks = tasks_result.scalars().all()
+    # Получаем задачи пользователя - из его шарда
+    async with shard_sessionmaker(shard_for_user(user_id))() as shard_db:
+        tasks_result = await shard_db.execute(
+            select(Task).where(Task.user_id == user_id).order_by(Task.created_at.desc())
+        )
+        tasks = tasks_result.scalars().all()
     
     return {
         "user": {
@@ -96,6 +181,68 @@ async def get_user_tasks(
     }
 
 
+@router.get("/activity")
+async def get_activity_log(
+    user_id: Optional[int] = Query(None, description="Пользователь"),
+    action: Optional[str] = Query(None, max_length=32, description="Действие, например task_delete"),
+    entity_type: Optional[str] = Query(None, max_length=16, description="task или user"),
+    entity_id: Optional[int] = Query(None, description="ID объекта"),
+    since: Optional[datetime] = Query(None, description="Не раньше"),
+    until: Optional[datetime] = Query(None, description="Не позже"),
+    before_id: Optional[int] = Query(None, description="Курсор: события с id меньше этого"),
+    limit: int = Query(50, ge=1, le=500, description="Размер страницы"),
+    db: AsyncSession = Depends(get_async_session),
+    admin: User = Depends(get_current_admin)
+):
+    """
+    Журнал действий, новые сверху
+    
+    Страницы - по курсору: next_before_id из ответа передается в before_id.
+    В режиме write-behind последние события появляются с задержкой до ACTIVITY_FLUSH_INTERVAL.
+    
+    Только для администраторов
+    """
+    conditions = []
+    if user_id is not None:
+        conditions.append(ActivityEvent.user_id == user_id)
+    if action:
+        conditions.append(ActivityEvent.action == action)
+    if entity_type:
+        conditions.append(ActivityEvent.entity_type == entity_type)
+    if entity_id is not None:
+        conditions.append(ActivityEvent.entity_id == entity_id)
+    if since:
+        conditions.append(ActivityEvent.created_at >= since)
+    if until:
+        conditions.append(ActivityEvent.created_at <= until)
+    if before_id is not None:
+        conditions.append(ActivityEvent.id < before_id)
+    
+    result = await db.execute(
+        select(ActivityEvent)
+        .where(*conditions)
+        .order_by(ActivityEvent.id.desc())
+        .limit(limit)
+    )
+    events = result.scalars().all()
+    
+    return {
+        "items": [
+            {
+                "id": event.id,
+                "created_at": event.created_at,
+                "user_id": event.user_id,
+                "action": event.action,
+                "entity_type": event.entity_type,
+                "entity_id": event.entity_id,
+                "details": event.details
+            }
+            for event in events
+        ],
+        "next_before_id": events[-1].id if len(events) == limit else None
+    }
+
+
 @router.get("/stats/overview")
 async def get_admin_stats(
     db: AsyncSession = Depends(get_async_session),
@@ -106,6 +253,13 @@ async def get_admin_stats(
     
     Только для администраторов
     """
+    return await stats_cache.get_or_compute(
+        ("admin_overview", GLOBAL_SCOPE),
+        lambda: _compute_admin_stats(db)
+    )
+
+
+async def _compute_admin_stats(db: AsyncSession) -> dict:
     # Общая статистика по пользователям
     users_result = await db.execute(
         select(
@@ -115,32 +269,34 @@ async def get_admin_stats(
     )
     users_stats = users_result.first()
     
-    # Общая статистика по задачам
-    tasks_result = await db.execute(
-        select(
-            func.count(Task.id).label("total_tasks"),
-            func.sum(case((Task.completed == True, 1), else_=0)).label("completed_tasks"),
-            func.sum(case((Task.deadline_at.isnot(None), 1), else_=0)).label("tasks_with_deadline")
+    # Статистика по задачам и квадрантам - параллельно на каждом шарде, затем сумма
+    async def shard_task_stats(session: AsyncSession):
+        tasks_result = await session.execute(
+            select(
+                func.count(Task.id).label("total_tasks"),
+                func.sum(case((Task.completed == True, 1), else_=0)).label("completed_tasks"),
+                func.sum(case((Task.deadline_at.isnot(None), 1), else_=0)).label("tasks_with_deadline")
+            )
         )
-    )
-    tasks_stats = tasks_result.first()
+        quadrant_result = await session.execute(
+            select(Task.quadrant, func.count(Task.id))
+            .group_by(Task.quadrant)
+        )
+        return tasks_result.first(), quadrant_result.all()
     
-    # Статистика по квадрантам
-    quadrant_result = await db.execute(
-        select(Task.quadrant, func.count(Task.id))
-        .group_by(Task.quadrant)
-    )
-    quadrant_stats = dict(quadrant_result.all())
+    total_tasks = completed_tasks = tasks_with_deadline = 0
+    quadrant_stats: Dict[str, int] = {}
+    for shard_stats, shard_quadrants in await gather_shards(shard_task_stats):
+        total_tasks += shard_stats.total_tasks or 0
+        completed_tasks += shard_stats.completed_tasks or 0
+        tasks_with_deadline += shard_stats.tasks_with_deadline or 0
+        for quadrant, count in shard_quadrants:
+            quadrant_stats[quadrant] = quadrant_stats.get(quadrant, 0) + count
     
-    # Задачи по пользователям (топ 10)
+    # Задачи по пользователям (топ 10) - по счетчику, через индекс (task_count, id)
     users_tasks_result = await db.execute(
-        select(
-            User.nickname,
-            func.count(Task.id).label("task_count")
-        )
-        .outerjoin(Task, User.id == Task.user_id)
-        .group_by(User.id)
-        .order_by(func.count(Task.id).desc())
+        select(User.nickname, User.task_count)
+        .order_by(User.task_count.desc(), User.id.desc())
         .limit(10)
     )
     top_users = users_tasks_result.all()
@@ -152,14 +308,26 @@ async def get_admin_stats(
             "regular": (users_stats.total_users or 0) - (users_stats.admin_count or 0)
         },
         "tasks": {
-            "total": tasks_stats.total_tasks or 0,
-            "completed": tasks_stats.completed_tasks or 0,
-            "with_deadline": tasks_stats.tasks_with_deadline or 0,
-            "completion_rate": round((tasks_stats.completed_tasks / tasks_stats.total_tasks * 100) if tasks_stats.total_tasks else 0, 1),
+            "total": total_tasks,
+            "completed": completed_tasks,
+            "with_deadline": tasks_with_deadline,
+            "completion_rate": round((completed_tasks / total_tasks * 100) if total_tasks else 0, 1),
             "by_quadrant": quadrant_stats
         },
         "top_users": [
             {"nickname": user.nickname, "task_count": user.task_count}
             for user in top_users
         ]
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    admin: User = Depends(get_current_admin)
+):
+    """
+    Метрики кэша статистики: размер, попадания, промахи, hit rate
+    
+    Только для администраторов
+    """
+    return stats_cache.metrics()
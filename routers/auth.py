@@ -8,6 +8,8 @@ from models import User, UserRole
 from schemas_auth import UserCreate, UserResponse, Token
 from auth_utils import verify_password, get_password_hash, create_access_token
 from dependencies import get_current_user
+from cache import stats_cache
+from activity_log import record_activity
 from pydantic import BaseModel, Field
 
 router = APIRouter(
@@ -60,8 +62,11 @@ async def register(
     )
     
     db.add(new_user)
+    await db.flush()
+    record_activity(db, "register", new_user.id, "user", new_user.id)
     await db.commit()
     await db.refresh(new_user)
+    stats_cache.invalidate_global()
     
     return new_user
 
@@ -80,6 +85,9 @@ async def login(
     
     # Проверяем пользователя и пароль
     if not user or not verify_password(form_data.password, user.hashed_password):
+        user_id = user.id if user else None
+        record_activity(db, "login_failed", user_id, "user", user_id, email=form_data.username)
+        await db.commit()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный email или пароль",
@@ -91,6 +99,9 @@ async def login(
         data={"sub": str(user.id), "role": user.role}
     )
     
+    record_activity(db, "login", user.id, "user", user.id)
+    await db.commit()
+    
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -130,6 +141,7 @@ async def change_password(
     
     # Обновляем пароль
     current_user.hashed_password = get_password_hash(password_data.new_password)
+    record_activity(db, "password_change", current_user.id, "user", current_user.id)
     
     await db.commit()
     await db.refresh(current_user)
@@ -0,0 +1,258 @@
+# routers/calendar.py
+import hashlib
+import os
+import secrets
+from datetime import date, datetime, time, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_session, shard_for_user, shard_sessionmaker
+from dependencies import get_current_user
+from models import Task, User
+from models.recurring_task import as_utc
+from schemas import CalendarDay, CalendarResponse, CalendarFeedResponse
+from routers.tasks import task_responses
+
+router = APIRouter(prefix="/calendar", tags=["calendar"])
+
+# Максимальная длина окна календаря в днях
+CALENDAR_MAX_DAYS = 62
+# ICS-лента: задачи с дедлайном не раньше ICS_PAST_DAYS дней назад, не больше ICS_MAX_EVENTS
+ICS_PAST_DAYS = int(os.getenv("ICS_PAST_DAYS", "30"))
+ICS_MAX_EVENTS = int(os.getenv("ICS_MAX_EVENTS", "1000"))
+ICS_PRODID = "-//Eisenhower ToDo//Task Calendar//RU"
+
+
+def _get_zone(tz: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="Неизвестный часовой пояс")
+
+
+@router.get("/", response_model=CalendarResponse)
+async def get_calendar(
+    date_from: date = Query(..., description="Первый день окна"),
+    date_to: date = Query(..., description="Последний день окна (включительно)"),
+    tz: str = Query("UTC", description="Часовой пояс IANA, например Europe/Moscow"),
+    completed: Optional[bool] = Query(None, description="Только выполненные (true) или невыполненные (false)"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> CalendarResponse:
+    """
+    Календарь задач пользователя по дням дедлайна
+    
+    Окно [date_from, date_to] переводится в UTC и читается одним диапазоном
+    по индексу (user_id, deadline_at); по дням задачи раскладываются в часовом
+    поясе tz. Возвращаются все дни окна, в том числе без задач.
+    """
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to раньше date_from")
+    if (date_to - date_from).days >= CALENDAR_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Окно не больше {CALENDAR_MAX_DAYS} дней")
+    
+    zone = _get_zone(tz)
+    start = datetime.combine(date_from, time.min, tzinfo=zone).astimezone(timezone.utc)
+    end = datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=zone).astimezone(timezone.utc)
+    
+    query = (
+        select(Task)
+        .where(
+            Task.user_id == current_user.id,
+            Task.deadline_at >= start,
+            Task.deadline_at < end
+        )
+        .order_by(Task.deadline_at, Task.id)
+    )
+    if completed is not None:
+        query = query.where(Task.completed == completed)
+    
+    result = await db.execute(query)
+    tasks = result.scalars().all()
+    
+    days: Dict[date, CalendarDay] = {}
+    day = date_from
+    while day <= date_to:
+        days[day] = CalendarDay(date=day, count=0)
+        day += timedelta(days=1)
+    
+    for response in await task_responses(db, tasks):
+        calendar_day = days[as_utc(response.deadline_at).astimezone(zone).date()]
+        calendar_day.count += 1
+        calendar_day.completed_count += int(response.completed)
+        calendar_day.items.append(response)
+    
+    return CalendarResponse(date_from=date_from, date_to=date_to, tz=tz, days=list(days.values()))
+
+
+@router.post("/feed", response_model=CalendarFeedResponse)
+async def create_calendar_feed(
+    request: Request,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> CalendarFeedResponse:
+    """
+    Включение ICS-ленты задач (или смена ее адреса)
+    
+    Адрес содержит секретный токен - календарные приложения не умеют передавать
+    авторизацию. Повторный вызов выдает новый адрес, старый перестает работать.
+    """
+    current_user.calendar_token = secrets.token_urlsafe(32)
+    await db.commit()
+    
+    return CalendarFeedResponse(url=str(request.url_for("calendar_feed", token=current_user.calendar_token)))
+
+
+@router.delete("/feed")
+async def delete_calendar_feed(
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Выключение ICS-ленты"""
+    current_user.calendar_token = None
+    await db.commit()
+    
+    return {"message": "ICS-лента выключена"}
+
+
+def _ics_text(value: str) -> str:
+    """Экранирование TEXT по RFC 5545"""
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _ics_datetime(value: datetime) -> str:
+    return as_utc(value).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _fold(line: str) -> str:
+    """Перенос строк длиннее 75 октетов (продолжение начинается с пробела)"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    current = ""
+    limit = 75
+    for char in line:
+        if len((current + char).encode("utf-8")) > limit:
+            parts.append(current)
+            current = ""
+            limit = 74
+        current += char
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+
+def _build_ics(tasks: List[Task], host: str) -> str:
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{ICS_PRODID}",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:Задачи",
+    ]
+    for task in tasks:
+        lines.extend([
+            "BEGIN:VEVENT",
+            f"UID:task-{task.id}@{host}",
+            f"DTSTAMP:{_ics_datetime(task.updated_at)}",
+            f"LAST-MODIFIED:{_ics_datetime(task.updated_at)}",
+            f"DTSTART:{_ics_datetime(task.deadline_at)}",
+            f"SUMMARY:{_ics_text(f'[{task.quadrant}] {task.title}')}",
+        ])
+        if task.description:
+            lines.append(f"DESCRIPTION:{_ics_text(task.description)}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Проверка If-None-Match (приоритетнее) и If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+        # Слабое сравнение: префикс W/ не учитывается
+        return "*" in candidates or etag.removeprefix("W/") in {
+            candidate.removeprefix("W/") for candidate in candidates
+        }
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= as_utc(since)
+    return False
+
+
+@router.get("/feed/{token}.ics", name="calendar_feed")
+async def get_calendar_feed(
+    token: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_session)
+) -> Response:
+    """
+    ICS-лента невыполненных задач с дедлайном (для подписки в календаре)
+    
+    Календари опрашивают ленту часто, поэтому сначала одним чтением по индексу
+    (user_id, updated_at) вычисляется время последнего изменения задач
+    пользователя (с учетом удаленных в корзину). Если оно совпадает с ETag или
+    не новее If-Modified-Since клиента, отдается 304 без чтения задач.
+    """
+    result = await db.execute(select(User.id).where(User.calendar_token == token))
+    user_id = result.scalar_one_or_none()
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="Лента не найдена")
+    
+    # Запрос без токена авторизации - сессия открыта на основной базе, задачи читаются из шарда владельца
+    async with shard_sessionmaker(shard_for_user(user_id))() as shard_db:
+        return await _calendar_feed_response(shard_db, user_id, request)
+
+
+async def _calendar_feed_response(db: AsyncSession, user_id: int, request: Request) -> Response:
+    result = await db.execute(
+        select(func.max(Task.updated_at))
+        .where(Task.user_id == user_id)
+        .execution_options(include_deleted=True)
+    )
+    last_modified = result.scalar_one_or_none()
+    if last_modified is not None:
+        last_modified = as_utc(last_modified)
+    
+    # Окно ленты сдвигается раз в сутки - день начала окна входит в ETag
+    window_start = datetime.combine(date.today() - timedelta(days=ICS_PAST_DAYS), time.min, tzinfo=timezone.utc)
+    version = f"{user_id}:{last_modified.isoformat() if last_modified else '-'}:{window_start.date().isoformat()}"
+    etag = f'W/"{hashlib.sha1(version.encode()).hexdigest()}"'
+    
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    
+    result = await db.execute(
+        select(Task)
+        .where(
+            Task.user_id == user_id,
+            Task.completed == False,
+            Task.deadline_at >= window_start
+        )
+        .order_by(Task.deadline_at, Task.id)
+        .limit(ICS_MAX_EVENTS)
+    )
+    body = _build_ics(result.scalars().all(), request.url.hostname or "localhost")
+    
+    return Response(content=body, media_type="text/calendar; charset=utf-8", headers=headers)
@@ -0,0 +1,286 @@
+# routers/imports.py
+import csv
+import io
+import json
+import logging
+import os
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from pydantic import ValidationError
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_session
+from dependencies import get_current_user
+from models import Task, User, task_tags
+from schemas import TaskImport, ImportResult
+from cache import stats_cache
+from rollups import record_task_event, adjust_task_count
+from reminders import reminder_scheduler
+from activity_log import record_activity
+from deadlines import request_deadline
+from routers.tags import ensure_tags
+from routers.tasks import calculate_urgency_and_quadrant
+from positions import append_positions
+
+router = APIRouter(prefix="/import", tags=["import"])
+logger = logging.getLogger(__name__)
+
+# Строк на одну пачку: валидация, один многострочный INSERT и commit
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Сколько ошибок вернуть в ответе (считаются все)
+MAX_REPORTED_ERRORS = 100
+# Ограничение на одну JSON-запись, чтобы битый файл не читался в память целиком
+MAX_JSON_RECORD_CHARS = 1024 * 1024
+READ_CHUNK_CHARS = 64 * 1024
+# Дедлайн запроса импорта (вместо REQUEST_DEADLINE): уже зафиксированные пачки остаются
+IMPORT_REQUEST_DEADLINE = float(os.getenv("IMPORT_REQUEST_DEADLINE", "300"))
+
+
+def _iter_csv_records(stream: io.TextIOBase) -> Iterator[dict]:
+    """Строки CSV как словари; пустые ячейки пропускаются (действуют значения по умолчанию), метки через запятую"""
+    for record in csv.DictReader(stream):
+        row = {key: value for key, value in record.items() if key and value not in ("", None)}
+        if row.get("tags"):
+            row["tags"] = [name for name in row["tags"].split(",") if name.strip()]
+        elif "tags" in row:
+            row.pop("tags")
+        yield row
+
+
+def _iter_json_records(stream: io.TextIOBase) -> Iterator[dict]:
+    """
+    Объекты JSON-массива или JSON Lines по одному, без чтения файла целиком.
+    
+    Разделители массива ([ , ]) и пробелы пропускаются, каждый объект
+    разбирается raw_decode из буфера, который дочитывается по мере надобности.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    
+    while True:
+        buffer = buffer.lstrip(" \t\r\n[],")
+        if not buffer:
+            if eof:
+                return
+            chunk = stream.read(READ_CHUNK_CHARS)
+            eof = not chunk
+            buffer = chunk
+            continue
+    
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as e:
+            if eof or len(buffer) > MAX_JSON_RECORD_CHARS:
+                raise ValueError(f"Некорректный JSON: {e.msg}")
+            chunk = stream.read(READ_CHUNK_CHARS)
+            eof = not chunk
+            buffer += chunk
+            continue
+    
+        # Объект мог закончиться ровно на границе буфера: дочитываем, чтобы
+        # не разрезать число или literal на конце
+        if end == len(buffer) and not eof and not isinstance(record, (dict, list)):
+            chunk = stream.read(READ_CHUNK_CHARS)
+            eof = not chunk
+            buffer += chunk
+            continue
+    
+        buffer = buffer[end:]
+        yield record
+
+
+def _detect_format(upload: UploadFile) -> str:
+    filename = (upload.filename or "").lower()
+    content_type = (upload.content_type or "").lower()
+    
+    if filename.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    if filename.endswith((".json", ".jsonl", ".ndjson")) or "json" in content_type:
+        return "json"
+    raise HTTPException(status_code=400, detail="Поддерживаются файлы CSV и JSON")
+
+
+def _format_errors(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" if item["loc"] else item["msg"]
+        for item in error.errors()
+    )
+
+
+def _read_chunk(records: Iterator[object], rows_before: int) -> Tuple[List[Tuple[int, object]], Optional[dict]]:
+    """
+    Следующие IMPORT_CHUNK_SIZE записей с номерами строк и ошибка чтения (или None).
+    
+    Чтение файла и разбор CSV/JSON синхронные - вызывается в пуле потоков.
+    """
+    chunk: List[Tuple[int, object]] = []
+    while len(chunk) < IMPORT_CHUNK_SIZE:
+        try:
+            record = next(records)
+        except StopIteration:
+            break
+        except (ValueError, csv.Error) as e:
+            # Файл поврежден дальше этой строки - импортируем то, что прочитано до нее
+            row_number = rows_before + len(chunk) + 1
+            return chunk, {"row": row_number, "error": f"Не удалось прочитать файл: {e}"}
+        chunk.append((rows_before + len(chunk) + 1, record))
+    return chunk, None
+
+
+def _validate_chunk(records: List[Tuple[int, object]]) -> Tuple[List[Tuple[int, TaskImport]], List[dict]]:
+    """Проверка пачки записей по TaskImport: (валидные строки, ошибки по строкам)"""
+    valid = []
+    errors = []
+    for row_number, record in records:
+        if not isinstance(record, dict):
+            errors.append({"row": row_number, "error": "Запись должна быть объектом"})
+            continue
+        try:
+            task = TaskImport.model_validate(record)
+        except ValidationError as e:
+            errors.append({"row": row_number, "error": _format_errors(e)})
+            continue
+        if task.parent_id is not None:
+            errors.append({"row": row_number, "error": "parent_id не поддерживается при импорте"})
+            continue
+        valid.append((row_number, task))
+    return valid, errors
+
+
+async def _insert_chunk(db: AsyncSession, user_id: int, tasks: List[TaskImport], today: date) -> None:
+    """Пачка задач одним многострочным INSERT ... RETURNING, метки - еще двумя запросами"""
+    rows = []
+    for task in tasks:
+        _, quadrant = calculate_urgency_and_quadrant(task.deadline_at, task.is_important, today)
+        rows.append({
+            "title": task.title,
+            "description": task.description,
+            "is_important": task.is_important,
+            "deadline_at": task.deadline_at,
+            "quadrant": quadrant,
+            "completed": False,
+            "user_id": user_id,
+            "path": "",
+        })
+    
+    # Позиции в конце квадрантов в порядке файла: одно чтение максимума на квадрант пачки
+    rows_by_quadrant = defaultdict(list)
+    for row in rows:
+        rows_by_quadrant[row["quadrant"]].append(row)
+    for quadrant, quadrant_rows in rows_by_quadrant.items():
+        positions = await append_positions(db, user_id, quadrant, len(quadrant_rows))
+        for row, position in zip(quadrant_rows, positions):
+            row["position"] = position
+    
+    result = await db.execute(
+        insert(Task).returning(Task.id, sort_by_parameter_order=True),
+        rows
+    )
+    task_ids = list(result.scalars().all())
+    
+    tag_names = sorted({name for task in tasks for name in task.tags})
+    if tag_names:
+        tag_ids = await ensure_tags(db, user_id, tag_names)
+        await db.execute(
+            insert(task_tags),
+            [
+                {"task_id": task_id, "tag_id": tag_ids[name]}
+                for task_id, task in zip(task_ids, tasks)
+                for name in task.tags
+            ]
+        )
+    
+    for quadrant, count in Counter(row["quadrant"] for row in rows).items():
+        await record_task_event(db, user_id, quadrant, created=count)
+    await adjust_task_count(db, user_id, len(rows))
+    await db.commit()
+    
+    for task_id, row in zip(task_ids, rows):
+        reminder_scheduler.schedule(task_id, user_id, row["deadline_at"])
+
+
+@router.post(
+    "/tasks",
+    response_model=ImportResult,
+    dependencies=[Depends(request_deadline(IMPORT_REQUEST_DEADLINE))]
+)
+async def import_tasks(
+    file: UploadFile = File(..., description="CSV (с заголовком) или JSON: массив объектов / JSON Lines"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> ImportResult:
+    """
+    Массовый импорт задач
+    
+    Поля - как в создании задачи (title, description, is_important, deadline_at, tags);
+    пустые ячейки CSV и отсутствующие поля получают значения по умолчанию
+    (is_important - false).
+    Файл читается потоком и обрабатывается пачками по IMPORT_CHUNK_SIZE строк:
+    каждая пачка проверяется по TaskImport, вставляется одним INSERT и
+    фиксируется отдельно, поэтому память не зависит от размера файла.
+    Строки с ошибками пропускаются и перечисляются в ответе.
+    """
+    file_format = _detect_format(file)
+    # Файл загрузки уже лежит во временном файле - читаем его как текст потоком
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    records = _iter_csv_records(stream) if file_format == "csv" else _iter_json_records(stream)
+    
+    today = date.today()
+    imported = 0
+    failed = 0
+    errors: List[dict] = []
+    
+    def report(chunk_errors: List[dict]) -> None:
+        nonlocal failed
+        failed += len(chunk_errors)
+        errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+    
+    async def flush(chunk: List[Tuple[int, object]]) -> None:
+        nonlocal imported
+        if not chunk:
+            return
+        valid, chunk_errors = await run_in_threadpool(_validate_chunk, chunk)
+        report(chunk_errors)
+        if valid:
+            await _insert_chunk(db, current_user.id, [task for _, task in valid], today)
+            imported += len(valid)
+    
+    # Чтение, разбор и проверка пачки - в пуле потоков, чтобы не блокировать
+    # цикл событий на больших файлах; в цикле остаются только запросы к БД
+    row_number = 0
+    read_error = None
+    try:
+        while True:
+            chunk, read_error = await run_in_threadpool(_read_chunk, records, row_number)
+            row_number += len(chunk)
+            await flush(chunk)
+            if read_error or len(chunk) < IMPORT_CHUNK_SIZE:
+                break
+    finally:
+        stream.detach()
+    
+    if read_error:
+        report([read_error])
+    
+    if imported:
+        record_activity(db, "task_import", current_user.id, imported=imported, failed=failed, format=file_format)
+        await db.commit()
+        stats_cache.invalidate_user(current_user.id)
+    
+    logger.info(
+        "Импорт задач",
+        extra={"user_id": current_user.id, "format": file_format, "imported": imported, "failed": failed}
+    )
+    
+    return ImportResult(
+        imported=imported,
+        failed=failed,
+        errors=errors,
+        errors_truncated=failed > len(errors)
+    )
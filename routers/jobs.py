@@ -0,0 +1,136 @@
+# routers/jobs.py
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import ValidationError
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_session
+from dependencies import get_current_user
+from models import Job, User
+from schemas import JobCreate, JobResponse, JobDetailResponse
+from activity_log import record_activity
+from jobs import JOB_TYPES, job_runner, validate_params
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+async def _get_job(db: AsyncSession, job_id: int, current_user: User) -> Job:
+    result = await db.execute(select(Job).where(Job.id == job_id))
+    job = result.scalar_one_or_none()
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    
+    if current_user.role != "admin" and job.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Нет доступа к этому заданию"
+        )
+    
+    return job
+
+
+@router.post("/", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    job_data: JobCreate,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> JobResponse:
+    """
+    Постановка фонового задания в очередь
+    
+    Типы: export_tasks (параметр include_completed), recompute_quadrants,
+    для администратора также recompute_all_quadrants и rollups_backfill
+    (параметры date_from, date_to). Статус и результат - GET /jobs/{id}.
+    """
+    job_type = JOB_TYPES.get(job_data.type)
+    if job_type is None:
+        raise HTTPException(status_code=400, detail="Неизвестный тип задания")
+    
+    if job_type.admin_only and current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Задание доступно только администратору"
+        )
+    
+    try:
+        params = validate_params(job_type, job_data.params)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    
+    job = Job(type=job_type.name, user_id=current_user.id, params=params, status="queued")
+    db.add(job)
+    await db.flush()
+    record_activity(db, "job_create", current_user.id, "job", job.id, type=job.type)
+    await db.commit()
+    await db.refresh(job)
+    job_runner.notify()
+    
+    return job
+
+
+@router.get("/", response_model=List[JobResponse])
+async def get_jobs(
+    limit: int = Query(20, ge=1, le=100, description="Сколько последних заданий вернуть"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> List[JobResponse]:
+    """Последние задания пользователя, новые сверху (без результатов)"""
+    result = await db.execute(
+        select(Job)
+        .where(Job.user_id == current_user.id)
+        .order_by(Job.id.desc())
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+@router.get("/{job_id}", response_model=JobDetailResponse)
+async def get_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> JobDetailResponse:
+    """Статус, прогресс (progress_done из progress_total) и результат задания"""
+    return await _get_job(db, job_id, current_user)
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> JobResponse:
+    """
+    Отмена задания
+    
+    Задание в очереди отменяется сразу; выполняемое - прерывается воркером
+    при ближайшей проверке (отчет о прогрессе или heartbeat).
+    """
+    job = await _get_job(db, job_id, current_user)
+    
+    if job.status not in ("queued", "running"):
+        raise HTTPException(status_code=409, detail="Задание уже завершено")
+    
+    # Условный UPDATE: воркер мог забрать задание из очереди одновременно с отменой
+    result = await db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == "queued")
+        .values(status="cancelled", cancel_requested=True, finished_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await db.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.status == "running")
+            .values(cancel_requested=True)
+            .execution_options(synchronize_session=False)
+        )
+    record_activity(db, "job_cancel", current_user.id, "job", job.id, type=job.type)
+    await db.commit()
+    await db.refresh(job)
+    
+    return job
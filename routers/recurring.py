@@ -0,0 +1,340 @@
+# routers/recurring.py
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, update, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_session
+from dependencies import get_current_user
+from models import RecurringTask, Task, User
+from models.recurring_task import as_utc
+from schemas import (
+    RecurringTaskCreate, RecurringTaskResponse, OccurrenceResponse, TaskResponse, TaskUpdate
+)
+from cache import stats_cache
+from rollups import record_task_event, adjust_task_count
+from reminders import reminder_scheduler
+from positions import append_position
+from routers.tags import load_task_tags
+from routers.tasks import (
+    calculate_urgency_and_quadrant, calculate_days_until_deadline, apply_task_update, task_response
+)
+
+router = APIRouter(prefix="/recurring", tags=["recurring"])
+logger = logging.getLogger(__name__)
+
+# Максимальный период, за который вычисляются вхождения
+MAX_OCCURRENCE_DAYS = 366
+
+
+def _rule_response(rule: RecurringTask) -> RecurringTaskResponse:
+    return RecurringTaskResponse(
+        id=rule.id,
+        user_id=rule.user_id,
+        title=rule.title,
+        description=rule.description,
+        is_important=rule.is_important,
+        frequency=rule.frequency,
+        interval=rule.interval,
+        weekdays=rule.weekday_list(),
+        starts_at=rule.starts_at,
+        until=rule.until,
+        created_at=rule.created_at
+    )
+
+
+def _day_bounds(day: date) -> tuple:
+    # Даты вхождений считаются в UTC
+    return (
+        datetime.combine(day, time.min, tzinfo=timezone.utc),
+        datetime.combine(day, time.max, tzinfo=timezone.utc)
+    )
+
+
+async def _get_rule(db: AsyncSession, rule_id: int, current_user: User) -> RecurringTask:
+    result = await db.execute(select(RecurringTask).where(RecurringTask.id == rule_id))
+    rule = result.scalar_one_or_none()
+    
+    if not rule:
+        raise HTTPException(status_code=404, detail="Повторяющаяся задача не найдена")
+    
+    if current_user.role != "admin" and rule.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Нет доступа к этой задаче"
+        )
+    
+    return rule
+
+
+async def _find_occurrence_task(db: AsyncSession, rule_id: int, occurrence_at: datetime) -> Optional[Task]:
+    # Включая корзину: удаленное вхождение не материализуется заново
+    result = await db.execute(
+        select(Task)
+        .where(Task.recurring_task_id == rule_id, Task.occurrence_at == occurrence_at)
+        .execution_options(include_deleted=True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def _materialize(db: AsyncSession, rule: RecurringTask, occurrence_date: date) -> Task:
+    """
+    Возвращает задачу для вхождения правила на дату, создавая ее при первом обращении.
+    Коммит - на вызывающем.
+    """
+    occurrences = rule.occurrences_between(*_day_bounds(occurrence_date))
+    if not occurrences:
+        raise HTTPException(status_code=404, detail="На эту дату нет вхождения повторяющейся задачи")
+    
+    rule_id = rule.id
+    occurrence_at = occurrences[0]
+    
+    task = await _find_occurrence_task(db, rule_id, occurrence_at)
+    if task:
+        if task.deleted_at is not None:
+            raise HTTPException(status_code=404, detail="Вхождение удалено в корзину")
+        return task
+    
+    _, quadrant = calculate_urgency_and_quadrant(occurrence_at, rule.is_important)
+    position = await append_position(db, rule.user_id, quadrant)
+    task = Task(
+        title=rule.title,
+        description=rule.description,
+        is_important=rule.is_important,
+        deadline_at=occurrence_at,
+        quadrant=quadrant,
+        position=position,
+        completed=False,
+        user_id=rule.user_id,
+        recurring_task_id=rule_id,
+        occurrence_at=occurrence_at
+    )
+    
+    try:
+        # Откатывается только вставка: работа запроса до нее и загруженные объекты сохраняются
+        async with db.begin_nested():
+            db.add(task)
+            await db.flush()
+    except IntegrityError:
+        # Вхождение уже материализовано параллельным запросом
+        task = await _find_occurrence_task(db, rule_id, occurrence_at)
+        if task is None:
+            raise
+        if task.deleted_at is not None:
+            raise HTTPException(status_code=404, detail="Вхождение удалено в корзину")
+        return task
+    
+    await record_task_event(db, task.user_id, quadrant, created=1)
+    await adjust_task_count(db, task.user_id, 1)
+    return task
+
+
+@router.post("/", response_model=RecurringTaskResponse, status_code=status.HTTP_201_CREATED)
+async def create_recurring_task(
+    rule_data: RecurringTaskCreate,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> RecurringTaskResponse:
+    """
+    Создание повторяющейся задачи
+    
+    Сохраняется только правило - вхождения не создаются заранее.
+    """
+    if rule_data.weekdays and rule_data.frequency != "weekly":
+        raise HTTPException(status_code=400, detail="Дни недели задаются только для weekly")
+    if rule_data.until and as_utc(rule_data.until) < as_utc(rule_data.starts_at):
+        raise HTTPException(status_code=400, detail="Дата окончания раньше первого вхождения")
+    
+    rule = RecurringTask(
+        title=rule_data.title,
+        description=rule_data.description,
+        is_important=rule_data.is_important,
+        frequency=rule_data.frequency,
+        interval=rule_data.interval,
+        weekdays=",".join(str(day) for day in rule_data.weekdays) if rule_data.weekdays else None,
+        starts_at=rule_data.starts_at,
+        until=rule_data.until,
+        user_id=current_user.id
+    )
+    db.add(rule)
+    await db.commit()
+    await db.refresh(rule)
+    
+    return _rule_response(rule)
+
+
+@router.get("/", response_model=List[RecurringTaskResponse])
+async def get_recurring_tasks(
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> List[RecurringTaskResponse]:
+    """Список правил: администратор видит все, пользователь - только свои"""
+    query = select(RecurringTask).order_by(RecurringTask.id)
+    if current_user.role != "admin":
+        query = query.where(RecurringTask.user_id == current_user.id)
+    
+    result = await db.execute(query)
+    return [_rule_response(rule) for rule in result.scalars().all()]
+
+
+@router.get("/occurrences", response_model=List[OccurrenceResponse])
+async def get_occurrences(
+    date_from: Optional[date] = Query(None, description="Начало периода (по умолчанию - сегодня)"),
+    date_to: Optional[date] = Query(None, description="Конец периода (по умолчанию - через 13 дней)"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> List[OccurrenceResponse]:
+    """
+    Вхождения повторяющихся задач за период
+    
+    Вычисляются по правилам при чтении; уже материализованные вхождения
+    (выполненные или отредактированные) берутся из задач.
+    """
+    date_from = date_from or date.today()
+    date_to = date_to or (date_from + timedelta(days=13))
+    
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="Начало периода позже его конца")
+    if (date_to - date_from).days >= MAX_OCCURRENCE_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Период не может превышать {MAX_OCCURRENCE_DAYS} дней"
+        )
+    
+    window_start, _ = _day_bounds(date_from)
+    _, window_end = _day_bounds(date_to)
+    
+    query = select(RecurringTask).where(
+        RecurringTask.starts_at <= window_end,
+        or_(RecurringTask.until.is_(None), RecurringTask.until >= window_start)
+    )
+    if current_user.role != "admin":
+        query = query.where(RecurringTask.user_id == current_user.id)
+    rules = (await db.execute(query)).scalars().all()
+    
+    if not rules:
+        return []
+    
+    # Удаленные в корзину вхождения тоже читаются - чтобы не показывать их заново по правилу
+    result = await db.execute(
+        select(Task)
+        .where(
+            Task.recurring_task_id.in_([rule.id for rule in rules]),
+            Task.occurrence_at.between(window_start, window_end)
+        )
+        .execution_options(include_deleted=True)
+    )
+    materialized = {
+        (task.recurring_task_id, as_utc(task.occurrence_at)): task
+        for task in result.scalars().all()
+    }
+    
+    occurrences = []
+    for rule in rules:
+        for occurrence_at in rule.occurrences_between(window_start, window_end):
+            task = materialized.get((rule.id, occurrence_at))
+            if task and task.deleted_at is not None:
+                continue
+            if task:
+                is_urgent, _ = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
+                occurrences.append(OccurrenceResponse(
+                    recurring_task_id=rule.id,
+                    occurrence_date=occurrence_at.date(),
+                    task_id=task.id,
+                    user_id=task.user_id,
+                    title=task.title,
+                    description=task.description,
+                    is_important=task.is_important,
+                    deadline_at=task.deadline_at,
+                    quadrant=task.quadrant,
+                    is_urgent=is_urgent,
+                    days_until_deadline=calculate_days_until_deadline(task.deadline_at),
+                    completed=task.completed
+                ))
+            else:
+                is_urgent, quadrant = calculate_urgency_and_quadrant(occurrence_at, rule.is_important)
+                occurrences.append(OccurrenceResponse(
+                    recurring_task_id=rule.id,
+                    occurrence_date=occurrence_at.date(),
+                    user_id=rule.user_id,
+                    title=rule.title,
+                    description=rule.description,
+                    is_important=rule.is_important,
+                    deadline_at=occurrence_at,
+                    quadrant=quadrant,
+                    is_urgent=is_urgent,
+                    days_until_deadline=calculate_days_until_deadline(occurrence_at)
+                ))
+    
+    occurrences.sort(key=lambda occurrence: (as_utc(occurrence.deadline_at), occurrence.recurring_task_id))
+    return occurrences
+
+
+@router.put("/{rule_id}/occurrences/{occurrence_date}", response_model=TaskResponse)
+async def update_occurrence(
+    rule_id: int,
+    occurrence_date: date,
+    task_update: TaskUpdate,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> TaskResponse:
+    """Редактирование вхождения: вхождение сохраняется как обычная задача"""
+    rule = await _get_rule(db, rule_id, current_user)
+    task = await _materialize(db, rule, occurrence_date)
+    await apply_task_update(db, task, task_update.model_dump(exclude_unset=True))
+    
+    await db.commit()
+    await db.refresh(task)
+    stats_cache.invalidate_user(task.user_id)
+    reminder_scheduler.task_changed(task)
+    
+    tags_by_task = await load_task_tags(db, [task.id])
+    return task_response(task, tags_by_task.get(task.id))
+
+
+@router.patch("/{rule_id}/occurrences/{occurrence_date}/complete", response_model=TaskResponse)
+async def complete_occurrence(
+    rule_id: int,
+    occurrence_date: date,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> TaskResponse:
+    """Отметить вхождение выполненным"""
+    rule = await _get_rule(db, rule_id, current_user)
+    task = await _materialize(db, rule, occurrence_date)
+    await apply_task_update(db, task, {"completed": True})
+    
+    await db.commit()
+    await db.refresh(task)
+    stats_cache.invalidate_user(task.user_id)
+    
+    return task_response(task)
+
+
+@router.delete("/{rule_id}")
+async def delete_recurring_task(
+    rule_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Удаление правила
+    
+    Материализованные вхождения остаются обычными задачами.
+    """
+    rule = await _get_rule(db, rule_id, current_user)
+    
+    await db.execute(
+        update(Task)
+        .where(Task.recurring_task_id == rule.id)
+        .values(recurring_task_id=None)
+        .execution_options(include_deleted=True)
+    )
+    await db.delete(rule)
+    await db.commit()
+    
+    return {"message": "Повторяющаяся задача удалена", "id": rule_id}
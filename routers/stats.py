@@ -1,13 +1,21 @@
 # routers/stats.py
-from fastapi import APIRouter, Depends
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from datetime import date, datetime, time
+from sqlalchemy import select, func, or_
+from datetime import date, datetime, time, timedelta
+from typing import Optional
 from models import Task, User
-from database import get_async_session
+from database import get_async_session, gather_shards, shard_count, shard_for_user, shard_sessionmaker
 from dependencies import get_current_user
+from cache import stats_cache, stats_scope, GLOBAL_SCOPE
+from rollups import load_trends
 
-router = APIRouter(tags=["statistics"])
+router = APIRouter(prefix="/stats", tags=["statistics"])
+logger = logging.getLogger(__name__)
+
+# Максимальный период трендов (дней) - ограничивает размер выборки из rollup'ов
+MAX_TRENDS_DAYS = 731
 
 
 @router.get("/")
@@ -18,51 +26,53 @@ async def get_tasks_stats(
     """
     Получение статистики по задачам
     """
-    print(f"DEBUG: stats.py - get_tasks_stats вызван, пользователь: {current_user}")
+    logger.debug("get_tasks_stats", extra={"user_id": current_user.id, "role": current_user.role})
     
+    return await stats_cache.get_or_compute(
+        ("stats", stats_scope(current_user)),
+        lambda: _compute_tasks_stats(db, current_user)
+    )
+
+
+def _owner_filter(current_user: User) -> list:
+    """Условие на владельца: администратор видит все задачи, пользователь - только свои"""
     if current_user.role == "admin":
-        # Администратор видит статистику по всем задачам
-        total_result = await db.execute(select(func.count(Task.id)))
-        total_tasks = total_result.scalar()
-        
-        quadrant_result = await db.execute(
-            select(Task.quadrant, func.count(Task.id))
-            .group_by(Task.quadrant)
-        )
-        by_quadrant = dict(quadrant_result.all())
-        
-        status_result = await db.execute(
-            select(Task.completed, func.count(Task.id))
-            .group_by(Task.completed)
-        )
-        status_data = dict(status_result.all())
-    else:
-        # Обычный пользователь видит статистику только по своим задачам
-        total_result = await db.execute(
-            select(func.count(Task.id)).where(Task.user_id == current_user.id)
-        )
-        total_tasks = total_result.scalar()
-        
-        quadrant_result = await db.execute(
-            select(Task.quadrant, func.count(Task.id))
-            .where(Task.user_id == current_user.id)
-            .group_by(Task.quadrant)
-        )
-        by_quadrant = dict(quadrant_result.all())
-        
-        status_result = await db.execute(
-            select(Task.completed, func.count(Task.id))
-            .where(Task.user_id == current_user.id)
-            .group_by(Task.completed)
-        )
-        status_data = dict(status_result.all())
+        return []
+    return [Task.user_id == current_user.id]
+
+
+async def _owner_scope(db: AsyncSession, current_user: User, query) -> list:
+    """
+    query(session) в области видимости пользователя: результаты по шардам списком.
     
-    # Форматируем результат
-    by_status = {"completed": status_data.get(True, 0), "pending": status_data.get(False, 0)}
+    Задачи пользователя лежат в его шарде (сессия запроса), все задачи для
+    администратора - на всех шардах (scatter-gather).
+    """
+    if current_user.role == "admin" and shard_count() > 1:
+        return await gather_shards(query)
+    return [await query(db)]
+
+
+async def _compute_tasks_stats(db: AsyncSession, current_user: User) -> dict:
+    # Итог, квадранты и статусы - одним запросом с группировкой по (quadrant, completed)
+    async def counts(session: AsyncSession):
+        result = await session.execute(
+            select(Task.quadrant, Task.completed, func.count(Task.id))
+            .where(*_owner_filter(current_user))
+            .group_by(Task.quadrant, Task.completed)
+        )
+        return result.all()
     
+    total_tasks = 0
     # Заполняем все квадранты нулями если их нет
     all_quadrants = {"Q1": 0, "Q2": 0, "Q3": 0, "Q4": 0}
-    all_quadrants.update(by_quadrant)
+    by_status = {"completed": 0, "pending": 0}
+    
+    for rows in await _owner_scope(db, current_user, counts):
+        for quadrant, completed, count in rows:
+            total_tasks += count
+            all_quadrants[quadrant] = all_quadrants.get(quadrant, 0) + count
+            by_status["completed" if completed else "pending"] += count
     
     return {
         "total_tasks": total_tasks,
@@ -77,28 +87,33 @@ async def get_deadlines_stats(
     current_user: User = Depends(get_current_user)
 ):
     """Статистика по дедлайнам для невыполненных задач"""
-    print(f"DEBUG: stats.py - get_deadlines_stats вызван, пользователь: {current_user}")
+    logger.debug("get_deadlines_stats", extra={"user_id": current_user.id, "role": current_user.role})
     
-    if current_user.role == "admin":
-        result = await db.execute(
-            select(Task).where(Task.completed == False)
-        )
-    else:
-        result = await db.execute(
-            select(Task).where(
-                Task.completed == False,
-                Task.user_id == current_user.id
-            )
+    # Дата в ключе: days_until_deadline и статусы меняются со сменой дня
+    return await stats_cache.get_or_compute(
+        ("deadlines", stats_scope(current_user), date.today().isoformat()),
+        lambda: _compute_deadlines_stats(db, current_user)
+    )
+
+
+async def _compute_deadlines_stats(db: AsyncSession, current_user: User) -> dict:
+    async def pending_tasks(session: AsyncSession):
+        result = await session.execute(
+            select(Task).where(Task.completed == False, *_owner_filter(current_user))
         )
+        return result.scalars().all()
     
-    tasks = result.scalars().all()
-    
-    today = date.today()
+    tasks = [task for shard_tasks in await _owner_scope(db, current_user, pending_tasks) for task in shard_tasks]
+    return _build_deadlines_stats(tasks, date.today())
+
+
+def _build_deadlines_stats(tasks, today: date) -> dict:
+    """Статистика дедлайнов по уже загруженным задачам (учитываются невыполненные)"""
     deadline_stats = []
     overdue_tasks = 0
     
     for task in tasks:
-        if task.deadline_at:
+        if task.deadline_at and not task.completed:
             deadline_date = task.deadline_at.date()
             days_until_deadline = (deadline_date - today).days
             
@@ -144,28 +159,37 @@ async def get_today_stats(
     """
     Статистика по задачам на сегодня
     """
-    print(f"DEBUG: stats.py - get_today_stats вызван, пользователь: {current_user}")
+    logger.debug("get_today_stats", extra={"user_id": current_user.id, "role": current_user.role})
     
+    return await stats_cache.get_or_compute(
+        ("today", stats_scope(current_user), date.today().isoformat()),
+        lambda: _compute_today_stats(db, current_user)
+    )
+
+
+def _today_bounds(today: date) -> tuple:
+    return datetime.combine(today, time.min), datetime.combine(today, time.max)
+
+
+async def _compute_today_stats(db: AsyncSession, current_user: User) -> dict:
     today = date.today()
-    today_start = datetime.combine(today, time.min)
-    today_end = datetime.combine(today, time.max)
+    today_start, today_end = _today_bounds(today)
     
-    if current_user.role == "admin":
-        result = await db.execute(
-            select(Task).where(
-                Task.deadline_at.between(today_start, today_end)
-            )
-        )
-    else:
-        result = await db.execute(
+    async def due_today_tasks(session: AsyncSession):
+        result = await session.execute(
             select(Task).where(
                 Task.deadline_at.between(today_start, today_end),
-                Task.user_id == current_user.id
+                *_owner_filter(current_user)
             )
         )
+        return result.scalars().all()
     
-    tasks = result.scalars().all()
-    
+    tasks = [task for shard_tasks in await _owner_scope(db, current_user, due_today_tasks) for task in shard_tasks]
+    return _build_today_stats(tasks, today)
+
+
+def _build_today_stats(tasks, today: date) -> dict:
+    """Статистика по задачам с дедлайном сегодня (tasks уже отфильтрованы по дате)"""
     total_tasks_today = len(tasks)
     
     by_quadrant = {"Q1": 0, "Q2": 0, "Q3": 0, "Q4": 0}
@@ -202,4 +226,109 @@ async def get_today_stats(
         "by_status": by_status,
         "completion_rate": completion_rate,
         "tasks": today_tasks
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/dashboard")
+async def get_dashboard_stats(
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Сводка для страницы статистики: общая статистика, дедлайны и задачи на сегодня
+    
+    Одна аутентификация и одна сессия вместо трех запросов к /stats/,
+    /stats/deadlines и /stats/today; поля ответа совпадают с ответами этих эндпоинтов.
+    """
+    logger.debug("get_dashboard_stats", extra={"user_id": current_user.id, "role": current_user.role})
+    
+    return await stats_cache.get_or_compute(
+        ("dashboard", stats_scope(current_user), date.today().isoformat()),
+        lambda: _compute_dashboard_stats(db, current_user)
+    )
+
+
+async def _compute_dashboard_stats(db: AsyncSession, current_user: User) -> dict:
+    today = date.today()
+    today_start, today_end = _today_bounds(today)
+    due_today = Task.deadline_at.between(today_start, today_end)
+    
+    # Один проход по задачам с дедлайном: невыполненные - для дедлайнов,
+    # с дедлайном сегодня (в любом статусе) - для задач на сегодня
+    async def deadline_rows(session: AsyncSession):
+        result = await session.execute(
+            select(Task, due_today.label("due_today")).where(
+                Task.deadline_at.isnot(None),
+                or_(Task.completed == False, due_today),
+                *_owner_filter(current_user)
+            )
+        )
+        return result.all()
+    
+    rows = [row for shard_rows in await _owner_scope(db, current_user, deadline_rows) for row in shard_rows]
+    
+    return {
+        "stats": await _compute_tasks_stats(db, current_user),
+        "deadlines": _build_deadlines_stats([task for task, _ in rows], today),
+        "today": _build_today_stats([task for task, is_due_today in rows if is_due_today], today)
+    }
+
+
+@router.get("/trends")
+async def get_trends(
+    date_from: Optional[date] = Query(None, description="Начало периода (по умолчанию - 30 дней назад)"),
+    date_to: Optional[date] = Query(None, description="Конец периода (по умолчанию - сегодня)"),
+    granularity: str = Query("day", pattern="^(day|week)$", description="Шаг: day или week"),
+    quadrant: Optional[str] = Query(None, pattern="^Q[1-4]$", description="Фильтр по квадранту"),
+    user_id: Optional[int] = Query(None, description="Пользователь (только для администратора)"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Тренды: количество созданных и выполненных задач по дням или неделям
+    
+    Читает только дневные rollup'ы, поэтому годовой график - это
+    несколько сотен строк, а не скан таблицы задач.
+    Администратор видит агрегат по всем пользователям или по user_id.
+    """
+    date_to = date_to or date.today()
+    date_from = date_from or (date_to - timedelta(days=29))
+    
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="Начало периода позже его конца")
+    if (date_to - date_from).days >= MAX_TRENDS_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Период не может превышать {MAX_TRENDS_DAYS} дней"
+        )
+    
+    if current_user.role == "admin":
+        target_user_id = user_id
+    else:
+        if user_id is not None and user_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Недостаточно прав доступа")
+        target_user_id = current_user.id
+    
+    async def compute_trends():
+        if target_user_id is not None and target_user_id != current_user.id:
+            # Rollup'ы другого пользователя лежат в его шарде, а не в шарде администратора
+            async with shard_sessionmaker(shard_for_user(target_user_id))() as session:
+                return await load_trends(session, date_from, date_to, granularity, target_user_id, quadrant)
+        return await load_trends(db, date_from, date_to, granularity, target_user_id, quadrant)
+    
+    scope = GLOBAL_SCOPE if target_user_id is None else target_user_id
+    series = await stats_cache.get_or_compute(
+        ("trends", scope, date_from, date_to, granularity, quadrant),
+        compute_trends
+    )
+    
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "granularity": granularity,
+        "quadrant": quadrant,
+        "user_id": target_user_id,
+        "total_created": sum(point["created"] for point in series),
+        "total_completed": sum(point["completed"] for point in series),
+        "series": series
+    }
@@ -0,0 +1,154 @@
+# routers/tags.py
+import logging
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_session
+from dependencies import get_current_user
+from models import Tag, Task, User, task_tags
+from schemas import TagCreate, TagResponse
+from rollups import _dialect_insert
+
+router = APIRouter(prefix="/tags", tags=["tags"])
+logger = logging.getLogger(__name__)
+
+
+def tag_filter(names: List[str], mode: str, current_user: User):
+    """
+    Условие для select(Task): задачи со всеми (mode="all") или хотя бы одной
+    (mode="any") из меток.
+    
+    Подзапрос идет по uq_tags_user_name (имена -> id меток) и ix_task_tags_tag_task
+    (id меток -> id задач); сами задачи для фильтрации не читаются. Для "all"
+    достаточно сравнить число совпавших меток с числом имен: у задачи не может
+    быть двух меток с одним именем - она принадлежит одному пользователю.
+    """
+    subquery = (
+        select(task_tags.c.task_id)
+        .join(Tag, Tag.id == task_tags.c.tag_id)
+        .where(Tag.name.in_(names))
+    )
+    if current_user.role != "admin":
+        subquery = subquery.where(Tag.user_id == current_user.id)
+    if mode == "all":
+        subquery = subquery.group_by(task_tags.c.task_id).having(func.count() == len(names))
+    
+    return Task.id.in_(subquery)
+
+
+async def load_task_tags(db: AsyncSession, task_ids: List[int]) -> Dict[int, List[str]]:
+    """Метки задач одним запросом: {task_id: [имена по алфавиту]}"""
+    if not task_ids:
+        return {}
+    
+    result = await db.execute(
+        select(task_tags.c.task_id, Tag.name)
+        .join(Tag, Tag.id == task_tags.c.tag_id)
+        .where(task_tags.c.task_id.in_(task_ids))
+        .order_by(Tag.name)
+    )
+    
+    tags_by_task: Dict[int, List[str]] = {}
+    for task_id, name in result.all():
+        tags_by_task.setdefault(task_id, []).append(name)
+    return tags_by_task
+
+
+async def ensure_tags(db: AsyncSession, user_id: int, names: List[str]) -> Dict[str, int]:
+    """
+    id меток по именам; отсутствующие в словаре пользователя создаются одним
+    INSERT ... ON CONFLICT DO NOTHING. Коммит - на вызывающем.
+    """
+    if not names:
+        return {}
+    
+    dialect_insert = _dialect_insert(db)
+    await db.execute(
+        dialect_insert(Tag)
+        .values([{"user_id": user_id, "name": name} for name in names])
+        .on_conflict_do_nothing(index_elements=["user_id", "name"])
+    )
+    result = await db.execute(
+        select(Tag.name, Tag.id).where(Tag.user_id == user_id, Tag.name.in_(names))
+    )
+    return dict(result.all())
+
+
+async def set_task_tags(db: AsyncSession, task_id: int, user_id: int, names: List[str]) -> None:
+    """
+    Заменяет метки задачи. Отсутствующие в словаре пользователя метки создаются.
+    Коммит - на вызывающем.
+    """
+    tag_ids = await ensure_tags(db, user_id, names)
+    
+    await db.execute(delete(task_tags).where(task_tags.c.task_id == task_id))
+    if tag_ids:
+        await db.execute(
+            insert(task_tags).values([{"task_id": task_id, "tag_id": tag_id} for tag_id in tag_ids.values()])
+        )
+
+
+@router.get("/", response_model=List[TagResponse])
+async def get_tags(
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> List[TagResponse]:
+    """Словарь меток пользователя с числом задач по каждой"""
+    # Задачи в корзине не считаются (соединение с Task фильтрует их)
+    result = await db.execute(
+        select(Tag.id, Tag.name, func.count(Task.id))
+        .outerjoin(task_tags, task_tags.c.tag_id == Tag.id)
+        .outerjoin(Task, Task.id == task_tags.c.task_id)
+        .where(Tag.user_id == current_user.id)
+        .group_by(Tag.id, Tag.name)
+        .order_by(Tag.name)
+    )
+    
+    return [
+        TagResponse(id=tag_id, name=name, task_count=task_count)
+        for tag_id, name, task_count in result.all()
+    ]
+
+
+@router.post("/", response_model=TagResponse, status_code=status.HTTP_201_CREATED)
+async def create_tag(
+    tag_data: TagCreate,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> TagResponse:
+    """Добавление метки в словарь пользователя"""
+    existing = await db.execute(
+        select(Tag.id).where(Tag.user_id == current_user.id, Tag.name == tag_data.name)
+    )
+    if existing.scalar_one_or_none() is not None:
+        raise HTTPException(status_code=409, detail="Такая метка уже есть")
+    
+    tag = Tag(user_id=current_user.id, name=tag_data.name)
+    db.add(tag)
+    await db.commit()
+    await db.refresh(tag)
+    
+    return TagResponse(id=tag.id, name=tag.name)
+
+
+@router.delete("/{tag_id}")
+async def delete_tag(
+    tag_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Удаление метки из словаря; с задач она снимается"""
+    tag: Optional[Tag] = await db.get(Tag, tag_id)
+    
+    if not tag or tag.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Метка не найдена")
+    
+    tag_name = tag.name
+    await db.execute(delete(task_tags).where(task_tags.c.tag_id == tag_id))
+    await db.delete(tag)
+    await db.commit()
+    
+    return {"message": "Метка удалена", "id": tag_id, "name": tag_name}
@@ -1,25 +1,49 @@
 # routers/tasks.py
+import heapq
+import logging
 from fastapi import APIRouter, HTTPException, Query, status, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, func, or_
 from typing import List, Optional
-from datetime import datetime, date, time
+from collections import Counter
+from datetime import datetime, date, time, timezone
 
-from database import get_async_session
+from database import get_async_session, gather_shards, shard_count
 from models.task import Task
 from models.user import User
-from schemas import TaskCreate, TaskResponse, TaskUpdate
+from schemas import TaskCreate, TaskMove, TaskResponse, TaskUpdate, normalize_tag_names
 from dependencies import get_current_user
+from cache import stats_cache
+from rollups import record_task_event, adjust_task_count, rollup_day
+from reminders import reminder_scheduler
+from activity_log import record_activity
+from routers.tags import tag_filter, load_task_tags, set_task_tags
+from positions import (
+    POSITION_MAX_LENGTH, append_position, key_after, key_between,
+    position_order, position_sort_key, rebalance_group
+)
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
+# Максимальная вложенность подзадач
+MAX_SUBTASK_DEPTH = 10
 
-def calculate_urgency_and_quadrant(deadline_at: Optional[datetime], is_important: bool) -> tuple[bool, str]:
-    """Рассчитывает срочность и квадрант на основе дедлайна и важности"""
+
+def calculate_urgency_and_quadrant(
+    deadline_at: Optional[datetime],
+    is_important: bool,
+    today: Optional[date] = None
+) -> tuple[bool, str]:
+    """
+    Рассчитывает срочность и квадрант на основе дедлайна и важности
+    
+    today можно передать, чтобы не вычислять его для каждой задачи пачки.
+    """
     if not deadline_at:
         is_urgent = False
     else:
-        today = date.today()
+        today = today or date.today()
         deadline_date = deadline_at.date()
         
         if deadline_date < today:
@@ -51,47 +75,186 @@ def calculate_days_until_deadline(deadline_at: Optional[datetime]) -> Optional[i
     return (deadline_date - today).days
 
 
-@router.get("/", response_model=List[TaskResponse])
-async def get_all_tasks(
-    db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+def task_response(task: Task, tags: Optional[List[str]] = None) -> TaskResponse:
+    """TaskResponse с расчетными полями (срочность, дни до дедлайна)"""
+    is_urgent, _ = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
+    return TaskResponse(
+        **task.__dict__,
+        is_urgent=is_urgent,
+        days_until_deadline=calculate_days_until_deadline(task.deadline_at),
+        tags=tags or []
+    )
+
+
+async def task_responses(db: AsyncSession, tasks: List[Task]) -> List[TaskResponse]:
+    """TaskResponse для списка задач; метки всех задач читаются одним запросом"""
+    tags_by_task = await load_task_tags(db, [task.id for task in tasks])
+    return [task_response(task, tags_by_task.get(task.id)) for task in tasks]
+
+
+def _owned_tasks(current_user: User):
+    """select(Task): администратор видит все задачи, пользователь - только свои"""
+    query = select(Task)
+    if current_user.role != "admin":
+        query = query.where(Task.user_id == current_user.id)
+    return query
+
+
+async def owned_task_responses(
+    db: AsyncSession,
+    query,
+    current_user: User,
+    sort: Optional[str] = None
 ) -> List[TaskResponse]:
     """
-    Получение всех задач
+    Выполняет запрос на основе _owned_tasks и строит ответы.
     
-    Администратор видит все задачи, обычный пользователь - только свои
+    Задачи пользователя лежат в его шарде (сессия запроса); для администратора
+    запрос выполняется на всех шардах, а отсортированные по позиции списки
+    сливаются с тем же ключом, что и position_order.
     """
-    print(f"DEBUG: get_all_tasks вызван, пользователь: {current_user}")
+    if current_user.role == "admin" and shard_count() > 1:
+        async def shard_tasks(session: AsyncSession) -> List[TaskResponse]:
+            result = await session.execute(query)
+            return await task_responses(session, result.scalars().all())
+        
+        shard_responses = await gather_shards(shard_tasks)
+        if sort == "position":
+            return list(heapq.merge(*shard_responses, key=position_sort_key))
+        return [response for responses in shard_responses for response in responses]
     
-    # Исправлено: убрали .value
-    if current_user.role == "admin":
-        result = await db.execute(select(Task))
-    else:
-        # Пользователь видит только свои задачи
-        result = await db.execute(
-            select(Task).where(Task.user_id == current_user.id)
+    result = await db.execute(query)
+    return await task_responses(db, result.scalars().all())
+
+
+def filter_by_tags(query, tags: Optional[List[str]], tag_mode: str, current_user: User):
+    """Добавляет к запросу фильтр по меткам (см. routers.tags.tag_filter)"""
+    if not tags:
+        return query
+    
+    try:
+        names = normalize_tag_names(tags)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return query.where(tag_filter(names, tag_mode, current_user))
+
+
+async def get_accessible_task(db: AsyncSession, task_id: int, current_user: User) -> Task:
+    """Задача по ID с проверкой прав: 404, если нет, 403, если чужая"""
+    result = await db.execute(select(Task).where(Task.id == task_id))
+    task = result.scalar_one_or_none()
+    
+    if not task:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    
+    if current_user.role != "admin" and task.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Нет доступа к этой задаче"
+        )
+    
+    return task
+
+
+def subtree_filter(task: Task):
+    """Условие для задачи и всех ее потомков (по ix_tasks_path)"""
+    return or_(Task.id == task.id, Task.path.like(task.subtree_prefix() + "%"))
+
+
+async def adjust_ancestors(db: AsyncSession, task: Task, total: int = 0, completed: int = 0) -> None:
+    """Изменение счетчиков подзадач у всех предков задачи одним UPDATE (без commit)"""
+    ancestor_ids = task.ancestor_ids()
+    if not ancestor_ids or (not total and not completed):
+        return
+    await db.execute(
+        update(Task)
+        .where(Task.id.in_(ancestor_ids))
+        .values(
+            subtasks_total=Task.subtasks_total + total,
+            subtasks_completed=Task.subtasks_completed + completed
         )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def apply_task_update(db: AsyncSession, task: Task, update_data: dict) -> None:
+    """
+    Применяет изменения к задаче: метки, пересчет квадранта, дневного rollup'а
+    и счетчиков подзадач у предков при смене статуса выполнения. Коммит - на вызывающем.
+    """
+    was_completed = task.completed
+    # Квадрант, в котором задача была выполнена: отмена выполнения списывается с него же
+    completed_quadrant = task.quadrant
     
-    tasks = result.scalars().all()
+    # Метки хранятся в task_tags, а не в полях задачи
+    tags = update_data.pop("tags", None)
+    if tags is not None:
+        await set_task_tags(db, task.id, task.user_id, tags)
     
-    response_tasks = []
-    for task in tasks:
-        is_urgent, _ = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
-        days_until_deadline = calculate_days_until_deadline(task.deadline_at)
-        
-        task_dict = {
-            **task.__dict__,
-            "is_urgent": is_urgent,
-            "days_until_deadline": days_until_deadline
-        }
-        response_tasks.append(TaskResponse(**task_dict))
+    for field, value in update_data.items():
+        setattr(task, field, value)
+    
+    # Пересчитываем квадрант при изменении важных полей
+    fields_affecting_quadrant = ["is_important", "deadline_at", "completed"]
+    if any(field in update_data for field in fields_affecting_quadrant):
+        _, quadrant = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
+        if quadrant != task.quadrant:
+            # В новом квадранте задача встает в конец
+            task.position = await append_position(db, task.user_id, quadrant)
+        task.quadrant = quadrant
+    
+    # Обновляем дневной rollup при смене статуса выполнения
+    if task.completed and not was_completed:
+        task.completed_at = datetime.now()
+        await record_task_event(db, task.user_id, task.quadrant, completed=1)
+        await adjust_ancestors(db, task, completed=1)
+    elif was_completed and not task.completed:
+        await adjust_ancestors(db, task, completed=-1)
+        await record_task_event(
+            db, task.user_id, completed_quadrant, completed=-1,
+            day=rollup_day(task.completed_at)
+        )
+        task.completed_at = None
+
+
+@router.get("/", response_model=List[TaskResponse])
+async def get_all_tasks(
+    quadrant: Optional[str] = Query(None, pattern="^Q[1-4]$", description="Фильтр по квадранту"),
+    task_status: Optional[str] = Query(
+        None, alias="status", pattern="^(completed|pending)$", description="Фильтр по статусу"
+    ),
+    tags: Optional[List[str]] = Query(None, description="Фильтр по меткам"),
+    tag_mode: str = Query("all", pattern="^(all|any)$", description="all - все метки, any - любая из них"),
+    sort: Optional[str] = Query(None, pattern="^position$", description="position - ручной порядок внутри квадрантов"),
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> List[TaskResponse]:
+    """
+    Получение всех задач
     
-    return response_tasks
+    Администратор видит все задачи (со всех шардов), обычный пользователь -
+    только свои. Фильтры по квадранту, статусу и меткам комбинируются.
+    """
+    logger.debug("get_all_tasks", extra={"user_id": current_user.id, "role": current_user.role})
+    
+    query = _owned_tasks(current_user)
+    if quadrant:
+        query = query.where(Task.quadrant == quadrant)
+    if task_status:
+        query = query.where(Task.completed == (task_status == "completed"))
+    query = filter_by_tags(query, tags, tag_mode, current_user)
+    if sort == "position":
+        query = position_order(query)
+    
+    return await owned_task_responses(db, query, current_user, sort)
 
 
 @router.get("/search", response_model=List[TaskResponse])
 async def search_tasks(
     q: str = Query(..., min_length=2),
+    tags: Optional[List[str]] = Query(None, description="Фильтр по меткам"),
+    tag_mode: str = Query("all", pattern="^(all|any)$", description="all - все метки, any - любая из них"),
     db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user)
 ) -> List[TaskResponse]:
@@ -100,49 +263,28 @@ async def search_tasks(
     """
     keyword = f"%{q.lower()}%"
     
-    # Исправлено: убрали .value
-    if current_user.role == "admin":
-        result = await db.execute(
-            select(Task).where(
-                (Task.title.ilike(keyword)) |
-                (Task.description.ilike(keyword))
-            )
-        )
-    else:
-        result = await db.execute(
-            select(Task).where(
-                Task.user_id == current_user.id,
-                (Task.title.ilike(keyword)) |
-                (Task.description.ilike(keyword))
-            )
-        )
+    query = _owned_tasks(current_user).where(
+        (Task.title.ilike(keyword)) |
+        (Task.description.ilike(keyword))
+    )
+    query = filter_by_tags(query, tags, tag_mode, current_user)
     
-    tasks = result.scalars().all()
+    responses = await owned_task_responses(db, query, current_user)
     
-    if not tasks:
+    if not responses:
         raise HTTPException(
             status_code=404, 
             detail="По данному запросу ничего не найдено"
         )
     
-    response_tasks = []
-    for task in tasks:
-        is_urgent, _ = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
-        days_until_deadline = calculate_days_until_deadline(task.deadline_at)
-        
-        task_dict = {
-            **task.__dict__,
-            "is_urgent": is_urgent,
-            "days_until_deadline": days_until_deadline
-        }
-        response_tasks.append(TaskResponse(**task_dict))
-    
-    return response_tasks
+    return responses
 
 
 @router.get("/status/{status}", response_model=List[TaskResponse])
 async def get_tasks_by_status(
     status: str,
+    tags: Optional[List[str]] = Query(None, description="Фильтр по меткам"),
+    tag_mode: str = Query("all", pattern="^(all|any)$", description="all - все метки, any - любая из них"),
     db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user)
 ) -> List[TaskResponse]:
@@ -157,39 +299,18 @@ async def get_tasks_by_status(
     
     is_completed = (status == "completed")
     
-    # Исправлено: убрали .value
-    if current_user.role == "admin":
-        result = await db.execute(
-            select(Task).where(Task.completed == is_completed)
-        )
-    else:
-        result = await db.execute(
-            select(Task).where(
-                Task.completed == is_completed,
-                Task.user_id == current_user.id
-            )
-        )
-    
-    tasks = result.scalars().all()
-    
-    response_tasks = []
-    for task in tasks:
-        is_urgent, _ = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
-        days_until_deadline = calculate_days_until_deadline(task.deadline_at)
-        
-        task_dict = {
-            **task.__dict__,
-            "is_urgent": is_urgent,
-            "days_until_deadline": days_until_deadline
-        }
-        response_tasks.append(TaskResponse(**task_dict))
+    query = _owned_tasks(current_user).where(Task.completed == is_completed)
+    query = filter_by_tags(query, tags, tag_mode, current_user)
     
-    return response_tasks
+    return await owned_task_responses(db, query, current_user)
 
 
 @router.get("/quadrant/{quadrant}", response_model=List[TaskResponse])
 async def get_tasks_by_quadrant(
     quadrant: str,
+    tags: Optional[List[str]] = Query(None, description="Фильтр по меткам"),
+    tag_mode: str = Query("all", pattern="^(all|any)$", description="all - все метки, any - любая из них"),
+    sort: Optional[str] = Query(None, pattern="^position$", description="position - ручной порядок"),
     db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user)
 ) -> List[TaskResponse]:
@@ -202,38 +323,18 @@ async def get_tasks_by_quadrant(
             detail="Неверный квадрант. Используйте: Q1, Q2, Q3, Q4"
         )
     
-    # Исправлено: убрали .value
-    if current_user.role == "admin":
-        result = await db.execute(
-            select(Task).where(Task.quadrant == quadrant)
-        )
-    else:
-        result = await db.execute(
-            select(Task).where(
-                Task.quadrant == quadrant,
-                Task.user_id == current_user.id
-            )
-        )
-    
-    tasks = result.scalars().all()
+    query = _owned_tasks(current_user).where(Task.quadrant == quadrant)
+    query = filter_by_tags(query, tags, tag_mode, current_user)
+    if sort == "position":
+        query = position_order(query)
     
-    response_tasks = []
-    for task in tasks:
-        is_urgent, _ = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
-        days_until_deadline = calculate_days_until_deadline(task.deadline_at)
-        
-        task_dict = {
-            **task.__dict__,
-            "is_urgent": is_urgent,
-            "days_until_deadline": days_until_deadline
-        }
-        response_tasks.append(TaskResponse(**task_dict))
-    
-    return response_tasks
+    return await owned_task_responses(db, query, current_user, sort)
 
 
 @router.get("/today", response_model=List[TaskResponse])
 async def get_tasks_due_today(
+    tags: Optional[List[str]] = Query(None, description="Фильтр по меткам"),
+    tag_mode: str = Query("all", pattern="^(all|any)$", description="all - все метки, any - любая из них"),
     db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user)
 ) -> List[TaskResponse]:
@@ -244,38 +345,13 @@ async def get_tasks_due_today(
     today_start = datetime.combine(today, time.min)
     today_end = datetime.combine(today, time.max)
     
-    # Исправлено: убрали .value
-    if current_user.role == "admin":
-        result = await db.execute(
-            select(Task).where(
-                Task.deadline_at.between(today_start, today_end),
-                Task.completed == False
-            )
-        )
-    else:
-        result = await db.execute(
-            select(Task).where(
-                Task.deadline_at.between(today_start, today_end),
-                Task.completed == False,
-                Task.user_id == current_user.id
-            )
-        )
-    
-    tasks = result.scalars().all()
-    
-    response_tasks = []
-    for task in tasks:
-        is_urgent, _ = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
-        days_until_deadline = calculate_days_until_deadline(task.deadline_at)
-        
-        task_dict = {
-            **task.__dict__,
-            "is_urgent": is_urgent,
-            "days_until_deadline": days_until_deadline
-        }
-        response_tasks.append(TaskResponse(**task_dict))
+    query = _owned_tasks(current_user).where(
+        Task.deadline_at.between(today_start, today_end),
+        Task.completed == False
+    )
+    query = filter_by_tags(query, tags, tag_mode, current_user)
     
-    return response_tasks
+    return await owned_task_responses(db, query, current_user)
 
 
 @router.get("/task/{task_id}", response_model=TaskResponse)
@@ -300,16 +376,8 @@ async def get_task_by_id(
             detail="Нет доступа к этой задаче"
         )
     
-    is_urgent, _ = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
-    days_until_deadline = calculate_days_until_deadline(task.deadline_at)
-    
-    task_dict = {
-        **task.__dict__,
-        "is_urgent": is_urgent,
-        "days_until_deadline": days_until_deadline
-    }
-    
-    return TaskResponse(**task_dict)
+    tags_by_task = await load_task_tags(db, [task.id])
+    return task_response(task, tags_by_task.get(task.id))
 
 
 @router.post("/", response_model=TaskResponse, status_code=status.HTTP_201_CREATED)
@@ -323,6 +391,19 @@ async def create_task(
     """
     is_urgent, quadrant = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
     
+    owner_id = current_user.id  # Привязываем задачу к текущему пользователю
+    path = ""
+    if task.parent_id is not None:
+        parent = await get_accessible_task(db, task.parent_id, current_user)
+        if len(parent.ancestor_ids()) + 1 >= MAX_SUBTASK_DEPTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Вложенность подзадач не может превышать {MAX_SUBTASK_DEPTH}"
+            )
+        # Подзадача принадлежит владельцу родительской задачи
+        owner_id = parent.user_id
+        path = parent.subtree_prefix()
+    
     new_task = Task(
         title=task.title,
         description=task.description,
@@ -330,18 +411,32 @@ async def create_task(
         deadline_at=task.deadline_at,
         quadrant=quadrant,
         completed=False,
-        user_id=current_user.id  # Привязываем задачу к текущему пользователю
+        user_id=owner_id,
+        parent_id=task.parent_id,
+        path=path,
+        position=await append_position(db, owner_id, quadrant)
     )
     
     db.add(new_task)
+    if task.tags:
+        await db.flush()
+        await set_task_tags(db, new_task.id, owner_id, task.tags)
+    await adjust_ancestors(db, new_task, total=1)
+    await record_task_event(db, owner_id, quadrant, created=1)
+    await adjust_task_count(db, owner_id, 1)
+    await db.flush()
+    record_activity(db, "task_create", current_user.id, "task", new_task.id, parent_id=task.parent_id)
     await db.commit()
     await db.refresh(new_task)
+    stats_cache.invalidate_user(new_task.user_id)
+    reminder_scheduler.task_changed(new_task)
     
     days_until_deadline = calculate_days_until_deadline(new_task.deadline_at)
     task_dict = {
         **new_task.__dict__,
         "is_urgent": is_urgent,
-        "days_until_deadline": days_until_deadline
+        "days_until_deadline": days_until_deadline,
+        "tags": task.tags
     }
     
     return TaskResponse(**task_dict)
@@ -371,29 +466,84 @@ async def update_task(
         )
     
     update_data = task_update.model_dump(exclude_unset=True)
+    record_activity(db, "task_update", current_user.id, "task", task.id, fields=sorted(update_data))
+    await apply_task_update(db, task, update_data)
     
-    for field, value in update_data.items():
-        setattr(task, field, value)
+    await db.commit()
+    await db.refresh(task)
+    stats_cache.invalidate_user(task.user_id)
+    reminder_scheduler.task_changed(task)
     
-    # Пересчитываем квадрант при изменении важных полей
-    fields_affecting_quadrant = ["is_important", "deadline_at", "completed"]
-    if any(field in update_data for field in fields_affecting_quadrant):
-        is_urgent, quadrant = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
-        task.quadrant = quadrant
+    tags_by_task = await load_task_tags(db, [task.id])
+    return task_response(task, tags_by_task.get(task.id))
+
+
+@router.patch("/task/{task_id}/move", response_model=TaskResponse)
+async def move_task(
+    task_id: int,
+    move: TaskMove,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> TaskResponse:
+    """
+    Перемещение задачи внутри квадранта (ручной порядок, см. sort=position)
     
+    Задача встает после after_id (null - в начало квадранта). Меняется одна
+    строка: новая позиция - дробный индекс между соседями. Квадрант
+    перенумеровывается сразу (одним executemany) только в редких случаях:
+    у after_id нет позиции (строки до миграции) или ключ стал бы слишком длинным.
+    """
+    task = await get_accessible_task(db, task_id, current_user)
+    
+    lower = None
+    if move.after_id is not None:
+        if move.after_id == task.id:
+            raise HTTPException(status_code=400, detail="Нельзя поставить задачу после нее самой")
+        after = await get_accessible_task(db, move.after_id, current_user)
+        if after.user_id != task.user_id or after.quadrant != task.quadrant:
+            raise HTTPException(status_code=400, detail="Задачи должны быть в одном квадранте")
+        lower = after.position
+    
+    position = None
+    if move.after_id is None or lower is not None:
+        position = await _position_after(db, task, lower)
+    if position is None:
+        # Задача after_id без позиции или ключ слишком длинный - нумеруем квадрант заново и повторяем
+        await rebalance_group(db, task.user_id, task.quadrant)
+        if move.after_id is not None:
+            lower = (await db.execute(select(Task.position).where(Task.id == move.after_id))).scalar_one()
+        position = await _position_after(db, task, lower)
+    
+    task.position = position
+    record_activity(db, "task_move", current_user.id, "task", task.id, after_id=move.after_id)
     await db.commit()
     await db.refresh(task)
     
-    is_urgent, _ = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
-    days_until_deadline = calculate_days_until_deadline(task.deadline_at)
-    
-    task_dict = {
-        **task.__dict__,
-        "is_urgent": is_urgent,
-        "days_until_deadline": days_until_deadline
-    }
+    tags_by_task = await load_task_tags(db, [task.id])
+    return task_response(task, tags_by_task.get(task.id))
+
+
+async def _position_after(db: AsyncSession, task: Task, lower: Optional[str]) -> Optional[str]:
+    """
+    Ключ сразу после lower (None - начало квадранта) или None, если ключ слишком длинный
     
-    return TaskResponse(**task_dict)
+    Следующая позиция читается по индексу (user_id, quadrant, position);
+    задачи без позиции стоят в конце и границей не считаются.
+    """
+    conditions = [
+        Task.user_id == task.user_id,
+        Task.quadrant == task.quadrant,
+        Task.id != task.id,
+        Task.position.isnot(None)
+    ]
+    if lower is not None:
+        conditions.append(Task.position > lower)
+    result = await db.execute(select(func.min(Task.position)).where(*conditions))
+    upper = result.scalar_one_or_none()
+    
+    # В конец квадранта - следующим ключом (растет логарифмически), между соседями - серединой
+    position = key_after(lower) if upper is None else key_between(lower, upper)
+    return position if len(position) <= POSITION_MAX_LENGTH else None
 
 
 @router.patch("/task/{task_id}/complete", response_model=TaskResponse)
@@ -418,22 +568,33 @@ async def complete_task(
             detail="Нет доступа к этой задаче"
         )
     
+    was_completed = task.completed
     task.completed = True
     task.completed_at = datetime.now()
     
     # При завершении задачи тоже пересчитываем квадрант
     is_urgent, quadrant = calculate_urgency_and_quadrant(task.deadline_at, task.is_important)
+    if quadrant != task.quadrant:
+        task.position = await append_position(db, task.user_id, quadrant)
     task.quadrant = quadrant
     
+    if not was_completed:
+        await record_task_event(db, task.user_id, quadrant, completed=1)
+        await adjust_ancestors(db, task, completed=1)
+    
+    record_activity(db, "task_complete", current_user.id, "task", task.id)
     await db.commit()
     await db.refresh(task)
+    stats_cache.invalidate_user(task.user_id)
     
     days_until_deadline = calculate_days_until_deadline(task.deadline_at)
+    tags_by_task = await load_task_tags(db, [task.id])
     
     task_dict = {
         **task.__dict__,
         "is_urgent": is_urgent,
-        "days_until_deadline": days_until_deadline
+        "days_until_deadline": days_until_deadline,
+        "tags": tags_by_task.get(task.id, [])
     }
     
     return TaskResponse(**task_dict)
@@ -446,7 +607,7 @@ async def delete_task(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Удаление задачи
+    Удаление задачи (в корзину, см. routers/trash.py)
     """
     result = await db.execute(select(Task).where(Task.id == task_id))
     task = result.scalar_one_or_none()
@@ -461,7 +622,96 @@ async def delete_task(
             detail="Нет доступа к этой задаче"
         )
     
-    await db.delete(task)
+    # Задача вместе со всеми подзадачами переносится в корзину одним UPDATE;
+    # окончательно ее удалит фоновая очистка (trash.py)
+    result = await db.execute(
+        update(Task)
+        .where(subtree_filter(task))
+        .values(deleted_at=datetime.now(timezone.utc))
+        .returning(Task.completed)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = result.scalars().all()
+    
+    await adjust_ancestors(db, task, total=-len(deleted), completed=-sum(1 for completed in deleted if completed))
+    await adjust_task_count(db, task.user_id, -len(deleted))
+    record_activity(db, "task_delete", current_user.id, "task", task.id, subtasks=len(deleted) - 1)
+    await db.commit()
+    stats_cache.invalidate_user(task.user_id)
+    
+    return {
+        "message": "Задача перемещена в корзину",
+        "id": task.id,
+        "title": task.title,
+        "deleted_subtasks": len(deleted) - 1
+    }
+
+
+@router.get("/task/{task_id}/subtree", response_model=List[TaskResponse])
+async def get_task_subtree(
+    task_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> List[TaskResponse]:
+    """
+    Задача со всеми подзадачами (плоский список, связи - по parent_id)
+    
+    Поддерево читается одним запросом по ix_tasks_path; прогресс каждой задачи -
+    в subtasks_total / subtasks_completed.
+    """
+    task = await get_accessible_task(db, task_id, current_user)
+    
+    result = await db.execute(
+        select(Task).where(subtree_filter(task)).order_by(Task.path, Task.id)
+    )
+    return await task_responses(db, result.scalars().all())
+
+
+@router.patch("/task/{task_id}/subtree/complete", response_model=List[TaskResponse])
+async def complete_task_subtree(
+    task_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> List[TaskResponse]:
+    """
+    Отметить задачу и все ее подзадачи выполненными
+    
+    Поддерево обновляется одним UPDATE без загрузки задач.
+    """
+    task = await get_accessible_task(db, task_id, current_user)
+    
+    result = await db.execute(
+        update(Task)
+        .where(subtree_filter(task), Task.completed == False)
+        .values(completed=True, completed_at=datetime.now())
+        .returning(Task.quadrant)
+        .execution_options(synchronize_session=False)
+    )
+    completed_by_quadrant = Counter(result.scalars().all())
+    
+    if completed_by_quadrant:
+        # Внутри поддерева теперь выполнены все потомки
+        await db.execute(
+            update(Task)
+            .where(subtree_filter(task))
+            .values(subtasks_completed=Task.subtasks_total)
+            .execution_options(synchronize_session=False)
+        )
+        await adjust_ancestors(db, task, completed=sum(completed_by_quadrant.values()))
+        for quadrant, count in completed_by_quadrant.items():
+            await record_task_event(db, task.user_id, quadrant, completed=count)
+    
+    record_activity(
+        db, "task_complete", current_user.id, "task", task.id,
+        subtree=True, completed=sum(completed_by_quadrant.values())
+    )
     await db.commit()
+    stats_cache.invalidate_user(task.user_id)
     
-    return {"message": "Задача успешно удалена", "id": task.id, "title": task.title}
\ No newline at end of file
+    result = await db.execute(
+        select(Task)
+        .where(subtree_filter(task))
+        .order_by(Task.path, Task.id)
+        .execution_options(populate_existing=True)
+    )
+    return await task_responses(db, result.scalars().all())
\ No newline at end of file
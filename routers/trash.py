@@ -0,0 +1,149 @@
+# routers/trash.py
+import logging
+from collections import defaultdict
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, delete, exists
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_session
+from dependencies import get_current_user
+from models import Task, User
+from schemas import TrashItemResponse
+from cache import stats_cache
+from rollups import adjust_task_count
+from trash import purge_after
+from activity_log import record_activity
+from routers.tasks import subtree_filter, adjust_ancestors, task_response
+from positions import append_positions, set_positions
+
+router = APIRouter(prefix="/trash", tags=["trash"])
+logger = logging.getLogger(__name__)
+
+
+async def _get_deleted_task(db: AsyncSession, task_id: int, current_user: User) -> Task:
+    result = await db.execute(
+        select(Task)
+        .where(Task.id == task_id, Task.deleted_at.isnot(None))
+        .execution_options(include_deleted=True)
+    )
+    task = result.scalar_one_or_none()
+    
+    if not task:
+        raise HTTPException(status_code=404, detail="Задача в корзине не найдена")
+    
+    if current_user.role != "admin" and task.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Нет доступа к этой задаче"
+        )
+    
+    return task
+
+
+@router.get("/", response_model=List[TrashItemResponse])
+async def get_trash(
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> List[TrashItemResponse]:
+    """
+    Корзина: удаленные задачи, новые сверху
+    
+    Подзадачи, удаленные вместе с родителем, не показываются отдельно -
+    они восстанавливаются вместе с ним.
+    """
+    parent = aliased(Task)
+    deleted_with_parent = exists().where(
+        parent.id == Task.parent_id,
+        parent.deleted_at == Task.deleted_at
+    )
+    
+    query = (
+        select(Task)
+        .where(Task.deleted_at.isnot(None), ~deleted_with_parent)
+        .order_by(Task.deleted_at.desc())
+        .execution_options(include_deleted=True)
+    )
+    if current_user.role != "admin":
+        query = query.where(Task.user_id == current_user.id)
+    
+    result = await db.execute(query)
+    
+    return [
+        TrashItemResponse(
+            **task_response(task).model_dump(),
+            purge_after=purge_after(task.deleted_at)
+        )
+        for task in result.scalars().all()
+    ]
+
+
+@router.post("/{task_id}/restore")
+async def restore_task(
+    task_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Восстановление задачи вместе с подзадачами, удаленными вместе с ней"""
+    task = await _get_deleted_task(db, task_id, current_user)
+    
+    if task.parent_id is not None:
+        parent = await db.execute(select(Task.id).where(Task.id == task.parent_id))
+        if parent.scalar_one_or_none() is None:
+            raise HTTPException(
+                status_code=409,
+                detail="Родительская задача в корзине - сначала восстановите ее"
+            )
+    
+    result = await db.execute(
+        select(Task.id, Task.quadrant, Task.completed)
+        .where(subtree_filter(task), Task.deleted_at == task.deleted_at)
+        .order_by(Task.id)
+        .execution_options(include_deleted=True)
+    )
+    restored = result.all()
+    
+    # Ключи задач в корзине могли устареть (перенумерация ее не видит), поэтому
+    # восстановленные задачи встают в конец своих квадрантов - тем же executemany,
+    # что снимает отметку удаления
+    by_quadrant = defaultdict(list)
+    for restored_id, quadrant, _ in restored:
+        by_quadrant[quadrant].append(restored_id)
+    for quadrant, ids in by_quadrant.items():
+        positions = await append_positions(db, task.user_id, quadrant, len(ids))
+        await set_positions(db, zip(ids, positions), deleted_at=None)
+    
+    await adjust_ancestors(db, task, total=len(restored), completed=sum(1 for _, _, completed in restored if completed))
+    await adjust_task_count(db, task.user_id, len(restored))
+    record_activity(db, "task_restore", current_user.id, "task", task.id, subtasks=len(restored) - 1)
+    await db.commit()
+    stats_cache.invalidate_user(task.user_id)
+    
+    return {
+        "message": "Задача восстановлена",
+        "id": task.id,
+        "title": task.title,
+        "restored_subtasks": len(restored) - 1
+    }
+
+
+@router.delete("/{task_id}")
+async def purge_task(
+    task_id: int,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Окончательное удаление задачи из корзины (вместе с подзадачами)"""
+    task = await _get_deleted_task(db, task_id, current_user)
+    
+    result = await db.execute(
+        delete(Task)
+        .where(subtree_filter(task))
+        .execution_options(include_deleted=True, synchronize_session=False)
+    )
+    record_activity(db, "task_purge", current_user.id, "task", task.id, purged=result.rowcount)
+    await db.commit()
+    
+    return {"message": "Задача удалена окончательно", "id": task.id, "purged": result.rowcount}
@@ -1,7 +1,7 @@
 # schemas.py
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
-from datetime import datetime
+from typing import Any, Dict, List, Optional
+from datetime import date, datetime
 
 
 class TaskBase(BaseModel):
@@ -30,8 +30,38 @@ class TaskBase(BaseModel):
     )
 
 
+MAX_TAGS_PER_TASK = 20
+
+
+def normalize_tag_names(names: List[str]) -> List[str]:
+    """Метки сравниваются без учета регистра и пробелов по краям; дубликаты убираются"""
+    normalized = []
+    for name in names:
+        name = name.strip().lower()
+        if not name or len(name) > 50:
+            raise ValueError('Метка должна быть длиной от 1 до 50 символов')
+        if name not in normalized:
+            normalized.append(name)
+    if len(normalized) > MAX_TAGS_PER_TASK:
+        raise ValueError(f'У задачи может быть не больше {MAX_TAGS_PER_TASK} меток')
+    return normalized
+
+
 class TaskCreate(TaskBase):
-    pass
+    tags: List[str] = Field(
+        default_factory=list,
+        description="Метки задачи",
+        examples=[["работа", "отчеты"]]
+    )
+    parent_id: Optional[int] = Field(
+        None,
+        description="ID родительской задачи, если создается подзадача"
+    )
+    
+    @field_validator('tags')
+    @classmethod
+    def validate_tags(cls, v):
+        return normalize_tag_names(v)
 
 
 class TaskUpdate(BaseModel):
@@ -58,6 +88,22 @@ class TaskUpdate(BaseModel):
         None,
         description="Статус выполнения"
     )
+    tags: Optional[List[str]] = Field(
+        None,
+        description="Новый набор меток (заменяет текущий)"
+    )
+    
+    @field_validator('tags')
+    @classmethod
+    def validate_tags(cls, v):
+        return normalize_tag_names(v) if v is not None else v
+
+
+class TaskMove(BaseModel):
+    after_id: Optional[int] = Field(
+        None,
+        description="ID задачи того же квадранта, после которой поставить задачу (null - в начало)"
+    )
 
 
 # schemas.py (добавьте в класс TaskResponse)
@@ -70,6 +116,14 @@ class TaskResponse(TaskBase):
     completed: bool = Field(default=False, description="Статус выполнения задачи")
     created_at: datetime = Field(..., description="Дата и время создания задачи")
     completed_at: Optional[datetime] = Field(None, description="Дата и время завершения задачи")
+    recurring_task_id: Optional[int] = Field(None, description="ID правила, если задача - вхождение повторяющейся")
+    occurrence_at: Optional[datetime] = Field(None, description="Плановое время вхождения повторяющейся задачи")
+    tags: List[str] = Field(default_factory=list, description="Метки задачи")
+    parent_id: Optional[int] = Field(None, description="ID родительской задачи")
+    subtasks_total: int = Field(0, description="Всего подзадач (на всех уровнях)")
+    subtasks_completed: int = Field(0, description="Выполнено подзадач (на всех уровнях)")
+    deleted_at: Optional[datetime] = Field(None, description="Когда задача перемещена в корзину")
+    position: Optional[str] = Field(None, description="Ключ ручного порядка внутри квадранта")
     
     @field_validator('quadrant')
     @classmethod
@@ -79,4 +133,145 @@ class TaskResponse(TaskBase):
         return v
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class TrashItemResponse(TaskResponse):
+    purge_after: datetime = Field(..., description="Когда задача будет удалена из корзины окончательно")
+
+
+class RecurringTaskCreate(BaseModel):
+    title: str = Field(..., min_length=3, max_length=100, description="Название задачи")
+    description: Optional[str] = Field(None, max_length=500, description="Описание задачи")
+    is_important: bool = Field(..., description="Важность задачи")
+    frequency: str = Field(
+        ...,
+        pattern="^(daily|weekly|monthly)$",
+        description="Частота: daily, weekly или monthly",
+        examples=["weekly"]
+    )
+    interval: int = Field(1, ge=1, le=365, description="Каждые N дней/недель/месяцев")
+    weekdays: Optional[List[int]] = Field(
+        None,
+        description="Дни недели для weekly (0 - понедельник)",
+        examples=[[0, 2, 4]]
+    )
+    starts_at: datetime = Field(..., description="Первое вхождение; его время - срок каждого вхождения")
+    until: Optional[datetime] = Field(None, description="Последняя возможная дата вхождения")
+    
+    @field_validator('weekdays')
+    @classmethod
+    def validate_weekdays(cls, v):
+        if v is not None and (not v or any(day < 0 or day > 6 for day in v)):
+            raise ValueError('Дни недели должны быть числами от 0 до 6')
+        return sorted(set(v)) if v else v
+
+
+class RecurringTaskResponse(BaseModel):
+    id: int
+    user_id: int
+    title: str
+    description: Optional[str] = None
+    is_important: bool
+    frequency: str
+    interval: int
+    weekdays: Optional[List[int]] = None
+    starts_at: datetime
+    until: Optional[datetime] = None
+    created_at: datetime
+
+
+class OccurrenceResponse(BaseModel):
+    """Вхождение повторяющейся задачи: вычисленное (task_id = None) или материализованное"""
+    recurring_task_id: int
+    occurrence_date: date
+    task_id: Optional[int] = None
+    user_id: int
+    title: str
+    description: Optional[str] = None
+    is_important: bool
+    deadline_at: datetime
+    quadrant: str
+    is_urgent: bool
+    days_until_deadline: Optional[int] = None
+    completed: bool = False
+
+
+class TagCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=50, description="Название метки", examples=["работа"])
+    
+    @field_validator('name')
+    @classmethod
+    def validate_name(cls, v):
+        return normalize_tag_names([v])[0]
+
+
+class TagResponse(BaseModel):
+    id: int
+    name: str
+    task_count: int = 0
+
+
+class TaskImport(TaskCreate):
+    # В файлах импорта важность часто не заполнена - такие задачи неважные
+    is_important: bool = Field(
+        False,
+        description="Важность задачи (по умолчанию false)"
+    )
+
+
+class ImportRowError(BaseModel):
+    row: int = Field(..., description="Номер строки (записи) в файле, с 1 без заголовка")
+    error: str
+
+
+class ImportResult(BaseModel):
+    imported: int = Field(..., description="Импортировано задач")
+    failed: int = Field(..., description="Строк с ошибками")
+    errors: List[ImportRowError] = Field(default_factory=list, description="Первые ошибки по строкам")
+    errors_truncated: bool = Field(False, description="Ошибок больше, чем показано")
+
+
+class JobCreate(BaseModel):
+    type: str = Field(..., max_length=32, description="Тип задания", examples=["export_tasks"])
+    params: Dict[str, Any] = Field(default_factory=dict, description="Параметры задания")
+
+
+class JobResponse(BaseModel):
+    id: int
+    type: str
+    user_id: int
+    status: str = Field(..., description="queued, running, succeeded, failed или cancelled")
+    params: Optional[Dict[str, Any]] = None
+    progress_done: int = 0
+    progress_total: Optional[int] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class JobDetailResponse(JobResponse):
+    result: Optional[Any] = Field(None, description="Результат успешно завершенного задания")
+
+
+class CalendarDay(BaseModel):
+    date: date
+    count: int = Field(..., description="Задач с дедлайном в этот день")
+    completed_count: int = Field(0, description="Из них выполнено")
+    items: List[TaskResponse] = Field(default_factory=list)
+
+
+class CalendarResponse(BaseModel):
+    date_from: date
+    date_to: date
+    tz: str = Field(..., description="Часовой пояс, в котором дедлайны разложены по дням")
+    days: List[CalendarDay]
+
+
+class CalendarFeedResponse(BaseModel):
+    url: str = Field(..., description="Адрес ICS-ленты для подписки в календаре")
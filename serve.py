@@ -0,0 +1,107 @@
+# serve.py
+"""
+Production-запуск API в нескольких процессах.
+
+    python serve.py --workers 4 --port 8000
+
+Каждый воркер импортирует main заново (spawn) и создает свой движок и пул
+соединений; родительский процесс только следит за воркерами и перезапускает
+упавшие. По SIGTERM/SIGINT воркеры перестают принимать соединения, дожидаются
+завершения текущих запросов (не дольше WEB_GRACEFUL_TIMEOUT секунд), после чего
+lifespan закрывает пул (engine.dispose()).
+
+Чтобы ограничить рост памяти, воркер перезапускается после WEB_MAX_REQUESTS
+запросов; к лимиту каждого воркера добавляется случайный разброс
+WEB_MAX_REQUESTS_JITTER, чтобы воркеры не перезапускались одновременно.
+
+Переменные окружения (те же параметры можно передать аргументами):
+- WEB_HOST, WEB_PORT - адрес (по умолчанию 0.0.0.0:8000)
+- WEB_WORKERS - число воркеров (по умолчанию - число доступных ядер)
+- WEB_BACKLOG - очередь входящих соединений (по умолчанию 2048)
+- WEB_KEEPALIVE - keep-alive в секундах; должен быть больше idle-таймаута балансировщика (по умолчанию 75)
+- WEB_GRACEFUL_TIMEOUT - время на завершение запросов при остановке (по умолчанию 30)
+- WEB_MAX_REQUESTS - запросов до перезапуска воркера, 0 - без перезапуска (по умолчанию 10000)
+- WEB_MAX_REQUESTS_JITTER - случайная добавка к WEB_MAX_REQUESTS (по умолчанию 1000)
+"""
+import argparse
+import os
+import random
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from logging_config import setup_logging
+
+
+def available_cpus() -> int:
+    """Число ядер, доступных процессу (учитывает ограничения affinity/cgroup cpuset)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+class RecyclingServer(uvicorn.Server):
+    """Сервер воркера: лимит запросов со случайным разбросом, свой для каждого процесса"""
+
+    def __init__(self, config: uvicorn.Config, max_requests_jitter: int = 0):
+        super().__init__(config)
+        self.max_requests_limit = config.limit_max_requests
+        self.max_requests_jitter = max_requests_jitter
+
+    def run(self, sockets=None):
+        # Выполняется уже в процессе воркера
+        if self.max_requests_limit:
+            self.config.limit_max_requests = self.max_requests_limit + random.randint(0, self.max_requests_jitter)
+        return super().run(sockets=sockets)
+
+
+def build_config(args) -> uvicorn.Config:
+    return uvicorn.Config(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keepalive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        limit_max_requests=args.max_requests or None,
+        proxy_headers=True,
+        # Логирование настраивает приложение (logging_config.setup_logging)
+        log_config=None,
+        access_log=False,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Production-запуск API в нескольких процессах")
+    parser.add_argument("--host", default=os.getenv("WEB_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WEB_PORT", "8000")))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_WORKERS", "0")) or available_cpus(),
+        help="Число воркеров (по умолчанию - число доступных ядер)"
+    )
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("WEB_BACKLOG", "2048")))
+    parser.add_argument("--keepalive", type=int, default=int(os.getenv("WEB_KEEPALIVE", "75")))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30")))
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("WEB_MAX_REQUESTS", "10000")))
+    parser.add_argument("--max-requests-jitter", type=int, default=int(os.getenv("WEB_MAX_REQUESTS_JITTER", "1000")))
+    args = parser.parse_args()
+
+    setup_logging()
+    config = build_config(args)
+    server = RecyclingServer(config, max_requests_jitter=args.max_requests_jitter)
+
+    if config.workers <= 1:
+        server.run()
+        return
+
+    # Сокет открывает родитель, воркеры принимают соединения с общего сокета
+    sock = config.bind_socket()
+    try:
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# static_files.py
+"""
+Раздача собранного фронтенда (см. build_frontend.py).
+
+PrecompressedStaticFiles отдает заранее сжатый вариант файла (.br или .gz)
+по заголовку Accept-Encoding, без сжатия на лету. Файлы с хэшем содержимого
+в имени кэшируются браузером навсегда (Cache-Control: immutable), HTML -
+с обязательной ревалидацией по ETag, чтобы новые сборки подхватывались сразу.
+"""
+import os
+import re
+from mimetypes import guess_type
+from typing import Dict, Set, Tuple
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+
+FRONTEND_DIST_DIR = os.getenv("FRONTEND_DIST_DIR", "frontend_dist")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Порядок предпочтения: brotli сжимает текст лучше gzip
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+FINGERPRINT_RE = re.compile(r"\.[0-9a-f]{12}\.\w+$")
+
+
+def accepted_encodings(accept_encoding: str) -> Set[str]:
+    """Кодировки из Accept-Encoding, кроме явно запрещенных (q=0)"""
+    encodings = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Сборка неизменна, поэтому сжатые варианты ищем один раз, а не stat() на каждый запрос
+        self.variants: Dict[str, Dict[str, Tuple[str, os.stat_result]]] = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                for encoding, suffix in ENCODINGS:
+                    if name.endswith(suffix):
+                        full_path = os.path.join(root, name)
+                        original = os.path.realpath(full_path[:-len(suffix)])
+                        self.variants.setdefault(original, {})[encoding] = (full_path, os.stat(full_path))
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        media_type = guess_type(str(full_path))[0] or "text/plain"
+        headers = {
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if FINGERPRINT_RE.search(str(full_path))
+            else REVALIDATE_CACHE_CONTROL,
+        }
+
+        variants = self.variants.get(os.path.realpath(full_path))
+        if variants:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for encoding, _ in ENCODINGS:
+                if encoding in accepted and encoding in variants:
+                    full_path, stat_result = variants[encoding]
+                    headers["Content-Encoding"] = encoding
+                    break
+
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,132 @@
+# trash.py
+"""
+Очистка корзины: задачи, пролежавшие в корзине дольше TRASH_RETENTION_DAYS,
+удаляются окончательно.
+
+Удаление идет пачками по TRASH_PURGE_BATCH_SIZE строк, каждая пачка - отдельная
+короткая транзакция с паузой TRASH_PURGE_PAUSE между ними: блокировки держатся
+недолго, а WAL пишется равномерно, а не одним всплеском. Пачка выбирается с
+FOR UPDATE SKIP LOCKED, поэтому очистка из нескольких воркеров не конфликтует.
+
+Запускается в фоне раз в TRASH_PURGE_INTERVAL секунд (0 - не запускать, например
+если очистка выполняется по cron командой `python trash.py`).
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, delete
+
+from database import AsyncSessionLocal, all_shard_sessionmakers
+from models import Task
+
+TRASH_RETENTION_DAYS = int(os.getenv("TRASH_RETENTION_DAYS", "30"))
+TRASH_PURGE_INTERVAL = float(os.getenv("TRASH_PURGE_INTERVAL", "3600"))
+TRASH_PURGE_BATCH_SIZE = int(os.getenv("TRASH_PURGE_BATCH_SIZE", "500"))
+TRASH_PURGE_PAUSE = float(os.getenv("TRASH_PURGE_PAUSE", "0.2"))
+
+logger = logging.getLogger(__name__)
+
+
+def purge_after(deleted_at: datetime) -> datetime:
+    """Когда задача из корзины будет удалена окончательно"""
+    return deleted_at + timedelta(days=TRASH_RETENTION_DAYS)
+
+
+async def purge_expired(
+    session_factory=AsyncSessionLocal,
+    retention_days: int = TRASH_RETENTION_DAYS,
+    batch_size: int = TRASH_PURGE_BATCH_SIZE,
+    pause: float = TRASH_PURGE_PAUSE
+) -> int:
+    """Окончательно удаляет просроченную корзину пачками; возвращает число удаленных задач"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    purged = 0
+
+    while True:
+        # Сначала более глубокие подзадачи (длиннее path), чтобы каскад по parent_id
+        # не удалял лишние строки сверх пачки
+        batch = (
+            select(Task.id)
+            .where(Task.deleted_at < cutoff)
+            .order_by(Task.deleted_at, Task.path.desc())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with session_factory() as db:
+            result = await db.execute(
+                delete(Task)
+                .where(Task.id.in_(batch))
+                .execution_options(include_deleted=True, synchronize_session=False)
+            )
+            await db.commit()
+
+        purged += result.rowcount
+        if result.rowcount < batch_size:
+            break
+        await asyncio.sleep(pause)
+
+    if purged:
+        logger.info("Корзина очищена", extra={"purged": purged, "cutoff": cutoff.isoformat()})
+    return purged
+
+
+async def purge_all_shards(retention_days: int = TRASH_RETENTION_DAYS) -> int:
+    """Очистка корзины на каждом шарде по очереди (см. database.DATABASE_SHARD_URLS)"""
+    purged = 0
+    for session_factory in all_shard_sessionmakers():
+        purged += await purge_expired(session_factory=session_factory, retention_days=retention_days)
+    return purged
+
+
+class TrashPurger:
+    """Фоновая очистка корзины раз в interval секунд"""
+
+    def __init__(self, interval: float = TRASH_PURGE_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await purge_all_shards()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка очистки корзины", extra={"error": str(e)})
+
+    async def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+trash_purger = TrashPurger()
+
+
+async def _run_purge(retention_days: int) -> None:
+    purged = await purge_all_shards(retention_days)
+    print(f"✅ Из корзины удалено задач: {purged}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Окончательное удаление просроченной корзины")
+    parser.add_argument("--retention-days", type=int, default=TRASH_RETENTION_DAYS)
+    args = parser.parse_args()
+    asyncio.run(_run_purge(args.retention_days))
+
+
+if __name__ == "__main__":
+    main()